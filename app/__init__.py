@@ -4,8 +4,10 @@ from flask_migrate import Migrate
 from config import Config
 import logging
 from flask_login import LoginManager
+from app.compression import PolicyCompress
 import time
 from sqlalchemy.exc import OperationalError
+from app.cache import link_cache
 
 
 # instance created at module level 
@@ -16,11 +18,21 @@ migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 
+# response compression (was set up in run.py, now shared by every entry point);
+# size threshold, endpoint exclusions, ETag cache, pre-compressed static files
+compress = PolicyCompress()
+
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    # pool sizing / pre-ping / recycle / statement timeout from DB_* settings
+    from app.pool import engine_options, pool_logger
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    pool_logger.init_app(app)
+    app.before_request(pool_logger.ensure_started)
+
     try:
         db.init_app(app)
         migrate.init_app(app, db)
@@ -28,19 +40,76 @@ def create_app():
         # initializing login manager for login sessions 
         login_manager.init_app(app)
 
+        # password KDFs on a bounded pool, off the request threads
+        from app.passwords import password_hasher
+        password_hasher.init_app(app)
+
+        # per-request SQL counts/timings (Server-Timing + log lines), opt-in
+        from app.querystats import query_stats
+        query_stats.init_app(app)
+
+        # request latency / counters for /metrics
+        from app.metrics import metrics
+        metrics.init_app(app)
+
+        # per-link 301/302 + Cache-Control, edge purges on edit/delete
+        from app.redirects import redirect_purger
+        redirect_purger.init_app(app)
+
+        # token buckets per ip/user/short code, 429 before any DB work
+        from app.ratelimit import rate_limiter
+        rate_limiter.init_app(app)
+
+        # short_code -> url cache used by the redirect route
+        link_cache.init_app(app)
+
+        # memory-mapped snapshot of hot links, read behind the cache
+        from app.warmup import link_snapshot, warm_link_cache
+        link_snapshot.init_app(app)
+
+        # slim cached principals for current_user
+        from app.principals import principal_cache
+        principal_cache.init_app(app)
+
+        # batched click counting, flushed in the background
+        from app.clicks import click_counter
+        click_counter.init_app(app)
+
+        # click events + time-bucketed rollups, written in the background
+        from app.analytics import click_events
+        click_events.init_app(app)
+
+        # collision-free short code allocation
+        from app.shortcodes import shortcode_allocator
+        shortcode_allocator.init_app(app)
+
+        # Bloom filter of live short codes, rejects random probes without a query
+        from app.codefilter import code_filter
+        code_filter.init_app(app)
+
         # AUTO-CREATE TABLES FOR FRESH DB (DOCKER / AWS SAFE)
         from app import models
         with app.app_context():
-            for _ in range(10):  # wait for DB to be ready
+            for attempt in range(app.config['DB_CREATE_RETRIES']):  # wait for DB to be ready
                 try:
                     db.create_all()
                     break
                 except OperationalError:
-                    time.sleep(1)
+                    if attempt + 1 < app.config['DB_CREATE_RETRIES']:
+                        time.sleep(app.config['DB_CREATE_RETRY_DELAY'])
+            code_filter.build_safely()
+            # most clicked links, so the first redirects don't all hit the DB
+            warm_link_cache(app)
 
     except Exception as e:
         logging.error(f"Failed to initialize database: {e}")
 
+    compress.init_app(app)
+
+    # per-link table row fragments for the dashboard/admin templates
+    from app.templating import fragment_cache, init_jinja
+    fragment_cache.init_app(app)
+
     from app.controllers.auth import auth
     app.register_blueprint(auth)
 
@@ -50,11 +119,22 @@ def create_app():
     from app.controllers.admin import admin
     app.register_blueprint(admin)
 
+    from app.controllers.metrics import ops
+    app.register_blueprint(ops)
+
+    # `flask links ...` commands
+    from app.cli import links_cli
+    app.cli.add_command(links_cli)
+
+    # bytecode cache + compile templates before workers are forked
+    init_jinja(app)
+
     return app
 
 
 # User Loader for Flask-Login  
+# returns a cached, read-only UserPrincipal instead of a full User row
 @login_manager.user_loader
 def load_user(user_id):
-    from app.models import User
-    return User.query.get(int(user_id))
\ No newline at end of file
+    from app.principals import load_principal
+    return load_principal(int(user_id))
\ No newline at end of file
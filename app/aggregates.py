@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, select, update
+
+from app import db
+from app.models import User, Link
+
+
+# Per-user counters (User.total_links / total_clicks / last_link_created_at)
+# are kept up to date with blind UPDATEs in the caller's transaction, so
+# reading them is a plain column access. `reconcile()` recomputes them from
+# the links table if they ever drift.
+
+def _bump(user_id, **values):
+    users = User.__table__
+    db.session.execute(update(users).where(users.c.id == user_id).values(**values))
+
+
+def links_created(user_id, n=1, created_at=None):
+    users = User.__table__
+    _bump(
+        user_id,
+        total_links=func.coalesce(users.c.total_links, 0) + n,
+        last_link_created_at=created_at or datetime.utcnow(),
+    )
+
+
+def link_deleted(user_id, clicks):
+    users = User.__table__
+    _bump(
+        user_id,
+        total_links=func.coalesce(users.c.total_links, 0) - 1,
+        total_clicks=func.coalesce(users.c.total_clicks, 0) - (clicks or 0),
+    )
+
+
+def clicks_reset(user_id, clicks):
+    """The edit path zeroes Link.clicks; take them off the owner's total."""
+    if clicks:
+        users = User.__table__
+        _bump(user_id, total_clicks=func.coalesce(users.c.total_clicks, 0) - clicks)
+
+
+def add_clicks(deltas):
+    """Apply {user_id: clicks} in one UPDATE (used by the click flusher)."""
+    if not deltas:
+        return
+    users = User.__table__
+    db.session.execute(
+        update(users)
+        .where(users.c.id.in_(deltas))
+        .values(total_clicks=func.coalesce(users.c.total_clicks, 0) + case(deltas, value=users.c.id))
+    )
+
+
+def reconcile():
+    """Recompute every user's counters from links in one set-based UPDATE."""
+    users = User.__table__
+    links = Link.__table__
+    owned = links.c.user_id == users.c.id
+
+    result = db.session.execute(
+        update(users).values(
+            total_links=select(func.count(links.c.id)).where(owned).scalar_subquery(),
+            total_clicks=select(func.coalesce(func.sum(links.c.clicks), 0)).where(owned).scalar_subquery(),
+            last_link_created_at=select(func.max(links.c.created_at)).where(owned).scalar_subquery(),
+        )
+    )
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,203 @@
+import threading
+from collections import deque, namedtuple, Counter
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from sqlalchemy import insert, select, update
+
+from app import db
+from app.models import ClickEvent, ClickRollup
+from app.workers import PeriodicFlusher
+
+
+ClickRecord = namedtuple('ClickRecord', ['link_id', 'occurred_at', 'referrer_host', 'ua_class', 'country'])
+
+PERIODS = ('minute', 'hour', 'day')
+
+_BOT_MARKERS = ('bot', 'crawl', 'spider', 'slurp', 'curl', 'wget', 'python-requests', 'preview')
+_MOBILE_MARKERS = ('mobile', 'android', 'iphone', 'ipad')
+
+
+def classify_user_agent(ua):
+    ua = (ua or '').lower()
+    if not ua:
+        return 'other'
+    if any(marker in ua for marker in _BOT_MARKERS):
+        return 'bot'
+    if any(marker in ua for marker in _MOBILE_MARKERS):
+        return 'mobile'
+    if 'mozilla' in ua:
+        return 'desktop'
+    return 'other'
+
+
+def referrer_host(referrer):
+    if not referrer:
+        return None
+    try:
+        host = urlparse(referrer).hostname
+    except ValueError:
+        return None
+    return host[:255] if host else None
+
+
+def bucket_start(ts, period):
+    if period == 'minute':
+        return ts.replace(second=0, microsecond=0)
+    if period == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class ClickEventWriter(PeriodicFlusher):
+    """Ring buffer of click events, drained into click_events + click_rollups.
+
+    `record()` is the only thing the redirect path calls; it appends a tuple
+    to a bounded deque. When the writer falls behind, the oldest events are
+    dropped (and counted) rather than slowing redirects down.
+    """
+
+    def __init__(self):
+        super().__init__('click-event-writer', 'ANALYTICS_FLUSH_INTERVAL', 5.0)
+        self._buffer = deque(maxlen=100000)
+        self._lock = threading.Lock()
+        self.batch_size = 5000
+        self.country_header = None
+        self.written = 0
+        self.dropped = 0
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('ANALYTICS_BUFFER_SIZE', 100000)
+        app.config.setdefault('ANALYTICS_BATCH_SIZE', 5000)
+        app.config.setdefault('ANALYTICS_COUNTRY_HEADER', None)
+
+        self._buffer = deque(maxlen=int(app.config['ANALYTICS_BUFFER_SIZE']))
+        self.batch_size = int(app.config['ANALYTICS_BATCH_SIZE'])
+        self.country_header = app.config['ANALYTICS_COUNTRY_HEADER']
+        self.written = self.dropped = 0
+        app.extensions['click_events'] = self
+
+    def country_from(self, get_header):
+        """Country placeholder until a geo lookup exists: trust the edge's header."""
+        if not self.country_header:
+            return None
+        return (get_header(self.country_header) or '')[:2] or None
+
+    def record(self, link_id, referrer, user_agent, country=None):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(ClickRecord(
+            link_id,
+            datetime.utcnow(),
+            referrer_host(referrer),
+            classify_user_agent(user_agent),
+            country,
+        ))
+        self.ensure_started()
+
+    def record_request(self, link_id, request):
+        """record() for a Flask request."""
+        self.record(link_id, request.referrer, request.user_agent.string,
+                    self.country_from(request.headers.get))
+
+    def _take(self):
+        batch = []
+        try:
+            for _ in range(self.batch_size):
+                batch.append(self._buffer.popleft())
+        except IndexError:
+            pass
+        return batch
+
+    def flush(self):
+        total = 0
+        # one writer at a time, the background thread and drain() may overlap
+        with self._lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return total
+                try:
+                    self._write(batch)
+                except Exception:
+                    db.session.rollback()
+                    self._buffer.extendleft(reversed(batch))
+                    raise
+                total += len(batch)
+                self.written += len(batch)
+
+    def _write(self, batch):
+        db.session.execute(insert(ClickEvent.__table__), [record._asdict() for record in batch])
+
+        counts = Counter()
+        for record in batch:
+            for period in PERIODS:
+                counts[(record.link_id, period, bucket_start(record.occurred_at, period))] += 1
+        _upsert_rollups(counts)
+
+        db.session.commit()
+
+    def stats(self):
+        return {
+            'buffered': len(self._buffer),
+            'capacity': self._buffer.maxlen,
+            'written': self.written,
+            'dropped': self.dropped,
+        }
+
+
+def _upsert_rollups(counts):
+    table = ClickRollup.__table__
+    rows = [
+        {'link_id': link_id, 'period': period, 'bucket_start': start, 'clicks': n}
+        for (link_id, period, start), n in counts.items()
+    ]
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['link_id', 'period', 'bucket_start'],
+            set_={'clicks': table.c.clicks + stmt.excluded.clicks},
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # generic fallback: update, insert what didn't exist
+    for row in rows:
+        result = db.session.execute(
+            update(table)
+            .where(table.c.link_id == row['link_id'])
+            .where(table.c.period == row['period'])
+            .where(table.c.bucket_start == row['bucket_start'])
+            .values(clicks=table.c.clicks + row['clicks'])
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**row))
+
+
+def clicks_series(link_id, period='hour', since=None):
+    """[(bucket_start, clicks)] for one link, read from the rollups only."""
+    if period not in PERIODS:
+        raise ValueError(f"unknown period {period!r}")
+    if since is None:
+        since = datetime.utcnow() - {'minute': timedelta(hours=1),
+                                     'hour': timedelta(days=2),
+                                     'day': timedelta(days=90)}[period]
+    table = ClickRollup.__table__
+    rows = db.session.execute(
+        select(table.c.bucket_start, table.c.clicks)
+        .where(table.c.link_id == link_id)
+        .where(table.c.period == period)
+        .where(table.c.bucket_start >= since)
+        .order_by(table.c.bucket_start)
+    )
+    return [(row.bucket_start, row.clicks) for row in rows]
+
+
+click_events = ClickEventWriter()
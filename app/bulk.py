@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app import aggregates
+from app.cache import link_cache
+from app.codefilter import code_filter
+from app.metrics import metrics
+from app.models import Link
+from app.shortcodes import shortcode_allocator
+
+
+def parse_urls(data, fmt):
+    """Turn a JSON array or CSV body into a list of URLs (input order kept).
+
+    JSON items may be plain strings or objects with a "url" key. CSV uses
+    the "url" column if there is a header with one, else the first column.
+    Raises ValueError on malformed input.
+    """
+    if fmt == 'json':
+        items = json.loads(data)
+        if not isinstance(items, list):
+            raise ValueError("expected a JSON array")
+        urls = [item.get('url') if isinstance(item, dict) else item for item in items]
+    else:
+        rows = csv.reader(io.StringIO(data))
+        first = next(rows, None)
+        if first is None:
+            return []
+        col = 0
+        header = [cell.strip().lower() for cell in first]
+        if 'url' in header:
+            col = header.index('url')
+            first = None
+        urls = [row[col] if len(row) > col else '' for row in ([first] if first else []) + list(rows)]
+
+    urls = [url.strip() if isinstance(url, str) else url for url in urls]
+    for i, url in enumerate(urls):
+        if not url or not isinstance(url, str):
+            raise ValueError(f"item {i} has no url")
+    return urls
+
+
+def iter_bulk_create(user_id, urls, chunk_size=1000):
+    """Create links for urls in chunked transactions.
+
+    Codes for a chunk are allocated in one go and the rows are written with
+    a single executemany INSERT, then committed. Yields the short codes of
+    each committed chunk, in input order, so a caller keeps what was saved
+    if a later chunk fails.
+    """
+    table = Link.__table__
+    for start in range(0, len(urls), chunk_size):
+        chunk = urls[start:start + chunk_size]
+        codes = shortcode_allocator.allocate_many(len(chunk))
+        now = datetime.utcnow()
+        rows = [
+            {'short_code': code, 'original_url': url, 'user_id': user_id, 'clicks': 0, 'created_at': now}
+            for code, url in zip(codes, chunk)
+        ]
+        try:
+            db.session.execute(insert(table), rows)
+            aggregates.links_created(user_id, len(rows), now)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            # after a unique violation any of them may be taken: drop them all
+            if not isinstance(e, IntegrityError):
+                shortcode_allocator.release(codes)
+            raise
+
+        for code in codes:
+            link_cache.invalidate(code)
+        code_filter.add(codes)
+        metrics.inc('shortener_links_created_total', len(codes))
+        yield codes
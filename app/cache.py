@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+# What the redirect path needs from a Link row, without holding an ORM object
+# (the last three are the redirect policy, see app/redirects.py)
+CachedLink = namedtuple(
+    'CachedLink', ['id', 'original_url', 'user_id', 'permanent', 'max_age', 'public'],
+    defaults=(False, 0, False)
+)
+
+# marker for "looked it up, no such short code" (negative caching)
+_MISSING = object()
+
+
+class _Flight:
+    """One in-progress load that concurrent misses for the same key wait on."""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Bounded LRU + TTL cache with negative caching.
+
+    The cache is per process: a change made in another worker is only seen
+    here once the entry expires, so keep TTLs short.
+
+    `get_or_load` is single-flight: concurrent misses for one key share a
+    single loader call. Within `refresh_ahead` seconds of expiry the first
+    request reloads the entry while everyone else is still served the
+    cached value, so a hot key never expires under load.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60, negative_ttl=10, refresh_ahead=0, load_timeout=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_ahead = refresh_ahead
+        self.load_timeout = load_timeout
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self.refreshes = 0
+
+    def lookup(self, key):
+        """(True, value) on a hit (value None = cached miss), else (False, None).
+
+        For callers that can't pass a plain loader, e.g. async code that
+        loads on its own and then calls `set()`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, _unwrap(entry[0])
+            self.misses += 1
+        return False, None
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, or None if it doesn't exist.
+
+        `loader(key)` is only called on a miss and returns the value or
+        None; both outcomes are cached.
+        """
+        now = time.monotonic()
+        refreshing = waiting = None
+        with self._lock:
+            entry = self._data.get(key)
+            flight = self._inflight.get(key)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                if flight is not None or entry[1] - now > self.refresh_ahead:
+                    return _unwrap(entry[0])
+                # about to expire: this request reloads it, the rest keep hitting
+                refreshing = entry[0]
+                self.refreshes += 1
+                flight = self._inflight[key] = _Flight()
+            elif flight is not None:
+                self.misses += 1
+                self.coalesced += 1
+                waiting = flight
+            else:
+                self.misses += 1
+                flight = self._inflight[key] = _Flight()
+        if waiting is not None:
+            return self._wait(waiting, key, loader)
+
+        try:
+            flight.value = loader(key)
+        except Exception as e:
+            if refreshing is None:
+                flight.error = e
+                raise
+            # the cached value is still valid, keep serving it
+            logging.warning(f"cache refresh of {key!r} failed: {e}")
+            flight.value = _unwrap(refreshing)
+        else:
+            self._store(key, flight.value, flight)
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.done.set()
+        return flight.value
+
+    def _wait(self, flight, key, loader):
+        if not flight.done.wait(self.load_timeout):
+            # the leader is stuck, don't pile up behind it
+            return loader(key)
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def set(self, key, value):
+        self._store(key, value)
+
+    def _store(self, key, value, flight=None):
+        if self.maxsize <= 0:
+            return
+        if value is None:
+            value, ttl = _MISSING, self.negative_ttl
+        else:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl
+
+        with self._lock:
+            if flight is not None and self._inflight.get(key) is not flight:
+                return  # invalidated while loading, the result may be stale
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._inflight.clear()
+            self.hits = self.misses = self.evictions = 0
+            self.coalesced = self.refreshes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced,
+                'refreshes': self.refreshes,
+                'loading': len(self._inflight),
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+def _unwrap(value):
+    return None if value is _MISSING else value
+
+
+class LinkCache(TTLCache):
+    """short_code -> CachedLink for the redirect path."""
+
+    def init_app(self, app):
+        app.config.setdefault('LINK_CACHE_SIZE', 10000)
+        app.config.setdefault('LINK_CACHE_TTL', 60)
+        app.config.setdefault('LINK_CACHE_NEGATIVE_TTL', 10)
+        app.config.setdefault('LINK_CACHE_REFRESH_AHEAD', 5)
+        app.config.setdefault('LINK_CACHE_LOAD_TIMEOUT', 5)
+
+        self.maxsize = int(app.config['LINK_CACHE_SIZE'])
+        self.ttl = float(app.config['LINK_CACHE_TTL'])
+        self.negative_ttl = float(app.config['LINK_CACHE_NEGATIVE_TTL'])
+        self.refresh_ahead = float(app.config['LINK_CACHE_REFRESH_AHEAD'])
+        self.load_timeout = float(app.config['LINK_CACHE_LOAD_TIMEOUT'])
+        self.clear()
+        app.extensions['link_cache'] = self
+
+
+link_cache = LinkCache()
@@ -0,0 +1,133 @@
+import csv
+import sys
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.models import User
+
+
+links_cli = AppGroup('links', help='Short link maintenance commands.')
+
+
+def _find_user(user_ref):
+    query = User.query
+    if user_ref.isdigit():
+        return query.filter_by(id=int(user_ref)).first()
+    return query.filter((User.email == user_ref) | (User.username == user_ref)).first()
+
+
+# flask links import urls.csv --user someone@example.com
+@links_cli.command('import')
+@click.argument('source', type=click.File('r'), default='-')
+@click.option('--user', 'user_ref', required=True, help='Owner id, email or username.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default=None,
+              help='Input format (default: from file extension, else csv).')
+@click.option('--base-url', default='', help='Prefix for the printed short URLs.')
+def import_links(source, user_ref, fmt, base_url):
+    """Bulk-create links from a CSV or JSON file ("-" reads stdin).
+
+    Writes url,short_code,short_url rows to stdout in input order.
+    """
+    from app.bulk import parse_urls, iter_bulk_create
+
+    user = _find_user(user_ref)
+    if user is None:
+        raise click.ClickException(f"No user {user_ref!r}")
+
+    if fmt is None:
+        fmt = 'json' if source.name.endswith('.json') else 'csv'
+    try:
+        urls = parse_urls(source.read(), fmt)
+    except ValueError as e:
+        raise click.ClickException(f"Invalid input: {e}")
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(['url', 'short_code', 'short_url'])
+
+    started = time.perf_counter()
+    done = 0
+    for codes in iter_bulk_create(user.id, urls, current_app.config['BULK_INSERT_CHUNK']):
+        for url, code in zip(urls[done:], codes):
+            writer.writerow([url, code, base_url + code])
+        done += len(codes)
+    elapsed = time.perf_counter() - started
+
+    rate = done / elapsed if elapsed else 0
+    click.echo(f"Created {done} links in {elapsed:.2f}s ({rate:,.0f} links/s)", err=True)
+
+
+# flask links reconcile
+@links_cli.command('reconcile')
+def reconcile_aggregates():
+    """Recompute per-user link/click counters from the links table."""
+    from app import aggregates
+
+    started = time.perf_counter()
+    count = aggregates.reconcile()
+    click.echo(f"Reconciled {count} users in {time.perf_counter() - started:.2f}s")
+
+
+# flask links snapshot /var/lib/shortener/links.snap
+@links_cli.command('snapshot')
+@click.argument('path', required=False)
+@click.option('--size', type=int, default=None,
+              help='Number of most clicked links to include (default: LINK_SNAPSHOT_SIZE).')
+def write_link_snapshot(path, size):
+    """Write the most clicked links to a snapshot file for cold starts.
+
+    Defaults to LINK_SNAPSHOT_PATH; run it periodically (cron), workers
+    pick up the new file without a restart.
+    """
+    from app.warmup import hot_links, write_snapshot
+
+    path = path or current_app.config.get('LINK_SNAPSHOT_PATH')
+    if not path:
+        raise click.ClickException("No path given and LINK_SNAPSHOT_PATH is not set")
+    size = size if size is not None else current_app.config['LINK_SNAPSHOT_SIZE']
+
+    started = time.perf_counter()
+    count = write_snapshot(path, hot_links(size))
+    click.echo(f"Wrote {count} links to {path} in {time.perf_counter() - started:.2f}s")
+
+
+# flask links export links.csv.gz --user someone@example.com --gzip
+@links_cli.command('export')
+@click.argument('output', type=click.File('wb'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default='csv')
+@click.option('--user', 'user_ref', default=None, help='Only this owner (id, email or username).')
+@click.option('--after-id', type=int, default=None, help='Resume after this link id.')
+@click.option('--max-id', type=int, default=None, help='Stop at this link id (default: current max).')
+@click.option('--gzip', 'compress', is_flag=True, help='gzip the output.')
+def export_links(output, fmt, user_ref, after_id, max_id, compress):
+    """Stream links with their clicks and created_at as CSV or JSON ("-" is stdout)."""
+    from app import export
+
+    user_id = None
+    if user_ref:
+        user = _find_user(user_ref)
+        if user is None:
+            raise click.ClickException(f"No user {user_ref!r}")
+        user_id = user.id
+    if max_id is None:
+        max_id = export.export_max_id()
+
+    exported = 0
+
+    def counted(batches):
+        nonlocal exported
+        for rows in batches:
+            exported += len(rows)
+            yield rows
+
+    encode = export.FORMATS[fmt][0]
+    text = encode(counted(export.iter_links(user_id, after_id, max_id, current_app.config['EXPORT_BATCH_SIZE'])))
+    chunks = export.gzip_chunks(text) if compress else (chunk.encode() for chunk in text)
+
+    started = time.perf_counter()
+    for chunk in chunks:
+        output.write(chunk)
+    output.flush()
+    click.echo(f"Exported {exported} links (ids up to {max_id}) in {time.perf_counter() - started:.2f}s", err=True)
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Link, ShortCodeCounter, FreeShortCode
+from app.shortcodes import BASE, index_for, shortcode_allocator
+from app.workers import PeriodicFlusher
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)."""
+
+    def __init__(self, capacity, fp_rate, max_bytes=None):
+        capacity = max(int(capacity), 1)
+        bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        if max_bytes:
+            # memory cap wins over the requested false-positive rate
+            bits = min(bits, int(max_bytes) * 8)
+        self.size = max(bits, 8)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        # not thread-safe: callers serialize writers
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+    def expected_fp_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class ShortCodeFilter(PeriodicFlusher):
+    """In-memory "could this short code exist?" check for the redirect path.
+
+    A definite no skips the link cache and the DB, so random probes don't
+    cost a query or push real links out of the cache. The filter is rebuilt
+    every SHORT_CODE_FILTER_REBUILD_INTERVAL seconds from links and
+    free_short_codes; codes created by this process are added as they go.
+    Deleted codes stay in it until the next rebuild, they just cost a lookup.
+
+    Other processes keep allocating after a build, so a code missing from the
+    filter is only rejected if the allocator can never hand it out later:
+    codes it can't produce at all (wrong length/characters), and codes whose
+    tier index was reserved long enough before the build that the allocator
+    has either saved them (they're in the filter) or dropped them
+    (SHORT_CODE_BLOCK_MAX_AGE, see app/shortcodes.py). Everything else gets a
+    normal lookup.
+    """
+
+    def __init__(self):
+        super().__init__('short-code-filter', 'SHORT_CODE_FILTER_REBUILD_INTERVAL', 3600)
+        self.enabled = True
+        self.fp_rate = 0.001
+        self.min_capacity = 100000
+        self.max_bytes = None
+        # (bloom, {length: index below which misses are final}), swapped as one
+        self._state = (None, {})
+        # (monotonic time, {length: next_index}) read at each build, oldest first
+        self._counter_reads = deque(maxlen=8)
+        self._lock = threading.Lock()
+        self._added_during_build = None
+        self.rejected = 0
+        self.deleted_since_build = 0
+        self.built_at = None
+        self.build_seconds = None
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('SHORT_CODE_FILTER_ENABLED', True)
+        app.config.setdefault('SHORT_CODE_FILTER_FP_RATE', 0.001)
+        app.config.setdefault('SHORT_CODE_FILTER_MIN_CAPACITY', 100000)
+        app.config.setdefault('SHORT_CODE_FILTER_MAX_BYTES', 64 * 1024 * 1024)
+
+        self.enabled = bool(app.config['SHORT_CODE_FILTER_ENABLED'])
+        self.fp_rate = float(app.config['SHORT_CODE_FILTER_FP_RATE'])
+        self.min_capacity = int(app.config['SHORT_CODE_FILTER_MIN_CAPACITY'])
+        self.max_bytes = int(app.config['SHORT_CODE_FILTER_MAX_BYTES'] or 0) or None
+        self._state = (None, {})
+        self._counter_reads.clear()
+        self.rejected = self.deleted_since_build = 0
+        app.extensions['short_code_filter'] = self
+
+    @property
+    def interval(self):
+        interval = super().interval
+        # the first build can't reject allocator codes yet, the next one can
+        waiting = self._counter_reads and self._counter_reads[-1][1] and not self._state[1]
+        if interval > 0 and waiting and shortcode_allocator.block_max_age > 0:
+            return min(interval, 2 * shortcode_allocator.block_max_age + 1)
+        return interval
+
+    def might_exist(self, short_code):
+        """False only if short_code is certainly not a live link."""
+        bloom, settled = self._state
+        if not self.enabled or bloom is None or short_code in bloom:
+            return True
+        index = index_for(short_code)
+        if index is not None and index >= settled.get(len(short_code), 0):
+            return True  # could still be handed out by some process
+        self.rejected += 1
+        return False
+
+    def add(self, codes):
+        """Record codes created by this process."""
+        with self._lock:
+            bloom = self._state[0]
+            for code in codes:
+                if bloom is not None:
+                    bloom.add(code)
+                if self._added_during_build is not None:
+                    self._added_during_build.append(code)
+
+    def removed(self, n=1):
+        """Bloom filters can't forget; count deletes until the next rebuild."""
+        self.deleted_since_build += n
+
+    def flush(self):
+        if self.enabled:
+            self.rebuild()
+
+    def drain(self, timeout=5):
+        """Nothing is buffered, just stop the rebuild thread."""
+        self._stop.set()
+
+    def _settled(self, now):
+        """Counter values from a read at least 2 * SHORT_CODE_BLOCK_MAX_AGE ago.
+
+        Indexes below them were reserved before that read, so by now they
+        were saved (and are in links) or dropped by their allocator.
+        """
+        max_age = shortcode_allocator.block_max_age
+        if max_age <= 0:
+            return {}
+        settled = {}
+        for read_at, counters in self._counter_reads:
+            if read_at <= now - 2 * max_age:
+                settled = counters
+        return settled
+
+    def rebuild(self):
+        started = time.perf_counter()
+        links, free, counters = Link.__table__, FreeShortCode.__table__, ShortCodeCounter.__table__
+        with self._lock:
+            self._added_during_build = []
+        try:
+            with db.engine.connect() as conn:
+                # counters first: everything the stream below misses was
+                # reserved after this read
+                read_at = time.monotonic()
+                allocated = {
+                    row.length: min(row.next_index, BASE ** row.length)
+                    for row in conn.execute(select(counters.c.length, counters.c.next_index))
+                }
+                expected = (
+                    conn.scalar(select(func.count()).select_from(links))
+                    + conn.scalar(select(func.count()).select_from(free))
+                )
+                bloom = BloomFilter(max(self.min_capacity, int(expected * 1.25)), self.fp_rate, self.max_bytes)
+
+                # free_short_codes includes codes recently taken for reuse
+                for table in (links, free):
+                    rows = conn.execution_options(yield_per=10000).execute(select(table.c.short_code))
+                    for code in rows.scalars():
+                        bloom.add(code)
+        except Exception:
+            with self._lock:
+                self._added_during_build = None
+            raise
+
+        with self._lock:
+            for code in self._added_during_build:
+                bloom.add(code)
+            self._added_during_build = None
+            self._counter_reads.append((read_at, allocated))
+            self._state = (bloom, self._settled(read_at))
+            self.deleted_since_build = 0
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+        logging.info(
+            f"short code filter built items={bloom.count} bytes={bloom.nbytes} hashes={bloom.hashes} "
+            f"expected_fp_rate={bloom.expected_fp_rate():.5f} seconds={self.build_seconds:.2f}"
+        )
+        return bloom.count
+
+    def build_safely(self):
+        """Initial build at startup; until it succeeds nothing is rejected."""
+        if not self.enabled:
+            return
+        try:
+            self.rebuild()
+        except Exception as e:
+            logging.error(f"short code filter build failed: {e}")
+
+    def stats(self):
+        bloom, settled = self._state
+        return {
+            'enabled': self.enabled,
+            'ready': bloom is not None,
+            'items': bloom.count if bloom else 0,
+            'capacity': bloom.capacity if bloom else 0,
+            'bytes': bloom.nbytes if bloom else 0,
+            'hashes': bloom.hashes if bloom else 0,
+            'target_fp_rate': self.fp_rate,
+            'expected_fp_rate': bloom.expected_fp_rate() if bloom else 0.0,
+            'settled_indexes': {str(length): index for length, index in settled.items()},
+            'rejected': self.rejected,
+            'deleted_since_build': self.deleted_since_build,
+            'built_at': self.built_at,
+            'build_seconds': self.build_seconds,
+        }
+
+
+code_filter = ShortCodeFilter()
@@ -0,0 +1,149 @@
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request, send_from_directory
+from flask_compress import Compress
+from werkzeug.security import safe_join
+
+
+# environ key the cache key function reads the response's ETag from
+_ETAG_KEY = 'shortener.compress_etag'
+
+# pre-compressed variants written by scripts/precompress_static.py, best first
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedBodyCache:
+    """Compressed bodies by "<algorithm>;<etag>", LRU bounded by total bytes.
+
+    Used as Flask-Compress's cache backend. Keys without an ETag (the
+    response had none) are never stored or found.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key.endswith(';'):
+            return None
+        with self._lock:
+            body = self._data.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key, body):
+        if key.endswith(';') or len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._data[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._data), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+def _etag_cache_key(req):
+    return req.environ.get(_ETAG_KEY, '')
+
+
+class PolicyCompress(Compress):
+    """Flask-Compress with a policy on top.
+
+    - endpoints in COMPRESS_EXCLUDE_ENDPOINTS (the redirect route) skip it
+      entirely: no negotiation and no `Vary: Accept-Encoding`, which would
+      split CDN caches of cacheable redirects
+    - bodies under COMPRESS_MIN_SIZE bytes go out as-is (Flask-Compress)
+    - compressed bodies are cached by the response's ETag (an md5 of the
+      body is added when it has none), so identical template output is
+      only compressed once; COMPRESS_CACHE_MAX_BYTES=0 turns that off
+    - static files with a .br/.gz twin from scripts/precompress_static.py
+      are sent as-is instead of being compressed per request
+    """
+
+    def __init__(self, app=None):
+        self.excluded = frozenset()
+        self.body_cache = None
+        super().__init__(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_EXCLUDE_ENDPOINTS', ['main.redirect_to_url'])
+        app.config.setdefault('COMPRESS_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+
+        self.excluded = frozenset(app.config['COMPRESS_EXCLUDE_ENDPOINTS'])
+        max_bytes = int(app.config['COMPRESS_CACHE_MAX_BYTES'] or 0)
+        self.body_cache = CompressedBodyCache(max_bytes) if max_bytes > 0 else None
+        if self.body_cache is not None and not app.config.get('COMPRESS_CACHE_BACKEND'):
+            app.config['COMPRESS_CACHE_BACKEND'] = lambda: self.body_cache
+            app.config['COMPRESS_CACHE_KEY'] = _etag_cache_key
+        super().init_app(app)
+
+        if app.has_static_folder and 'static' in app.view_functions:
+            app.view_functions['static'] = _precompressed_static(app, app.view_functions['static'])
+        app.extensions['compress_policy'] = self
+
+    def after_request(self, response):
+        if request.endpoint in self.excluded:
+            return response
+        if self.body_cache is not None:
+            self._remember_etag(response)
+        return super().after_request(response)
+
+    def _remember_etag(self, response):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or response.status_code != 200
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in self.compress_mimetypes_set
+            or (response.content_length or 0) < (self.app or current_app).config['COMPRESS_MIN_SIZE']
+        ):
+            return
+        etag, weak = response.get_etag()
+        if etag is None:
+            response.add_etag()
+            etag, weak = response.get_etag()
+        if not weak:
+            request.environ[_ETAG_KEY] = etag
+
+
+def _precompressed_static(app, view):
+    """Wrap the static view to send file.br / file.gz when the client takes it."""
+
+    def static(filename):
+        accepted = request.accept_encodings
+        source = safe_join(app.static_folder, filename)
+        for encoding, suffix in STATIC_ENCODINGS if source else ():
+            if encoding not in accepted:
+                continue
+            try:
+                # only while the twin is at least as new as the original
+                if os.path.getmtime(source + suffix) < os.path.getmtime(source):
+                    continue
+            except OSError:
+                continue
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+        return view(filename=filename)
+
+    return static
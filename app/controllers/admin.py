@@ -1,14 +1,24 @@
-from flask import Blueprint, render_template, request, redirect, flash, url_for,abort
+from flask import Blueprint, render_template, request, redirect, flash, url_for,abort, current_app, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from app.models import Link, User
-import random
-import string
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from app.pool import pool_stats
+from app.codefilter import code_filter
+from app.metrics import metrics
 from app import db
+from app.cache import link_cache
+from app.warmup import link_snapshot
+from app.templating import fragment_cache
+from app.redirects import policy_from_form, redirect_purger
+from app.clicks import click_counter
+from app.shortcodes import shortcode_allocator
+from app.pagination import keyset_page
+from app import aggregates
+from app import export
 
 admin = Blueprint('admin', __name__, url_prefix='/admin')
 
-CHAR_POOL = string.digits + string.ascii_lowercase + string.ascii_uppercase  # + ['-','_','+']
-
 @admin.route('/', methods=['GET','POST'])
 @login_required
 def admin_dashboard():
@@ -21,6 +31,7 @@ def admin_dashboard():
     if request.method == 'POST':
         original_url = request.form.get('url')
         edit_id = request.form.get('edit_id')
+        policy = policy_from_form(request.form, current_app.config['REDIRECT_MAX_AGE_LIMIT'])
 
         if not original_url:
             flash('URL is required', 'error')
@@ -32,9 +43,19 @@ def admin_dashboard():
                 link = Link.query.get_or_404(edit_id)
 
                 link.original_url = original_url
+                for column, value in policy.items():
+                    setattr(link, column, value)
+                # in the UPDATE, so concurrent edits can't share a version
+                link.version = Link.version + 1
+                aggregates.clicks_reset(link.user_id, link.clicks)
                 link.clicks = 0   # reset clicks on update
 
                 db.session.commit()
+                link_cache.invalidate(link.short_code)
+                link_snapshot.invalidate(link.short_code)
+                redirect_purger.purge([link.short_code])
+                click_counter.discard(link.id)
+                fragment_cache.invalidate(link.id)
                 flash("Short link updated successfully!", "success")
                 return redirect(url_for('admin.admin_dashboard'))
 
@@ -45,23 +66,25 @@ def admin_dashboard():
 
         # ========= CREATE MODE (NEW) =========
 
-        # generate random short_code
-        short_code = ''.join(random.choice(CHAR_POOL) for _ in range(3))
-
-        # ensure unique short_code
-        while Link.query.filter_by(short_code=short_code).first():
-            short_code = ''.join(random.choice(CHAR_POOL) for _ in range(3))
+        # next free short_code (unique by construction)
+        short_code = shortcode_allocator.allocate()
 
         try:
             link = Link(
                 short_code=short_code,
                 original_url=original_url,
                 user_id=current_user.id,
-                clicks=0
+                clicks=0,
+                **policy
             )
 
             db.session.add(link)
+            aggregates.links_created(current_user.id)
             db.session.commit()
+            # drop a cached "doesn't exist" for this code
+            link_cache.invalidate(short_code)
+            code_filter.add([short_code])
+            metrics.inc('shortener_links_created_total')
 
             short_url = url_for(
                 "main.redirect_to_url",
@@ -74,35 +97,45 @@ def admin_dashboard():
 
         except Exception as e:
             db.session.rollback()
+            # a unique violation means the code is taken: drop it
+            if not isinstance(e, IntegrityError):
+                shortcode_allocator.release([short_code])
             print(e)
             flash(f"Error saving URL {e}",'error')
             return redirect(url_for('admin.admin_dashboard'))
 
-    # ===== Normal Pagination =====
-    page = request.args.get("page", 1, type=int)
+    # ===== Cursor Pagination =====
     per_page = 10
 
-    # base query for current user's links
-    query = Link.query.filter_by(user_id=current_user.id).order_by(Link.created_at.desc(), Link.id.desc())
-
-    # paginate using SQLAlchemy
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # base query for current user's links, keyset on (created_at, id)
+    query = Link.query.filter_by(user_id=current_user.id)
+    pagination = keyset_page(
+        query, Link.created_at, Link.id, per_page,
+        after=request.args.get("after"),
+        before=request.args.get("before")
+    )
     links = pagination.items
 
-    # calculate serial number start
-    start_index = (page - 1) * per_page + 1
+    # serial number start is carried along in the url, no OFFSET/COUNT needed
+    start_index = max(request.args.get("start", 1, type=int), 1)
     end_index = start_index + len(links) - 1
-    total_links = pagination.total
+    # O(1): denormalized counters on the user row (current_user is a slim principal)
+    total_links, total_clicks = db.session.query(
+        User.total_links, User.total_clicks
+    ).filter(User.id == current_user.id).one()
+    total_links, total_clicks = total_links or 0, total_clicks or 0
 
     return render_template(
         "dashboard.html",
         links=links,
         is_admin = True,
-        page=page,
-        total_pages=pagination.pages,
         start_index=start_index,
         end_index=end_index,
-        total_links=total_links
+        total_links=total_links,
+        total_clicks=total_clicks,
+        next_cursor=pagination.next_cursor,
+        prev_cursor=pagination.prev_cursor,
+        per_page=per_page
     )
 
 
@@ -117,20 +150,95 @@ def admin_user_links():
     try:
         # Get user_id from query string and convert to int
         select_user_id = request.args.get('user_id', type=int)
-        all_users = User.query.all()
+        after_id = request.args.get('after', type=int)
+        before_id = request.args.get('before', type=int)
+        per_page = current_app.config['ADMIN_LINKS_PER_PAGE']
+
+        # dropdown only needs id/username/role + counters, not full User rows
+        all_users = db.session.query(
+            User.id, User.username, User.role, User.total_links, User.total_clicks
+        ).order_by(User.username).all()
 
-        # Query user by id if provided, else get all users
+        # links + their owner's username in one joined query
+        query = Link.query.options(joinedload(Link.user).load_only(User.id, User.username))
         if select_user_id:
-            users = User.query.filter(User.id == select_user_id).all()
+            query = query.filter(Link.user_id == select_user_id)
+
+        # keyset pagination on Link.id (newest first)
+        if before_id:
+            links = query.filter(Link.id > before_id).order_by(Link.id.asc()).limit(per_page + 1).all()
+            has_prev = len(links) > per_page
+            links = list(reversed(links[:per_page]))
+            has_next = True
         else:
-            users = all_users
+            if after_id:
+                query = query.filter(Link.id < after_id)
+            links = query.order_by(Link.id.desc()).limit(per_page + 1).all()
+            has_next = len(links) > per_page
+            links = links[:per_page]
+            has_prev = bool(after_id)
 
         return render_template(
             'admin_user_links.html',
-            users=users,
+            links=links,
             all_users=all_users,
-            select_user_id=select_user_id
+            select_user_id=select_user_id,
+            next_after=links[-1].id if links and has_next else None,
+            prev_before=links[0].id if links and has_prev else None
         )
     except Exception as e:
         print(f"Error fetching users: {e}")
         return abort(404)
+
+
+# ====> ADMIN: DB CONNECTION POOL STATS <====
+@admin.route('/pool', methods=['GET'])
+@login_required
+def pool_status():
+    if current_user.role != 'admin':
+        abort(404)
+
+    return jsonify(pool_stats(db.engine))
+
+
+# ====> ADMIN: SHORT CODE FILTER STATS <====
+@admin.route('/code-filter', methods=['GET'])
+@login_required
+def code_filter_status():
+    if current_user.role != 'admin':
+        abort(404)
+
+    return jsonify(code_filter.stats())
+
+
+# ====> ADMIN: STREAMING EXPORT OF LINKS <====
+# /admin/export/links?format=csv|json&user_id=..&after_id=..&max_id=..
+@admin.route('/export/links', methods=['GET'])
+@login_required
+def export_links():
+    if current_user.role != 'admin':
+        abort(404)
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        abort(400)
+    user_id = request.args.get('user_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+    # pinned at the first request, resumed downloads pass it back
+    max_id = request.args.get('max_id', type=int)
+    if max_id is None:
+        max_id = export.export_max_id()
+
+    encode, mimetype = export.FORMATS[fmt]
+    batches = export.iter_links(user_id, after_id, max_id, current_app.config['EXPORT_BATCH_SIZE'])
+    body = encode(batches)
+    headers = {
+        'Content-Disposition': f'attachment; filename=links.{fmt}',
+        'X-Export-Max-Id': str(max_id),
+    }
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        body = export.gzip_chunks(body)
+        headers['Content-Encoding'] = 'gzip'
+
+    # rows are read from the cursor while the response is being sent
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
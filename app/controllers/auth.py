@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, flash, url_for
 from app.models import User 
 from app import db
+from app.passwords import password_hasher, HashingBusy
 from flask_login import login_user, logout_user, login_required
 import logging
 from flask_login import current_user
@@ -24,8 +25,15 @@ def login():
 
 # user authentication    
         user = User.query.filter_by(email=email).first()
-        
-        if user and user.check_password(password):
+
+        try:
+            # KDF runs on the bounded hashing pool, not this request thread
+            valid = user is not None and password_hasher.verify(user.password_hash, password)
+        except HashingBusy:
+            return _hashing_busy('login.html')
+
+        if valid:
+            _upgrade_hash(user, password)
             login_user(user)
 
             # role based redirection
@@ -86,7 +94,10 @@ def signup():
             profession=profession,
             bio=bio
         )
-        new_user.set_password(password)
+        try:
+            new_user.password_hash = password_hasher.hash(password)
+        except HashingBusy:
+            return _hashing_busy('signup.html')
 
         try:
             db.session.add(new_user)
@@ -105,6 +116,25 @@ def signup():
     return render_template('signup.html')
 
 
+def _hashing_busy(template):
+    flash("Too many sign-ins right now, please try again in a moment.", 'error')
+    return render_template(template), 503, {'Retry-After': '1'}
+
+
+def _upgrade_hash(user, password):
+    # stored with older KDF parameters: re-hash now that we know the password
+    if not password_hasher.needs_rehash(user.password_hash):
+        return
+    try:
+        user.password_hash = password_hasher.hash(password)
+        db.session.commit()
+    except HashingBusy:
+        pass  # next login
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Password rehash failed: {e}")
+
+
 # Logout Rotue
 
 @auth.route('/logout')
@@ -0,0 +1,16 @@
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+
+from app.metrics import metrics
+
+ops = Blueprint('ops', __name__)
+
+
+# ====> PROMETHEUS SCRAPE ENDPOINT <====
+@ops.route('/metrics', methods=['GET'])
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
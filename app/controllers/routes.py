@@ -1,15 +1,24 @@
-from flask import Blueprint, render_template, request, redirect, flash, url_for
+from flask import Blueprint, render_template, request, redirect, flash, url_for, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from app.models import Link, User
-import random
-import string
+from sqlalchemy.exc import IntegrityError
 from app import db
+from app.cache import link_cache, CachedLink
+from app.clicks import click_counter
+from app.shortcodes import shortcode_allocator
+from app.pagination import keyset_page
+from app import aggregates
+from app.bulk import parse_urls, iter_bulk_create
+from app.analytics import click_events, clicks_series
+from app.metrics import metrics
+from app.codefilter import code_filter
+from app.warmup import link_snapshot
+from app.templating import fragment_cache
+from app.redirects import policy_from_form, redirect_headers, redirect_purger
+import logging
 
 bp = Blueprint('main', __name__)
 
-# Pool for available character like IPs in DHCP Pool
-CHAR_POOL = string.digits + string.ascii_lowercase + string.ascii_uppercase  # + ['-','_','+']
-
 # ===== Simple User DASHBOARD ROUTE ======
 @bp.route('/dashboard', methods=['GET', 'POST'])
 @login_required
@@ -22,6 +31,7 @@ def dashboard():
     if request.method == 'POST':
         original_url = request.form.get('url')
         edit_id = request.form.get('edit_id')
+        policy = policy_from_form(request.form, current_app.config['REDIRECT_MAX_AGE_LIMIT'])
 
         if not original_url:
             flash('URL is required', 'error')
@@ -32,8 +42,18 @@ def dashboard():
             try:
                 link = Link.query.get_or_404(edit_id)
                 link.original_url = original_url
+                for column, value in policy.items():
+                    setattr(link, column, value)
+                # in the UPDATE, so concurrent edits can't share a version
+                link.version = Link.version + 1
+                aggregates.clicks_reset(link.user_id, link.clicks)
                 link.clicks = 0  # reset clicks on update
                 db.session.commit()
+                link_cache.invalidate(link.short_code)
+                link_snapshot.invalidate(link.short_code)
+                redirect_purger.purge([link.short_code])
+                click_counter.discard(link.id)
+                fragment_cache.invalidate(link.id)
                 flash("Short link updated successfully!", "success")
                 return redirect(url_for('main.dashboard'))
             except Exception as e:
@@ -42,19 +62,24 @@ def dashboard():
                 return redirect(url_for('main.dashboard'))
 
         # ========= CREATE MODE =========
-        short_code = ''.join(random.choice(CHAR_POOL) for _ in range(3))
-        while Link.query.filter_by(short_code=short_code).first():
-            short_code = ''.join(random.choice(CHAR_POOL) for _ in range(3))
+        # unique by construction, no lookup loop needed
+        short_code = shortcode_allocator.allocate()
 
         try:
             link = Link(
                 short_code=short_code,
                 original_url=original_url,
                 user_id=current_user.id,
-                clicks=0
+                clicks=0,
+                **policy
             )
             db.session.add(link)
+            aggregates.links_created(current_user.id)
             db.session.commit()
+            # drop a cached "doesn't exist" for this code
+            link_cache.invalidate(short_code)
+            code_filter.add([short_code])
+            metrics.inc('shortener_links_created_total')
 
             short_url = url_for(
                 "main.redirect_to_url",
@@ -66,53 +91,116 @@ def dashboard():
             return redirect(url_for('main.dashboard'))
         except Exception as e:
             db.session.rollback()
+            # a unique violation means the code is taken: drop it
+            if not isinstance(e, IntegrityError):
+                shortcode_allocator.release([short_code])
             flash("Error saving URL", 'error')
             return redirect(url_for('main.dashboard'))
 
-    # ===== Normal Pagination =====
-
-    page = request.args.get("page", 1, type=int)
+    # ===== Cursor Pagination =====
     per_page = 10
 
-    # base query for current user's links
-    query = Link.query.filter_by(user_id=current_user.id).order_by(Link.created_at.desc(), Link.id.desc())
-
-    # paginate using SQLAlchemy
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # base query for current user's links, keyset on (created_at, id)
+    query = Link.query.filter_by(user_id=current_user.id)
+    pagination = keyset_page(
+        query, Link.created_at, Link.id, per_page,
+        after=request.args.get("after"),
+        before=request.args.get("before")
+    )
     links = pagination.items
 
-    # calculate serial number start
-    start_index = (page - 1) * per_page + 1
+    # serial number start is carried along in the url, no OFFSET/COUNT needed
+    start_index = max(request.args.get("start", 1, type=int), 1)
     end_index = start_index + len(links) - 1
-    total_links = pagination.total
+    # O(1): denormalized counters on the user row (current_user is a slim principal)
+    total_links, total_clicks = db.session.query(
+        User.total_links, User.total_clicks
+    ).filter(User.id == current_user.id).one()
+    total_links, total_clicks = total_links or 0, total_clicks or 0
 
     return render_template(
         "dashboard.html",
         links=links,
-        page=page,
-        total_pages=pagination.pages,
         start_index=start_index,
         end_index=end_index,
-        total_links=total_links
+        total_links=total_links,
+        total_clicks=total_clicks,
+        next_cursor=pagination.next_cursor,
+        prev_cursor=pagination.prev_cursor,
+        per_page=per_page
     )
     # return render_template('dashboard.html', links=links)
 
 
+# ===> BULK CREATE - JSON array or CSV body of URLs <=====
+
+@bp.route('/links/bulk', methods=['POST'])
+@login_required
+def bulk_create():
+    fmt = 'csv' if request.mimetype in ('text/csv', 'text/plain') else 'json'
+    try:
+        urls = parse_urls(request.get_data(as_text=True), fmt)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    if len(urls) > current_app.config['BULK_MAX_LINKS']:
+        return jsonify(error=f"At most {current_app.config['BULK_MAX_LINKS']} URLs per request"), 413
+
+    created = []
+    try:
+        for codes in iter_bulk_create(current_user.id, urls, current_app.config['BULK_INSERT_CHUNK']):
+            created.extend(codes)
+    except Exception as e:
+        logging.error(f"Bulk create failed after {len(created)} links: {e}")
+        # chunks committed before the failure are still returned
+        return jsonify(error="Error saving URLs", links=_bulk_result(urls, created)), 500
+
+    return jsonify(links=_bulk_result(urls, created)), 201
+
+
+def _bulk_result(urls, codes):
+    return [
+        {'url': url, 'short_code': code, 'short_url': request.host_url + code}
+        for url, code in zip(urls, codes)
+    ]
+
+
 # ===> REDIRECT LOGIC - short_url (generated) <=====
 
-@bp.route('/<short_code>')
-def redirect_to_url(short_code):
-    # Search the database for this specific 1-char code
+def _load_link(short_code):
+    # hot links from the on-disk snapshot, no query needed
+    link = link_snapshot.get(short_code)
+    if link is not None:
+        return link
+    # Search the database for this specific short code
     # .first() bcz 'short_code'=unique
+    row = db.session.query(
+        Link.id, Link.original_url, Link.user_id,
+        Link.redirect_permanent, Link.redirect_max_age, Link.redirect_public
+    ).filter_by(short_code=short_code).first()
+    return CachedLink(*row) if row else None
 
-    link = Link.query.filter_by(short_code=short_code).first()
+
+@bp.route('/<short_code>')
+def redirect_to_url(short_code):
+    # definite misses (bot probes) skip the cache and the DB
+    code_filter.ensure_started()
+    if not code_filter.might_exist(short_code):
+        link = None
+    else:
+        # cache hit (positive or negative) skips the SELECT entirely
+        link = link_cache.get_or_load(short_code, _load_link)
 
     if link:
         # if found, then redirect to original_orl
-        # Link.times_visited += 1
-        link.clicks +=1
-        db.session.commit()
-        return redirect(link.original_url)
+        # click is counted in memory and flushed in bulk later
+        click_counter.incr(link.id, link.user_id)
+        click_events.record_request(link.id, request)
+        # 301/302 + Cache-Control per link, so browsers/CDNs can absorb repeats
+        status, headers = redirect_headers(link, current_app.config['REDIRECT_MAX_AGE_LIMIT'])
+        response = redirect(link.original_url, status)
+        response.headers.extend(headers)
+        return response
     
     #if not, then don't exist
     flash("Sorry, that short link doesn't exist!", "error")
@@ -127,16 +215,46 @@ def delete_link(id):
 
     try:
         db.session.delete(link)
+        shortcode_allocator.free(link.short_code)
+        aggregates.link_deleted(link.user_id, link.clicks)
         db.session.commit()
+        link_cache.invalidate(link.short_code)
+        link_snapshot.invalidate(link.short_code)
+        redirect_purger.purge([link.short_code])
+        code_filter.removed()
+        click_counter.discard(link.id)
+        fragment_cache.invalidate(link.id)
         flash(f'Shrot URL Deleted & Short Code freed!', 'success')
     except:
         db.session.rollback()
         flash(f'Unable to delete short url', 'error')
     return redirect(url_for('main.dashboard'))
 
+# ==> Click stats for charts (rollups only) <==
+
+@bp.route('/links/<int:id>/stats')
+@login_required
+def link_stats(id):
+    link = Link.query.get_or_404(id)
+    if link.user_id != current_user.id and current_user.role != 'admin':
+        abort(404)
+
+    try:
+        series = clicks_series(link.id, request.args.get('period', 'hour'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify(
+        link_id=link.id,
+        period=request.args.get('period', 'hour'),
+        series=[{'bucket': start.isoformat(), 'clicks': clicks} for start, clicks in series]
+    )
+
 # ==> Profile Page <== 
 
 @bp.route('/profile')
 @login_required
 def profile():
-    return render_template('profile.html', user=current_user)
+    # the only page that needs the full profile row
+    user = db.session.get(User, current_user.id)
+    return render_template('profile.html', user=user)
@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Link, User
+
+
+COLUMNS = ('id', 'short_code', 'original_url', 'user_id', 'username', 'clicks', 'created_at')
+
+
+def export_max_id():
+    """Highest link id right now: the upper bound that keeps an export and
+    its resumed continuations consistent while links are being added."""
+    return db.session.scalar(select(func.max(Link.id))) or 0
+
+
+def iter_links(user_id=None, after_id=None, max_id=None, batch_size=1000):
+    """Link rows ordered by id, streamed from a server-side cursor.
+
+    Only (after_id, max_id] is read, so an interrupted export is resumed by
+    passing the last id it got as after_id.
+    """
+    links, users = Link.__table__, User.__table__
+    query = (
+        select(links.c.id, links.c.short_code, links.c.original_url, links.c.user_id,
+               users.c.username, links.c.clicks, links.c.created_at)
+        .join(users, users.c.id == links.c.user_id)
+        .order_by(links.c.id)
+    )
+    if user_id is not None:
+        query = query.where(links.c.user_id == user_id)
+    if after_id is not None:
+        query = query.where(links.c.id > after_id)
+    if max_id is not None:
+        query = query.where(links.c.id <= max_id)
+
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        yield rows
+
+
+def _record(row):
+    record = dict(zip(COLUMNS, row))
+    record['clicks'] = record['clicks'] or 0
+    if record['created_at'] is not None:
+        record['created_at'] = record['created_at'].isoformat()
+    return record
+
+
+def csv_chunks(batches):
+    """One CSV chunk per batch of rows, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in batches:
+        for row in rows:
+            writer.writerow(_record(row).values())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def json_chunks(batches):
+    """A JSON array, one chunk per batch of rows."""
+    yield '['
+    first = True
+    for rows in batches:
+        parts = []
+        for row in rows:
+            parts.append(('\n' if first else ',\n') + json.dumps(_record(row)))
+            first = False
+        yield ''.join(parts)
+    yield '\n]\n'
+
+
+def gzip_chunks(chunks):
+    """gzip-compress a stream of text chunks as they are produced."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+FORMATS = {
+    'csv': (csv_chunks, 'text/csv'),
+    'json': (json_chunks, 'application/json'),
+}
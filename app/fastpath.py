@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import math
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.urls import iri_to_uri
+
+from app import db
+from app.analytics import click_events
+from app.cache import link_cache, CachedLink
+from app.codefilter import code_filter
+from app.clicks import click_counter
+from app.models import Link
+from app.ratelimit import client_ip, rate_limiter
+from app.redirects import redirect_headers
+from app.warmup import link_snapshot
+from app.workers import drain_all
+
+
+# sync driver in DATABASE_URL -> async driver for the same database
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_url(url):
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"no async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class RedirectApp:
+    """Bare ASGI app that only answers GET/HEAD /<short_code>.
+
+    No sessions, Flask-Login, templates or blueprint dispatch: a hit is a
+    cache lookup plus two in-memory counter bumps. It shares the Link model,
+    the link cache and the click/analytics flushers with the Flask app it is
+    built from, but queries through its own async engine and pool.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+        config.setdefault('REDIRECT_DB_POOL_SIZE', 10)
+        config.setdefault('REDIRECT_DB_MAX_OVERFLOW', 10)
+        config.setdefault('REDIRECT_NOT_FOUND_URL', '/')
+
+        with flask_app.app_context():
+            url = db.engine.url
+        self.engine = create_async_engine(
+            async_url(url),
+            pool_size=int(config['REDIRECT_DB_POOL_SIZE']),
+            max_overflow=int(config['REDIRECT_DB_MAX_OVERFLOW']),
+            pool_pre_ping=bool(config.get('DB_POOL_PRE_PING', True)),
+        )
+        self.not_found_url = config['REDIRECT_NOT_FOUND_URL'].encode('latin-1')
+
+        links = Link.__table__
+        self._lookup = select(
+            links.c.id, links.c.original_url, links.c.user_id,
+            links.c.redirect_permanent, links.c.redirect_max_age, links.c.redirect_public,
+        )
+        self.max_age_limit = int(config.get('REDIRECT_MAX_AGE_LIMIT', 3600))
+        # short_code -> task loading it, shared by concurrent misses
+        self._loading = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._handle(scope, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # periodic filter rebuilds; without them nothing settles
+                # and the filter can't reject unsaved allocator codes
+                code_filter.ensure_started()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                # pending clicks/events go out through the sync engine
+                await asyncio.to_thread(drain_all)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _handle(self, scope, send):
+        if scope['method'] not in ('GET', 'HEAD'):
+            return await _respond(send, 405, [(b'allow', b'GET, HEAD')])
+
+        short_code = scope['path'][1:]
+        if not short_code or '/' in short_code:
+            return await _respond(send, 404)
+
+        headers = dict(scope['headers'])
+        # same limits as the Flask route
+        remote_addr = scope['client'][0] if scope.get('client') else None
+        forwarded_for = headers.get(b'x-forwarded-for', b'').decode('latin-1')
+        wait = rate_limiter.check('main.redirect_to_url', scope['method'], {
+            'ip': client_ip(remote_addr, forwarded_for, rate_limiter.proxy_hops),
+            'code': short_code,
+        })
+        if wait:
+            return await _respond(send, 429, [(b'retry-after', str(math.ceil(wait)).encode())])
+
+        try:
+            link = await self.resolve(short_code)
+        except Exception as e:
+            logging.error(f"Redirect lookup failed for {short_code!r}: {e}")
+            return await _respond(send, 503)
+
+        if link is None:
+            return await _respond(send, 302, [(b'location', self.not_found_url)])
+
+        referrer = headers.get(b'referer', b'').decode('latin-1')
+        user_agent = headers.get(b'user-agent', b'').decode('latin-1')
+        country = click_events.country_from(
+            lambda name: headers.get(name.lower().encode('latin-1'), b'').decode('latin-1'))
+
+        click_counter.incr(link.id, link.user_id)
+        click_events.record(link.id, referrer, user_agent, country)
+        status, policy = redirect_headers(link, self.max_age_limit)
+        await _respond(send, status, [
+            (b'location', iri_to_uri(link.original_url).encode('latin-1')),
+            *((name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in policy),
+        ])
+
+    async def resolve(self, short_code):
+        # servers without lifespan events: started by the first request
+        code_filter.ensure_started()
+        if not code_filter.might_exist(short_code):
+            return None
+        hit, link = link_cache.lookup(short_code)
+        if hit:
+            return link
+        link = link_snapshot.get(short_code)
+        if link is not None:
+            link_cache.set(short_code, link)
+            return link
+
+        task = self._loading.get(short_code)
+        if task is None:
+            task = self._loading[short_code] = asyncio.ensure_future(self._load(short_code))
+            task.add_done_callback(lambda _: self._loading.pop(short_code, None))
+        # shielded: one client disconnecting doesn't cancel the others' load
+        return await asyncio.shield(task)
+
+    async def _load(self, short_code):
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(self._lookup.where(Link.__table__.c.short_code == short_code))).first()
+        link = CachedLink(*row) if row else None
+        link_cache.set(short_code, link)
+        return link
+
+
+async def _respond(send, status, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-length', b'0'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': b''})
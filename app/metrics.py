@@ -0,0 +1,347 @@
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+from app.workers import PeriodicFlusher
+
+
+# counters/histograms of exited processes, folded into one file
+EXITED = 'metrics-exited.json'
+
+# request latency buckets, seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help) for every metric that can show up in /metrics
+METRICS = {
+    'shortener_http_request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'shortener_http_requests_total': ('counter', 'Requests by endpoint and status'),
+    'shortener_links_created_total': ('counter', 'Links created (dashboard, bulk and CLI)'),
+    'shortener_link_cache_hits_total': ('counter', 'Redirect cache hits'),
+    'shortener_link_cache_misses_total': ('counter', 'Redirect cache misses'),
+    'shortener_link_cache_evictions_total': ('counter', 'Redirect cache evictions'),
+    'shortener_link_cache_coalesced_total': ('counter', 'Redirect cache misses that waited for a load already in progress'),
+    'shortener_link_cache_refreshes_total': ('counter', 'Redirect cache entries reloaded shortly before expiry'),
+    'shortener_link_cache_entries': ('gauge', 'Entries in the redirect cache'),
+    'shortener_link_cache_hit_ratio': ('gauge', 'Redirect cache hits / lookups'),
+    'shortener_clicks_pending': ('gauge', 'Click deltas waiting for the next flush'),
+    'shortener_clicks_flushed_total': ('counter', 'Click deltas written to the links table'),
+    'shortener_click_events_buffered': ('gauge', 'Click events waiting for the next flush'),
+    'shortener_click_events_dropped_total': ('counter', 'Click events dropped because the buffer was full'),
+    'shortener_code_filter_rejected_total': ('counter', 'Redirects answered as not found by the short code filter alone'),
+    'shortener_code_filter_items': ('gauge', 'Codes in the short code filter'),
+    'shortener_code_filter_bytes': ('gauge', 'Memory used by the short code filter'),
+    'shortener_rate_limited_total': ('counter', 'Requests answered 429 by the rate limiter'),
+    'shortener_rate_limit_buckets': ('gauge', 'Rate limit buckets held in this process'),
+    'shortener_password_hash_rejected_total': ('counter', 'Logins/signups turned away because the hashing pool was full'),
+    'shortener_fragment_cache_hits_total': ('counter', 'Table rows served from the fragment cache'),
+    'shortener_fragment_cache_misses_total': ('counter', 'Table rows rendered because they were not cached'),
+    'shortener_fragment_cache_table_hits_total': ('counter', 'Dashboard/admin table bodies served whole from the cache'),
+    'shortener_db_pool_checked_out': ('gauge', 'DB connections in use'),
+    'shortener_db_pool_idle': ('gauge', 'DB connections idle in the pool'),
+    'shortener_db_pool_checkouts_total': ('counter', 'DB connection checkouts'),
+    'shortener_db_pool_timeouts_total': ('counter', 'DB connection checkouts that timed out'),
+}
+
+
+class _Shard:
+    """Counters/histograms written by a single thread."""
+
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+
+class Metrics(PeriodicFlusher):
+    """In-process metrics, rendered in the Prometheus text format at /metrics.
+
+    Each thread writes to its own shard, so recording is a dict update with
+    no lock; shards are only summed when /metrics is scraped. Gauges (pending
+    clicks, pool, cache size) are read from the existing stats() at scrape time.
+
+    With METRICS_DIR set, every process also writes its snapshot to
+    METRICS_DIR/metrics-<pid>.json every METRICS_FLUSH_INTERVAL seconds and
+    on exit, and /metrics sums all of them: any gunicorn worker answers for
+    the whole server. Counters of exited workers are kept (totals don't go
+    backwards), their gauges are not: their files are folded into
+    metrics-exited.json and removed (gunicorn's child_exit hook, or the
+    next scrape), so recycled workers don't pile up files.
+    """
+
+    def __init__(self):
+        super().__init__('metrics-writer', 'METRICS_FLUSH_INTERVAL', 15)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self.directory = None
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_TOKEN', None)
+
+        self.directory = app.config['METRICS_DIR']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['metrics'] = self
+
+    # ===== Recording =====
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        counters = self._shard().counters
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histograms = self._shard().histograms
+        buckets = histograms.get(key)
+        if buckets is None:
+            # one slot per bucket, one for +Inf, then the running sum
+            buckets = histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        buckets[bisect_left(BUCKETS, seconds)] += 1
+        buckets[-1] += seconds
+
+    def _start(self):
+        self.ensure_started()
+        g._metrics_started = time.perf_counter()
+
+    def _finish(self, response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            self.observe('shortener_http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+            self.inc('shortener_http_requests_total', endpoint=endpoint, status=str(response.status_code))
+        return response
+
+    # ===== Collecting =====
+
+    def snapshot(self):
+        """This process's metrics as plain, JSON-friendly data."""
+        counters, histograms = {}, {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in dict(shard.counters).items():
+                counters[key] = counters.get(key, 0) + value
+            for key, buckets in dict(shard.histograms).items():
+                merged = histograms.setdefault(key, [0] * len(buckets))
+                for i, value in enumerate(list(buckets)):
+                    merged[i] += value
+
+        gauges = {}
+        for name, value, kind in _read_stats():
+            (counters if kind == 'counter' else gauges)[(name, ())] = value
+
+        return {
+            'pid': os.getpid(),
+            'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, dict(labels), buckets] for (name, labels), buckets in histograms.items()],
+            'gauges': [[name, dict(labels), value] for (name, labels), value in gauges.items()],
+        }
+
+    def flush(self):
+        if not self.directory:
+            return
+        _write(os.path.join(self.directory, f'metrics-{os.getpid()}.json'), self.snapshot())
+
+    def _snapshots(self):
+        own = self.snapshot()
+        if not self.directory:
+            return [own]
+        paths = glob.glob(os.path.join(self.directory, 'metrics-*.json'))
+        exited = [pid for pid in filter(None, map(_pid_of, paths)) if pid != own['pid'] and not _alive(pid)]
+        for pid in exited:
+            fold_exited(self.directory, pid)
+        if exited:
+            paths = glob.glob(os.path.join(self.directory, 'metrics-*.json'))
+
+        snapshots = [own]
+        for path in paths:
+            other = _load(path)
+            if other is not None and other['pid'] != own['pid']:
+                snapshots.append(other)
+        return snapshots
+
+    def render(self):
+        """Prometheus text exposition of every process's metrics."""
+        values, histograms = {}, {}
+        for snap in self._snapshots():
+            for name, labels, value in snap['counters'] + snap['gauges']:
+                key = (name, tuple(sorted(labels.items())))
+                values[key] = values.get(key, 0) + value
+            for name, labels, buckets in snap['histograms']:
+                key = (name, tuple(sorted(labels.items())))
+                merged = histograms.setdefault(key, [0] * len(buckets))
+                for i, value in enumerate(buckets):
+                    merged[i] += value
+
+        hits = values.get(('shortener_link_cache_hits_total', ()), 0)
+        misses = values.get(('shortener_link_cache_misses_total', ()), 0)
+        values[('shortener_link_cache_hit_ratio', ())] = hits / (hits + misses) if hits + misses else 0.0
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for (metric, labels), buckets in sorted(histograms.items()):
+                    if metric == name:
+                        lines.extend(_histogram_lines(name, labels, buckets))
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _read_stats():
+    """(name, value, kind) read from the caches/flushers/pool of this process."""
+    from app import db
+    from app.analytics import click_events
+    from app.cache import link_cache
+    from app.clicks import click_counter
+    from app.codefilter import code_filter
+    from app.passwords import password_hasher
+    from app.pool import pool_stats
+    from app.ratelimit import rate_limiter
+    from app.templating import fragment_cache
+
+    cache = link_cache.stats()
+    clicks = click_counter.stats()
+    events = click_events.stats()
+    pool = pool_stats(db.engine)
+    codes = code_filter.stats()
+    fragments = fragment_cache.stats()
+    return [
+        ('shortener_link_cache_hits_total', cache['hits'], 'counter'),
+        ('shortener_link_cache_misses_total', cache['misses'], 'counter'),
+        ('shortener_link_cache_evictions_total', cache['evictions'], 'counter'),
+        ('shortener_link_cache_coalesced_total', cache['coalesced'], 'counter'),
+        ('shortener_link_cache_refreshes_total', cache['refreshes'], 'counter'),
+        ('shortener_link_cache_entries', cache['size'], 'gauge'),
+        ('shortener_clicks_pending', clicks['pending_clicks'], 'gauge'),
+        ('shortener_clicks_flushed_total', clicks['flushed_clicks'], 'counter'),
+        ('shortener_click_events_buffered', events['buffered'], 'gauge'),
+        ('shortener_click_events_dropped_total', events['dropped'], 'counter'),
+        ('shortener_code_filter_rejected_total', codes['rejected'], 'counter'),
+        ('shortener_code_filter_items', codes['items'], 'gauge'),
+        ('shortener_code_filter_bytes', codes['bytes'], 'gauge'),
+        ('shortener_rate_limited_total', rate_limiter.limited, 'counter'),
+        ('shortener_rate_limit_buckets', len(rate_limiter.backend), 'gauge'),
+        ('shortener_password_hash_rejected_total', password_hasher.rejected, 'counter'),
+        ('shortener_fragment_cache_hits_total', fragments['hits'], 'counter'),
+        ('shortener_fragment_cache_misses_total', fragments['misses'], 'counter'),
+        ('shortener_fragment_cache_table_hits_total', fragments['table_hits'], 'counter'),
+        ('shortener_db_pool_checked_out', pool.get('checked_out', 0), 'gauge'),
+        ('shortener_db_pool_idle', pool.get('idle', 0), 'gauge'),
+        ('shortener_db_pool_checkouts_total', pool.get('checkouts', 0), 'counter'),
+        ('shortener_db_pool_timeouts_total', pool.get('timeouts', 0), 'counter'),
+    ]
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(name, labels, buckets):
+    cumulative = 0
+    for bound, count in zip(BUCKETS + ('+Inf',), buckets[:-1]):
+        cumulative += count
+        yield f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}'
+    yield f'{name}_sum{_labels(labels)} {_number(float(buckets[-1]))}'
+    yield f'{name}_count{_labels(labels)} {cumulative}'
+
+
+def _pid_of(path):
+    """pid in a metrics-<pid>.json name, None for the exited totals."""
+    name = os.path.basename(path)[len('metrics-'):-len('.json')]
+    return int(name) if name.isdigit() else None
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, snapshot):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(path + '.tmp', path)
+
+
+def fold_exited(directory, pid):
+    """Add an exited process's counters and histograms to metrics-exited.json
+    and remove its file. Safe to call from several processes at once."""
+    path = os.path.join(directory, f'metrics-{pid}.json')
+    with open(os.path.join(directory, 'metrics.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.exists(path):
+            return  # folded by someone else
+        snap = _load(path)
+        if snap is not None:
+            exited_path = os.path.join(directory, EXITED)
+            exited = _load(exited_path) or {'pid': None, 'counters': [], 'histograms': [], 'gauges': []}
+            counters = {(name, tuple(sorted(labels.items()))): value for name, labels, value in exited['counters']}
+            histograms = {(name, tuple(sorted(labels.items()))): buckets for name, labels, buckets in exited['histograms']}
+            for name, labels, value in snap['counters']:
+                key = (name, tuple(sorted(labels.items())))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets in snap['histograms']:
+                key = (name, tuple(sorted(labels.items())))
+                merged = histograms.setdefault(key, [0] * len(buckets))
+                for i, value in enumerate(buckets):
+                    merged[i] += value
+            exited['counters'] = [[name, dict(labels), value] for (name, labels), value in counters.items()]
+            exited['histograms'] = [[name, dict(labels), buckets] for (name, labels), buckets in histograms.items()]
+            _write(exited_path, exited)
+        os.remove(path)
+
+
+def clear_directory(directory):
+    """Drop snapshots of a previous server run (call once, before workers start)."""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        os.remove(path)
+
+
+metrics = Metrics()
@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from app.passwords import password_hasher
 from flask_login import UserMixin
 from sqlalchemy import CheckConstraint
 
@@ -17,6 +18,9 @@ class User(db.Model, UserMixin):
 
     username = db.Column(db.String(50), unique=True, nullable=False)
     total_links = db.Column(db.Integer, default=0)
+    # maintained incrementally, see app/aggregates.py
+    total_clicks = db.Column(db.BigInteger, default=0, server_default='0')
+    last_link_created_at = db.Column(db.DateTime, nullable=True)
     created_by_agency = db.Column(db.String(120), nullable=True)
     
     #additional fields for profile page
@@ -27,8 +31,9 @@ class User(db.Model, UserMixin):
     profession = db.Column(db.String(100), nullable=False)     
     bio = db.Column(db.String(250), nullable=True)    
 
+    # hashes inline; request handlers go through password_hasher's pool
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash_inline(password)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -55,5 +60,79 @@ class Link(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship('User', backref='links')
 
+    # how clients/CDNs may cache the redirect, see app/redirects.py
+    redirect_permanent = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    redirect_max_age = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    redirect_public = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    # bumped on every edit, keys the cached table rows (app/templating.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    # match the dashboard filter+order and the admin per-user listing,
+    # see app/queryplans.py
+    __table_args__ = (
+        db.Index('ix_links_user_created_id', user_id, created_at.desc(), id.desc()),
+        db.Index('ix_links_user_id_id', user_id, id),
+    )
+
+    def __repr__(self):
+        return f'<Link {self.short_code}>'
+
+
+# ===== Short code allocation (see app/shortcodes.py) =====
+
+class ShortCodeCounter(db.Model):
+    __tablename__ = 'short_code_counters'
+
+    # one row per code length tier
+    length = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    next_index = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ShortCodeCounter {self.length}: {self.next_index}>'
+
+
+class FreeShortCode(db.Model):
+    __tablename__ = 'free_short_codes'
+
+    # codes of deleted links, waiting to be handed out again
+    short_code = db.Column(db.String(10), primary_key=True)
+    freed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # set when an allocator hands the code out again, the row is purged later
+    taken_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<FreeShortCode {self.short_code}>'
+
+
+# ===== Click analytics (see app/analytics.py) =====
+
+class ClickEvent(db.Model):
+    __tablename__ = 'click_events'
+
+    # append-only, no FK so deleting a link keeps its history
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    link_id = db.Column(db.Integer, nullable=False)
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    referrer_host = db.Column(db.String(255), nullable=True)
+    ua_class = db.Column(db.String(10), nullable=False)
+    country = db.Column(db.String(2), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_click_events_link_id_occurred_at', 'link_id', 'occurred_at'),
+    )
+
+    def __repr__(self):
+        return f'<ClickEvent {self.link_id} @ {self.occurred_at}>'
+
+
+class ClickRollup(db.Model):
+    __tablename__ = 'click_rollups'
+
+    link_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    period = db.Column(db.String(6), primary_key=True)   # minute / hour / day
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    clicks = db.Column(db.Integer, nullable=False, default=0)
+
     def __repr__(self):
-        return f'<Link {self.short_code}>'
\ No newline at end of file
+        return f'<ClickRollup {self.link_id} {self.period} {self.bucket_start}: {self.clicks}>'
@@ -0,0 +1,118 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusy(Exception):
+    """The hashing pool is saturated; the caller should answer 503 right away."""
+
+
+class PasswordHasher:
+    """Runs password KDFs on a small bounded pool instead of request threads.
+
+    At most PASSWORD_HASH_WORKERS hashes run at once per process and up to
+    PASSWORD_HASH_QUEUE more may wait; past that `hash()`/`verify()` raise
+    HashingBusy without doing any work, so a login storm is turned away
+    instead of tying up every request thread (and the redirects sharing them).
+
+    scrypt and pbkdf2 release the GIL, so the default thread pool hashes in
+    parallel; PASSWORD_HASH_EXECUTOR=process isolates it further. The pool is
+    created lazily per pid, so pre-forked workers each get their own.
+
+    PASSWORD_HASH_METHOD is any werkzeug method string, e.g. "scrypt",
+    "scrypt:65536:8:1" or "pbkdf2:sha256:600000". Hashes made with other
+    parameters are upgraded on the next successful login (`needs_rehash`).
+    """
+
+    def __init__(self, method='scrypt', workers=2, queue=8, timeout=10, executor='thread'):
+        self.method = method
+        self.workers = workers
+        self.queue = queue
+        self.timeout = timeout
+        self.executor_kind = executor
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+        self._lock = threading.Lock()
+        self._prefix = None
+        self.rejected = 0
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_QUEUE', 8)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+        app.config.setdefault('PASSWORD_HASH_EXECUTOR', 'thread')
+
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = max(int(app.config['PASSWORD_HASH_WORKERS']), 1)
+        self.queue = max(int(app.config['PASSWORD_HASH_QUEUE']), 0)
+        self.timeout = float(app.config['PASSWORD_HASH_TIMEOUT'])
+        self.executor_kind = app.config['PASSWORD_HASH_EXECUTOR']
+        with self._lock:
+            self._shutdown()
+            self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+        self._prefix = None
+        self.rejected = 0
+        app.extensions['password_hasher'] = self
+
+    def _shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._pid = None
+
+    def _pool(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    kind = ProcessPoolExecutor if self.executor_kind == 'process' else ThreadPoolExecutor
+                    self._executor = kind(max_workers=self.workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusy()
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise HashingBusy() from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def hash_inline(self, password):
+        """Hash in the calling thread (CLI, scripts, tests)."""
+        return generate_password_hash(password, self.method)
+
+    def needs_rehash(self, password_hash):
+        """True if password_hash wasn't made with the configured method/cost."""
+        if self._prefix is None:
+            # "scrypt" -> "scrypt:32768:8:1", as werkzeug fills in defaults
+            self._prefix = generate_password_hash('', self.method, salt_length=1).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._prefix
+
+    def stats(self):
+        return {
+            'method': self.method,
+            'executor': self.executor_kind,
+            'workers': self.workers,
+            'queue': self.queue,
+            'rejected': self.rejected,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+from app.workers import PeriodicFlusher
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection.
+
+    The time includes opening a new connection when the pool has to grow.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_* settings in config."""
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    options = {
+        'pool_pre_ping': bool(config['DB_POOL_PRE_PING']),
+        'pool_recycle': int(config['DB_POOL_RECYCLE']),
+    }
+
+    # in-memory SQLite needs its single shared connection, leave it alone
+    if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+        return options
+
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': int(config['DB_POOL_SIZE']),
+        'max_overflow': int(config['DB_MAX_OVERFLOW']),
+        'pool_timeout': float(config['DB_POOL_TIMEOUT']),
+    })
+
+    timeout_ms = int(config['DB_STATEMENT_TIMEOUT_MS'] or 0)
+    if timeout_ms and uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+    return options
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            # negative while the pool hasn't opened pool_size connections yet
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+        })
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                'checkouts': pool.checkouts,
+                'timeouts': pool.timeouts,
+                'wait_avg_ms': (pool.wait_total / pool.checkouts * 1000) if pool.checkouts else 0.0,
+                'wait_max_ms': pool.wait_max * 1000,
+            })
+    return stats
+
+
+class PoolStatsLogger(PeriodicFlusher):
+    """Logs one pool_stats line every DB_POOL_LOG_INTERVAL seconds (0 = off)."""
+
+    def __init__(self):
+        super().__init__('pool-stats-logger', 'DB_POOL_LOG_INTERVAL', 0)
+
+    def flush(self):
+        from app import db
+        stats = pool_stats(db.engine)
+        logging.info("db pool " + " ".join(f"{key}={value}" for key, value in stats.items()))
+
+    def drain(self, timeout=5):
+        """Nothing is buffered; the last line is only logged when logging is on."""
+        if self.interval <= 0:
+            self._stop.set()
+            return
+        super().drain(timeout)
+
+
+pool_logger = PoolStatsLogger()
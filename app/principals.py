@@ -0,0 +1,95 @@
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+from app import db
+from app.cache import TTLCache
+from app.models import User
+
+
+# columns a principal is built from; changing any of them drops the cache entry
+PRINCIPAL_FIELDS = ('id', 'username', 'email', 'role', 'is_active')
+
+
+class UserPrincipal(UserMixin):
+    """Slim, read-only stand-in for User as Flask-Login's current_user.
+
+    Carries only what auth checks and the nav bar need, so requests don't
+    load profile columns (bio, profession, ...). Views that need the full
+    row load it explicitly.
+    """
+
+    __slots__ = PRINCIPAL_FIELDS
+
+    def __init__(self, id, username, email, role, is_active):
+        for name, value in zip(PRINCIPAL_FIELDS, (id, username, email, role, is_active)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserPrincipal is read-only")
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def __repr__(self):
+        return f'<UserPrincipal {self.email} - {self.role}>'
+
+
+class PrincipalCache(TTLCache):
+    """user id -> UserPrincipal, used by the Flask-Login user_loader."""
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_SIZE', 10000)
+        app.config.setdefault('USER_CACHE_TTL', 30)
+
+        self.maxsize = int(app.config['USER_CACHE_SIZE'])
+        self.ttl = self.negative_ttl = float(app.config['USER_CACHE_TTL'])
+        self.clear()
+        app.extensions['principal_cache'] = self
+
+
+principal_cache = PrincipalCache()
+
+
+def _load_principal(user_id):
+    row = db.session.query(*(getattr(User, name) for name in PRINCIPAL_FIELDS)).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    return UserPrincipal(row.id, row.username, row.email, row.role,
+                         row.is_active if row.is_active is not None else True)
+
+
+def load_principal(user_id):
+    return principal_cache.get_or_load(user_id, _load_principal)
+
+
+# ===== Invalidation: drop entries once a relevant change is committed =====
+
+def _queue_invalidation(target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('principal_invalidations', set()).add(target.id)
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in PRINCIPAL_FIELDS):
+        _queue_invalidation(target)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    _queue_invalidation(target)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_invalidations(session):
+    for user_id in session.info.pop('principal_invalidations', ()):
+        principal_cache.invalidate(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('principal_invalidations', None)
@@ -0,0 +1,117 @@
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import select, text, tuple_
+
+from app.models import Link, User, ClickRollup
+
+
+# allow_scan: the query reads the whole table by design (walks the PK)
+# no_sort: the ORDER BY must come straight from an index
+HotQuery = namedtuple('HotQuery', ['name', 'statement', 'allow_scan', 'no_sort'])
+
+PlanResult = namedtuple('PlanResult', ['name', 'ok', 'problems', 'plan'])
+
+
+def hot_queries():
+    """Every query on a hot path in routes.py / admin.py / auth.py.
+
+    Keep these in step with the views; values are placeholders, only the
+    shape of each statement matters for the plan.
+    """
+    cursor = (datetime(2026, 1, 1), 100)
+    dashboard = select(Link).where(Link.user_id == 1)
+
+    return [
+        HotQuery('main.redirect_to_url: link by short_code',
+                 select(Link.id, Link.original_url, Link.user_id).where(Link.short_code == 'abc'),
+                 False, False),
+        HotQuery('main.dashboard: first page',
+                 dashboard.order_by(Link.created_at.desc(), Link.id.desc()).limit(11),
+                 False, True),
+        HotQuery('main.dashboard: after cursor',
+                 dashboard.where(tuple_(Link.created_at, Link.id) < cursor)
+                 .order_by(Link.created_at.desc(), Link.id.desc()).limit(11),
+                 False, True),
+        HotQuery('main.dashboard: before cursor',
+                 dashboard.where(tuple_(Link.created_at, Link.id) > cursor)
+                 .order_by(Link.created_at.asc(), Link.id.asc()).limit(11),
+                 False, True),
+        HotQuery('main.delete_link / edit: link by id',
+                 select(Link).where(Link.id == 1),
+                 False, False),
+        HotQuery('main.link_stats: rollup series',
+                 select(ClickRollup.bucket_start, ClickRollup.clicks)
+                 .where(ClickRollup.link_id == 1, ClickRollup.period == 'hour',
+                        ClickRollup.bucket_start >= cursor[0])
+                 .order_by(ClickRollup.bucket_start),
+                 False, True),
+        HotQuery('admin.admin_user_links: one user',
+                 select(Link).where(Link.user_id == 1).order_by(Link.id.desc()).limit(51),
+                 False, True),
+        HotQuery('admin.admin_user_links: all users',
+                 select(Link).where(Link.id < 100).order_by(Link.id.desc()).limit(51),
+                 True, True),
+        HotQuery('auth.login: user by email',
+                 select(User).where(User.email == 'someone@example.com'),
+                 False, False),
+        HotQuery('auth.signup: email or username taken',
+                 select(User).where((User.email == 'someone@example.com') | (User.username == 'someone')),
+                 False, False),
+        HotQuery('load_user: user by id',
+                 select(User).where(User.id == 1),
+                 False, False),
+    ]
+
+
+def _sqlite_problems(conn, sql, query):
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    plan = [row[-1] for row in rows]
+    problems = []
+    for detail in plan:
+        # "SCAN links" = full table scan, "SEARCH ... USING INDEX" is fine
+        if detail.startswith('SCAN ') and not query.allow_scan:
+            problems.append(detail)
+        if 'TEMP B-TREE' in detail and query.no_sort:
+            problems.append(detail)
+    return plan, problems
+
+
+def _walk(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _walk(child)
+
+
+def _postgres_problems(conn, sql, query):
+    # with seqscan disabled the planner only picks one if no index fits
+    conn.execute(text('SET LOCAL enable_seqscan = off'))
+    raw = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql).scalar()
+    root = (json.loads(raw) if isinstance(raw, str) else raw)[0]['Plan']
+    problems = []
+    for node in _walk(root):
+        if node['Node Type'] == 'Seq Scan' and not query.allow_scan:
+            problems.append(f"Seq Scan on {node.get('Relation Name')}")
+        if node['Node Type'] in ('Sort', 'Incremental Sort') and query.no_sort:
+            problems.append(f"{node['Node Type']} on {node.get('Sort Key')}")
+    return json.dumps(root), problems
+
+
+def check(engine):
+    """EXPLAIN every hot query; returns a PlanResult per query."""
+    if engine.dialect.name == 'sqlite':
+        explain = _sqlite_problems
+    elif engine.dialect.name == 'postgresql':
+        explain = _postgres_problems
+    else:
+        raise RuntimeError(f"no plan checker for {engine.dialect.name}")
+
+    results = []
+    with engine.connect() as conn:
+        for query in hot_queries():
+            sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+            with conn.begin():
+                plan, problems = explain(conn, sql, query)
+            results.append(PlanResult(query.name, not problems, problems, plan))
+    return results
@@ -0,0 +1,131 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestQueryStats:
+    """SQL statements issued while handling one request."""
+
+    __slots__ = ('count', 'total', 'slowest', 'slowest_statement')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+
+    def add(self, statement, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed >= self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = statement
+
+
+class QueryStats:
+    """Opt-in per-request SQL instrumentation (QUERY_STATS_ENABLED).
+
+    Counts statements, total DB time and the slowest statement of every
+    request, sends them back as a Server-Timing header and logs one
+    key=value line per request. Statements slower than QUERY_STATS_SLOW_MS
+    are logged on their own with their SQL.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_ms = 100.0
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_STATS_ENABLED', False)
+        app.config.setdefault('QUERY_STATS_SLOW_MS', 100)
+
+        self.enabled = bool(app.config['QUERY_STATS_ENABLED'])
+        self.slow_ms = float(app.config['QUERY_STATS_SLOW_MS'])
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['query_stats'] = self
+
+    def _start(self):
+        g.pop('_query_stats', None)
+        if self.enabled:
+            g._query_stats = RequestQueryStats()
+            g._request_started = time.perf_counter()
+
+    def _finish(self, response):
+        stats = g.pop('_query_stats', None)
+        if stats is None:
+            return response
+
+        elapsed_ms = (time.perf_counter() - g.pop('_request_started')) * 1000
+        db_ms, slowest_ms = stats.total * 1000, stats.slowest * 1000
+        response.headers.add('Server-Timing', f'db;desc="{stats.count} queries";dur={db_ms:.2f}')
+        response.headers.add('Server-Timing', f'db-slowest;dur={slowest_ms:.2f}')
+        response.headers.add('Server-Timing', f'app;dur={elapsed_ms:.2f}')
+        logging.info(
+            f"request endpoint={request.endpoint} method={request.method} status={response.status_code} "
+            f"queries={stats.count} db_ms={db_ms:.2f} slowest_ms={slowest_ms:.2f} total_ms={elapsed_ms:.2f}"
+        )
+        return response
+
+    def record(self, statement, elapsed):
+        stats = g.get('_query_stats')
+        if stats is None:
+            return
+        stats.add(statement, elapsed)
+        if elapsed * 1000 >= self.slow_ms:
+            logging.warning(
+                f"slow query endpoint={request.endpoint} ms={elapsed * 1000:.2f} sql={' '.join(statement.split())[:500]}"
+            )
+
+
+query_stats = QueryStats()
+
+
+# ===== Engine hooks: time every statement, attribute it to the current request =====
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    # background flushers run without a request, they aren't counted
+    if query_stats.enabled and has_request_context():
+        query_stats.record(statement, time.perf_counter() - started)
+
+
+# ===== Test helper =====
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail if the block issues more than `max_queries` SQL statements.
+
+        with query_budget(3):
+            client.get('/admin/users')
+
+    Yields the list of statements, so tests can also inspect them.
+    """
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+
+    if len(statements) > max_queries:
+        listing = '\n'.join(f'  {" ".join(s.split())[:200]}' for s in statements)
+        raise QueryBudgetExceeded(f"{len(statements)} queries, budget {max_queries}:\n{listing}")
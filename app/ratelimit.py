@@ -0,0 +1,184 @@
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+
+from flask import Response, request, session
+from werkzeug.utils import import_string
+
+
+# "<endpoint>[:<METHOD>]=<kind>:<count>/<period>,...; ..." (kinds: ip, user, code)
+DEFAULT_LIMITS = 'main.redirect_to_url=ip:50/s; main.dashboard:POST=user:30/m; auth.login:POST=ip:10/m'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# count requests per period, with bursts of up to count
+Limit = namedtuple('Limit', ['kind', 'count', 'period'])
+
+_LIMIT = re.compile(r'^(ip|user|code):(\d+)/(\d*)([smhd])$')
+
+
+def parse_limits(spec):
+    """RATELIMIT_LIMITS string -> {(endpoint, method or None): [Limit, ...]}."""
+    limits = {}
+    for rule in filter(None, (part.strip() for part in spec.split(';'))):
+        target, _, rates = rule.partition('=')
+        endpoint, _, method = target.strip().partition(':')
+        parsed = []
+        for rate in filter(None, (part.strip() for part in rates.split(','))):
+            match = _LIMIT.match(rate)
+            if match is None:
+                raise ValueError(f"invalid rate limit {rate!r} for {endpoint}")
+            kind, count, multiple, unit = match.groups()
+            parsed.append(Limit(kind, int(count), int(multiple or 1) * PERIODS[unit]))
+        limits[(endpoint, method.upper() or None)] = parsed
+    return limits
+
+
+def client_ip(remote_addr, forwarded_for, proxy_hops):
+    """The client address, trusting `proxy_hops` proxies' X-Forwarded-For."""
+    if proxy_hops > 0 and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',')]
+        if len(hops) >= proxy_hops:
+            return hops[-proxy_hops]
+    return remote_addr
+
+
+class RateLimitBackend:
+    """Where bucket state lives. Subclass for a shared store (e.g. Redis)."""
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def take(self, key, rate, burst, now):
+        """Spend one token from key's bucket (refilled at `rate`/s, holding
+        up to `burst`). Returns 0 if allowed, else seconds until it would be."""
+        raise NotImplementedError
+
+    def __len__(self):
+        """Buckets held in this process (0 for external stores)."""
+        return 0
+
+
+class MemoryBackend(RateLimitBackend):
+    """Token buckets in this process, spread over lock stripes.
+
+    A bucket left alone until it's full again is the same as no bucket, so
+    those are swept out; memory tracks active keys, not every key ever seen.
+    Past `max_keys` the oldest buckets are dropped (their keys start full).
+    """
+
+    def __init__(self, stripes=64, max_keys=100000, sweep_interval=10):
+        # per stripe: lock, {key: (tokens, updated_at, full_at)}, [next sweep]
+        self._stripes = [(threading.Lock(), {}, [0.0]) for _ in range(stripes)]
+        self.max_keys_per_stripe = max(max_keys // stripes, 1)
+        self.sweep_interval = sweep_interval
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_keys=int(config.get('RATELIMIT_MAX_KEYS', 100000)))
+
+    def take(self, key, rate, burst, now):
+        lock, buckets, next_sweep = self._stripes[hash(key) % len(self._stripes)]
+        with lock:
+            if now >= next_sweep[0]:
+                self._sweep(buckets, now)
+                next_sweep[0] = now + self.sweep_interval
+            state = buckets.get(key)
+            if state is None:
+                tokens = burst
+                while len(buckets) >= self.max_keys_per_stripe:
+                    del buckets[next(iter(buckets))]
+            else:
+                tokens = min(burst, state[0] + (now - state[1]) * rate)
+
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            return wait
+
+    @staticmethod
+    def _sweep(buckets, now):
+        for key in [key for key, state in buckets.items() if state[2] <= now]:
+            del buckets[key]
+
+    def __len__(self):
+        return sum(len(buckets) for _, buckets, _ in self._stripes)
+
+
+class RateLimiter:
+    """Per-endpoint token-bucket limits, checked before the view runs.
+
+    RATELIMIT_LIMITS maps endpoints (optionally per method) to limits keyed
+    by client ip, logged-in user id or short code. Over the limit the
+    request gets a 429 with Retry-After before anything touches the DB:
+    the user id comes from the session cookie, not from current_user.
+
+    With the default memory backend limits are per process. Behind a proxy
+    set RATELIMIT_PROXY_HOPS, or every client shares the proxy's address.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.limits = {}
+        self.backend = MemoryBackend()
+        self.proxy_hops = 0
+        self.limited = 0
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', False)
+        app.config.setdefault('RATELIMIT_LIMITS', DEFAULT_LIMITS)
+        app.config.setdefault('RATELIMIT_BACKEND', 'app.ratelimit.MemoryBackend')
+        app.config.setdefault('RATELIMIT_MAX_KEYS', 100000)
+        app.config.setdefault('RATELIMIT_PROXY_HOPS', 0)
+
+        self.enabled = bool(app.config['RATELIMIT_ENABLED'])
+        self.limits = parse_limits(app.config['RATELIMIT_LIMITS'])
+        self.backend = import_string(app.config['RATELIMIT_BACKEND']).from_config(app.config)
+        self.proxy_hops = int(app.config['RATELIMIT_PROXY_HOPS'])
+        self.limited = 0
+        app.before_request(self._check_request)
+        app.extensions['rate_limiter'] = self
+
+    def check(self, endpoint, method, keys):
+        """0 if the request may go ahead, else seconds the client should wait.
+
+        `keys` maps limit kinds (ip/user/code) to this request's values;
+        limits whose key is missing (e.g. user when logged out) don't apply.
+        """
+        limits = self.limits.get((endpoint, method)) or self.limits.get((endpoint, None))
+        if not self.enabled or not limits:
+            return 0
+        now = time.monotonic()
+        wait = 0
+        for limit in limits:
+            value = keys.get(limit.kind)
+            if value is not None:
+                key = (endpoint, limit.kind, value)
+                wait = max(wait, self.backend.take(key, limit.count / limit.period, limit.count, now))
+        if wait:
+            self.limited += 1
+        return wait
+
+    def _check_request(self):
+        if not self.enabled or request.endpoint is None:
+            return None
+        keys = {
+            'ip': client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'), self.proxy_hops),
+            'user': session.get('_user_id'),
+            'code': (request.view_args or {}).get('short_code'),
+        }
+        wait = self.check(request.endpoint, request.method, keys)
+        if wait:
+            return too_many_requests(wait)
+        return None
+
+
+def too_many_requests(wait):
+    return Response('Too many requests\n', 429, {'Retry-After': str(math.ceil(wait))}, mimetype='text/plain')
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,96 @@
+import logging
+import time
+
+from werkzeug.http import http_date
+from werkzeug.utils import import_string
+
+
+# ===== Redirect caching policy =====
+
+def policy_from_form(form, max_age_limit):
+    """Link column values for the policy fields of the create/edit form."""
+    try:
+        max_age = int(form.get('redirect_max_age') or 0)
+    except ValueError:
+        max_age = 0
+    return {
+        'redirect_permanent': form.get('redirect_permanent') == 'on',
+        'redirect_max_age': min(max(max_age, 0), max_age_limit),
+        'redirect_public': form.get('redirect_public') == 'on',
+    }
+
+
+def redirect_headers(link, max_age_limit):
+    """(status, [(header, value)]) for redirecting to a CachedLink.
+
+    Cached redirects aren't counted as clicks, and a cached 301 keeps going
+    to the old target after an edit until it expires: max-age is capped at
+    REDIRECT_MAX_AGE_LIMIT (keep it <= SHORT_CODE_REUSE_DELAY so a deleted
+    code isn't reused while caches still point it at the old URL).
+    """
+    status = 301 if link.permanent else 302
+    max_age = min(link.max_age or 0, max_age_limit)
+    if max_age <= 0:
+        return status, [('Cache-Control', 'no-store')]
+    scope = 'public' if link.public else 'private'
+    return status, [
+        ('Cache-Control', f'{scope}, max-age={max_age}'),
+        ('Expires', http_date(time.time() + max_age)),
+    ]
+
+
+# ===== Edge cache purging =====
+
+class PurgeHook:
+    """Told which short codes changed so an edge cache/CDN can drop them.
+
+    Subclass and point REDIRECT_PURGE_HOOK at it (import path); it's built
+    with `from_config(app.config)` and `purge()` is called after the commit
+    of every edit or delete.
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def purge(self, short_codes):
+        raise NotImplementedError
+
+
+class LocalPurgeHook(PurgeHook):
+    """Stand-in edge cache for development and tests: remembers purges."""
+
+    def __init__(self):
+        self.purged = []
+
+    def purge(self, short_codes):
+        self.purged.extend(short_codes)
+
+
+class RedirectPurger:
+    """Calls the configured PurgeHook; purge failures never fail the request."""
+
+    def __init__(self):
+        self.hook = None
+        self.failures = 0
+
+    def init_app(self, app):
+        app.config.setdefault('REDIRECT_PURGE_HOOK', None)
+        app.config.setdefault('REDIRECT_MAX_AGE_LIMIT', 3600)
+
+        path = app.config['REDIRECT_PURGE_HOOK']
+        self.hook = import_string(path).from_config(app.config) if path else None
+        self.failures = 0
+        app.extensions['redirect_purger'] = self
+
+    def purge(self, short_codes):
+        if self.hook is None:
+            return
+        try:
+            self.hook.purge(list(short_codes))
+        except Exception as e:
+            self.failures += 1
+            logging.error(f"edge purge of {short_codes} failed: {e}")
+
+
+redirect_purger = RedirectPurger()
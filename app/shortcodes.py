@@ -0,0 +1,230 @@
+import string
+import threading
+import time
+from collections import deque, OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Link, ShortCodeCounter, FreeShortCode
+
+
+# Pool for available character like IPs in DHCP Pool
+CHAR_POOL = string.digits + string.ascii_lowercase + string.ascii_uppercase  # + ['-','_','+']
+BASE = len(CHAR_POOL)
+
+# Link.short_code is a String(10)
+MAX_LENGTH = 10
+
+# index -> code is i -> (A*i + C) mod 62**n, a bijection on every length tier
+# as long as A is coprime with 62. Consecutive indexes give unrelated codes.
+_MULTIPLIER = 2654435761
+_OFFSET = 1013904223
+
+
+def encode(number, length):
+    """Fixed-width base62 encoding of number (0 <= number < 62**length)."""
+    chars = []
+    for _ in range(length):
+        number, rem = divmod(number, BASE)
+        chars.append(CHAR_POOL[rem])
+    return ''.join(reversed(chars))
+
+
+def code_for(index, length):
+    return encode((_MULTIPLIER * index + _OFFSET) % BASE ** length, length)
+
+
+def index_for(code):
+    """Inverse of `code_for`: the tier index of code, or None if the
+    allocator can never produce it (wrong length or characters)."""
+    if not 0 < len(code) <= MAX_LENGTH:
+        return None
+    number = 0
+    for char in code:
+        digit = CHAR_POOL.find(char)
+        if digit < 0:
+            return None
+        number = number * BASE + digit
+    capacity = BASE ** len(code)
+    return (number - _OFFSET) * pow(_MULTIPLIER, -1, capacity) % capacity
+
+
+class ShortCodeAllocator:
+    """Hands out unique short codes without guessing.
+
+    Each length tier has a row in short_code_counters. A process reserves
+    SHORT_CODE_BLOCK_SIZE indexes at a time with one UPDATE ... RETURNING and
+    maps them through `code_for`, so allocations are served from memory and
+    the DB is touched once per block. Codes freed by deleted links are
+    reused first, after SHORT_CODE_REUSE_DELAY seconds so caches holding the
+    old target have expired. When a tier is exhausted the next length is used.
+
+    Reserved codes not handed out within SHORT_CODE_BLOCK_MAX_AGE seconds are
+    dropped, and freed codes stay in free_short_codes (marked taken) for twice
+    that long. That bounds what another process can still hand out, which
+    the short code filter relies on (see app/codefilter.py). So a quiet
+    process doesn't throw away a block per create, one that allocated
+    nothing for that long reserves only the codes it's asked for.
+    """
+
+    def __init__(self):
+        self.min_length = 3
+        self.block_size = 64
+        self.reuse_delay = 3600
+        self.block_max_age = 60
+        self._length = self.min_length
+        self._buffer = deque()
+        # code -> when it was reserved, oldest first
+        self._reserved_at = OrderedDict()
+        self._last_allocated_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('SHORT_CODE_MIN_LENGTH', 3)
+        app.config.setdefault('SHORT_CODE_BLOCK_SIZE', 64)
+        app.config.setdefault('SHORT_CODE_REUSE_DELAY', 3600)
+        app.config.setdefault('SHORT_CODE_BLOCK_MAX_AGE', 60)
+
+        self.min_length = int(app.config['SHORT_CODE_MIN_LENGTH'])
+        self.block_size = int(app.config['SHORT_CODE_BLOCK_SIZE'])
+        self.reuse_delay = float(app.config['SHORT_CODE_REUSE_DELAY'])
+        self.block_max_age = float(app.config['SHORT_CODE_BLOCK_MAX_AGE'])
+        with self._lock:
+            self._length = self.min_length
+            self._buffer.clear()
+            self._reserved_at.clear()
+            self._last_allocated_at = None
+        app.extensions['shortcode_allocator'] = self
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, n):
+        with self._lock:
+            self._drop_expired()
+            # most of a block would expire unused again on an idle worker
+            block = n if self._idle() else self.block_size
+            while len(self._buffer) < n:
+                self._refill(max(n - len(self._buffer), block))
+            self._last_allocated_at = time.monotonic()
+            return [self._buffer.popleft() for _ in range(n)]
+
+    def release(self, codes):
+        """Give back codes that were allocated but never saved.
+
+        Not after an IntegrityError: the code may be the one that's taken,
+        and handing it out again would fail the same way.
+        """
+        with self._lock:
+            self._buffer.extendleft(reversed([code for code in codes if not self._expired(code)]))
+
+    def _expired(self, code):
+        if self.block_max_age <= 0:
+            return False
+        reserved_at = self._reserved_at.get(code)
+        return reserved_at is None or time.monotonic() - reserved_at > self.block_max_age
+
+    def _idle(self):
+        if self.block_max_age <= 0 or self._last_allocated_at is None:
+            return False
+        return time.monotonic() - self._last_allocated_at > self.block_max_age
+
+    def _drop_expired(self):
+        if self.block_max_age <= 0:
+            return
+        # the buffer front holds the oldest reservations
+        while self._buffer and self._expired(self._buffer[0]):
+            self._buffer.popleft()
+        cutoff = time.monotonic() - self.block_max_age
+        while self._reserved_at:
+            code, reserved_at = next(iter(self._reserved_at.items()))
+            if reserved_at > cutoff:
+                break
+            self._reserved_at.popitem(last=False)
+
+    def free(self, short_code):
+        """Queue a deleted link's code for reuse (in the caller's transaction).
+
+        A reused code still has its row (marked taken, see `_take_freed`),
+        so freeing it again updates that row instead of inserting one.
+        """
+        db.session.merge(FreeShortCode(short_code=short_code, freed_at=datetime.utcnow(), taken_at=None))
+
+    def _refill(self, want):
+        with db.engine.begin() as conn:
+            codes = self._take_freed(conn, want)
+            while len(codes) < want:
+                codes.extend(self._reserve_block(conn, want - len(codes)))
+        self._buffer.extend(codes)
+        if self.block_max_age > 0:
+            now = time.monotonic()
+            for code in codes:
+                self._reserved_at[code] = now
+
+    def _take_freed(self, conn, n):
+        free = FreeShortCode.__table__
+        now = datetime.utcnow()
+        # taken rows are kept until nobody can still be holding them
+        conn.execute(delete(free).where(free.c.taken_at < now - timedelta(seconds=2 * self.block_max_age)))
+
+        cutoff = now - timedelta(seconds=self.reuse_delay)
+        oldest = (
+            select(free.c.short_code)
+            .where(free.c.taken_at.is_(None))
+            .where(free.c.freed_at <= cutoff)
+            .order_by(free.c.freed_at)
+            .limit(n)
+            .with_for_update(skip_locked=True)
+        )
+        rows = conn.execute(
+            update(free).where(free.c.short_code.in_(oldest)).values(taken_at=now).returning(free.c.short_code)
+        )
+        return [row.short_code for row in rows]
+
+    def _reserve_block(self, conn, size):
+        counters = ShortCodeCounter.__table__
+        links = Link.__table__
+        free = FreeShortCode.__table__
+
+        while True:
+            length = self._length
+            if length > MAX_LENGTH:
+                raise RuntimeError("short code space exhausted")
+            capacity = BASE ** length
+
+            row = conn.execute(
+                update(counters)
+                .where(counters.c.length == length)
+                .values(next_index=counters.c.next_index + size)
+                .returning(counters.c.next_index)
+            ).first()
+
+            if row is None:
+                # first block ever handed out for this length
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(counters).values(length=length, next_index=0))
+                except IntegrityError:
+                    pass  # another process created it first
+                continue
+
+            start = row.next_index - size
+            if start >= capacity:
+                self._length = length + 1
+                continue
+
+            candidates = [code_for(i, length) for i in range(start, min(row.next_index, capacity))]
+
+            # codes created before the allocator existed were random, and
+            # once freed they're handed out from free_short_codes too
+            taken = set(conn.scalars(
+                select(links.c.short_code).where(links.c.short_code.in_(candidates))
+                .union(select(free.c.short_code).where(free.c.short_code.in_(candidates)))
+            ))
+            return [code for code in candidates if code not in taken]
+
+
+shortcode_allocator = ShortCodeAllocator()
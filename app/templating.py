@@ -0,0 +1,161 @@
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, request
+from jinja2 import FileSystemBytecodeCache
+
+# macros rendering the per-link cells of the dashboard/admin tables
+ROW_MACROS = '_link_rows.html'
+
+# the parts of a table row that only change when the link is edited
+LinkRow = namedtuple('LinkRow', ['cells', 'actions'])
+
+
+# ===== Jinja environment =====
+
+def init_jinja(app):
+    """Bytecode cache + compile every template up front.
+
+    Compiled templates are written to JINJA_BYTECODE_CACHE_DIR (a per-user
+    temp dir if unset), so workers and restarts load them instead of
+    parsing again; compiling at startup means gunicorn workers forked from
+    the preloaded app inherit them already built.
+    """
+    app.config.setdefault('JINJA_BYTECODE_CACHE_ENABLED', True)
+    app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', None)
+    app.config.setdefault('JINJA_PRELOAD_TEMPLATES', True)
+
+    if app.config['JINJA_BYTECODE_CACHE_ENABLED']:
+        try:
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+        except OSError as e:
+            logging.error(f"Jinja bytecode cache disabled: {e}")
+    if app.config['JINJA_PRELOAD_TEMPLATES']:
+        for name in app.jinja_env.list_templates(extensions=['html']):
+            app.jinja_env.get_template(name)
+
+
+# ===== Per-link row fragments =====
+
+class FragmentCache:
+    """Rendered table cells per link, keyed by (link.id, link.version).
+
+    The dashboard and admin tables run url_for and escaping for every row
+    on every request. Everything in a row but the serial number and the
+    click count only changes when the link is edited, so `link_row()`
+    (a template global) renders those parts once with the macros in
+    _link_rows.html and hands back the cached markup after that.
+
+    Edits bump Link.version in the UPDATE itself, so other processes miss
+    on the new version instead of serving the old row; edit/delete also
+    drop the link here. At most FRAGMENT_CACHE_SIZE links are kept (LRU),
+    0 turns the cache off.
+
+    On top of that `link_table()` keeps whole table bodies, keyed by every
+    row's (id, version, clicks): a page nobody edited or clicked since is
+    one lookup, and when one row changed the others still come from here.
+    At most FRAGMENT_CACHE_TABLES bodies are kept.
+    """
+
+    def __init__(self, max_links=10000, max_tables=256):
+        self.max_links = max_links
+        self.max_tables = max_tables
+        # link id -> (version, {(kind, root url): LinkRow})
+        self._data = OrderedDict()
+        # (kind, root url, first row number, ((id, version, clicks), ...)) -> Markup
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.table_hits = 0
+        self.table_misses = 0
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_SIZE', 10000)
+        app.config.setdefault('FRAGMENT_CACHE_TABLES', 256)
+        self.max_links = int(app.config['FRAGMENT_CACHE_SIZE'])
+        self.max_tables = int(app.config['FRAGMENT_CACHE_TABLES'])
+        self.clear()
+        app.add_template_global(self.link_row)
+        app.add_template_global(self.link_table)
+        app.extensions['fragment_cache'] = self
+
+    def link_table(self, kind, links, start=None):
+        """Rows of the "dashboard" or "admin" table body, numbered from `start`."""
+        if self.max_links <= 0 or self.max_tables <= 0:
+            return self._render_table(kind, links, start)
+
+        key = (kind, request.root_url, start, tuple((link.id, link.version, link.clicks) for link in links))
+        with self._lock:
+            body = self._tables.get(key)
+            if body is not None:
+                self._tables.move_to_end(key)
+                self.table_hits += 1
+                return body
+            self.table_misses += 1
+
+        body = self._render_table(kind, links, start)
+        with self._lock:
+            self._tables[key] = body
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return body
+
+    @staticmethod
+    def _render_table(kind, links, start):
+        macros = current_app.jinja_env.get_template(ROW_MACROS).module
+        return getattr(macros, f'{kind}_rows')(links, start)
+
+    def link_row(self, kind, link):
+        """LinkRow of `link` for the "dashboard" or "admin" table."""
+        if self.max_links <= 0:
+            return self._render(kind, link)
+
+        # rows embed absolute short urls, so they're per host
+        key = (kind, request.root_url)
+        with self._lock:
+            entry = self._data.get(link.id)
+            row = entry[1].get(key) if entry is not None and entry[0] == link.version else None
+            if row is not None:
+                self._data.move_to_end(link.id)
+                self.hits += 1
+                return row
+            self.misses += 1
+
+        row = self._render(kind, link)
+        with self._lock:
+            entry = self._data.get(link.id)
+            if entry is None or entry[0] != link.version:
+                entry = self._data[link.id] = (link.version, {})
+            entry[1][key] = row
+            self._data.move_to_end(link.id)
+            while len(self._data) > self.max_links:
+                self._data.popitem(last=False)
+        return row
+
+    @staticmethod
+    def _render(kind, link):
+        macros = current_app.jinja_env.get_template(ROW_MACROS).module
+        return LinkRow(getattr(macros, f'{kind}_cells')(link), getattr(macros, f'{kind}_actions')(link))
+
+    def invalidate(self, link_id):
+        with self._lock:
+            self._data.pop(link_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tables.clear()
+            self.hits = self.misses = 0
+            self.table_hits = self.table_misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'links': len(self._data), 'hits': self.hits, 'misses': self.misses,
+                'tables': len(self._tables), 'table_hits': self.table_hits, 'table_misses': self.table_misses,
+            }
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,213 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from sqlalchemy import select
+
+from app import db
+from app.cache import link_cache, CachedLink
+from app.models import Link
+
+
+# file layout: header, fixed-size records sorted by code, then the urls
+_MAGIC = b'LNKSNAP2'
+_HEADER = struct.Struct('<8sQd')          # magic, record count, written_at (unix time)
+# code (NUL padded), id, user_id, url offset, url length, redirect max age, flags
+_RECORD = struct.Struct('<10sqqQIIB')
+_PERMANENT, _PUBLIC = 1, 2
+_CODE_WIDTH = 10
+
+
+def _key(short_code):
+    raw = short_code.encode()
+    return raw.ljust(_CODE_WIDTH, b'\0') if len(raw) <= _CODE_WIDTH else None
+
+
+def hot_links(limit):
+    """(short_code, *CachedLink fields) of the `limit` most clicked links."""
+    links = Link.__table__
+    return db.session.execute(
+        select(links.c.short_code, links.c.id, links.c.original_url, links.c.user_id,
+               links.c.redirect_permanent, links.c.redirect_max_age, links.c.redirect_public)
+        .order_by(links.c.clicks.desc().nulls_last())
+        .limit(limit)
+    ).all()
+
+
+def write_snapshot(path, rows):
+    """Write (short_code, *CachedLink fields) rows as a snapshot file.
+
+    The file is replaced atomically, processes that have the old one mapped
+    keep reading it until they reopen.
+    """
+    entries = sorted(
+        (key, link.id, link.original_url.encode(), link.user_id, link.max_age,
+         (_PERMANENT if link.permanent else 0) | (_PUBLIC if link.public else 0))
+        for row in rows
+        for key, link in [(_key(row[0]), CachedLink(*row[1:]))] if key is not None
+    )
+    offset = _HEADER.size + len(entries) * _RECORD.size
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(entries), time.time()))
+        for key, id, url, user_id, max_age, flags in entries:
+            f.write(_RECORD.pack(key, id, user_id, offset, len(url), max_age or 0, flags))
+            offset += len(url)
+        for entry in entries:
+            f.write(entry[2])
+    os.replace(tmp, path)
+    return len(entries)
+
+
+class LinkSnapshot:
+    """Read-only, memory-mapped snapshot file: binary search by short code."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.written_at = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a link snapshot")
+
+    def get(self, short_code):
+        key = _key(short_code)
+        if key is None:
+            return None
+        data, lo, hi = self._map, 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = _HEADER.size + mid * _RECORD.size
+            found = data[start:start + _CODE_WIDTH]
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                _, id, user_id, url_at, url_len, max_age, flags = _RECORD.unpack_from(data, start)
+                return CachedLink(id, data[url_at:url_at + url_len].decode(), user_id,
+                                  bool(flags & _PERMANENT), max_age, bool(flags & _PUBLIC))
+        return None
+
+    def close(self):
+        self._map.close()
+
+
+class SnapshotReader:
+    """The LINK_SNAPSHOT_PATH file as a second tier behind the link cache.
+
+    Only used while the snapshot is younger than LINK_SNAPSHOT_MAX_AGE.
+    Edits and deletes made in this process are honoured right away; those
+    made by other processes since the file was written are served until it
+    goes stale (plus the cache TTL), so rewrite it often, e.g. from cron
+    with `flask links snapshot`. A rewritten file is picked up on its own.
+
+    Replaced snapshots aren't closed: other threads may still be searching
+    them, and their map is unmapped once the last of them lets go.
+    """
+
+    # how often to look for a newer file once the current one is too old
+    recheck_interval = 10
+
+    def __init__(self):
+        self.path = None
+        self.max_age = 300
+        self._snapshot = None
+        self._next_check = 0
+        # short_code -> when it was changed here, newer than the snapshot
+        self._changed = {}
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('LINK_SNAPSHOT_PATH', None)
+        app.config.setdefault('LINK_SNAPSHOT_MAX_AGE', 300)
+
+        self.path = app.config['LINK_SNAPSHOT_PATH']
+        self.max_age = float(app.config['LINK_SNAPSHOT_MAX_AGE'])
+        with self._lock:
+            self._snapshot = None
+            self._next_check = 0
+            self._changed = {}
+        self.hits = 0
+        app.extensions['link_snapshot'] = self
+
+    def _current(self):
+        now = time.time()
+        snapshot = self._snapshot
+        if snapshot is not None and now - snapshot.written_at <= self.max_age:
+            return snapshot
+        if not self.path or now < self._next_check:
+            return None
+
+        with self._lock:
+            # another thread may have just reopened it
+            snapshot = self._snapshot
+            if snapshot is not None and now - snapshot.written_at <= self.max_age:
+                return snapshot
+            if now < self._next_check:
+                return None
+            self._next_check = now + self.recheck_interval
+            try:
+                fresh = LinkSnapshot(self.path)
+            except (OSError, ValueError) as e:
+                logging.warning(f"link snapshot {self.path} not usable: {e}")
+                self._snapshot = None
+                return None
+            if now - fresh.written_at > self.max_age:
+                fresh.close()  # never published, nobody else has it
+                self._snapshot = None
+                return None
+            self._snapshot = fresh
+            # changes the new file already has
+            self._changed = {code: at for code, at in self._changed.items() if at >= fresh.written_at}
+            return fresh
+
+    def get(self, short_code):
+        """CachedLink from a fresh snapshot, or None if it isn't in there."""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        changed_at = self._changed.get(short_code)
+        if changed_at is not None and changed_at >= snapshot.written_at:
+            return None
+        link = snapshot.get(short_code)
+        if link is not None:
+            self.hits += 1
+        return link
+
+    def invalidate(self, short_code):
+        """short_code was edited or deleted: stop serving it from the file."""
+        if self.path:
+            with self._lock:
+                self._changed[short_code] = time.time()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'path': self.path,
+            'entries': snapshot.count if snapshot else 0,
+            'age': (time.time() - snapshot.written_at) if snapshot else None,
+            'hits': self.hits,
+        }
+
+
+link_snapshot = SnapshotReader()
+
+
+def warm_link_cache(app):
+    """Preload the LINK_WARMUP_TOP_K most clicked links into the link cache."""
+    limit = min(int(app.config.get('LINK_WARMUP_TOP_K') or 0), link_cache.maxsize)
+    if limit <= 0:
+        return 0
+    started = time.perf_counter()
+    rows = hot_links(limit)
+    # least clicked first, so the hottest end up most recently used
+    for row in reversed(rows):
+        link_cache.set(row[0], CachedLink(*row[1:]))
+    logging.info(f"link cache warmed with {len(rows)} links in {time.perf_counter() - started:.2f}s")
+    return len(rows)
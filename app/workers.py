@@ -0,0 +1,86 @@
+import atexit
+import logging
+import os
+import threading
+
+
+# every flusher created in this process, drained together on shutdown
+_flushers = []
+
+
+class PeriodicFlusher:
+    """Base class for in-memory buffers that are written out in the background.
+
+    Subclasses implement `flush()`, which runs inside an app context. The
+    worker thread is started lazily on first use and is tied to the pid that
+    started it, so a pre-forked worker starts its own thread instead of
+    relying on one that didn't survive the fork.
+
+    An interval of 0 disables the thread; the buffer is then only flushed
+    when `flush()`/`drain()` is called explicitly (tests, CLI).
+    """
+
+    def __init__(self, name, interval_key, default_interval):
+        self.name = name
+        self.interval_key = interval_key
+        self.default_interval = default_interval
+        self.app = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        _flushers.append(self)
+
+    def init_app(self, app):
+        app.config.setdefault(self.interval_key, self.default_interval)
+        self.app = app
+
+    @property
+    def interval(self):
+        if self.app is None:
+            return 0
+        return float(self.app.config.get(self.interval_key) or 0)
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or self.interval <= 0:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush_safely()
+
+    def flush_safely(self):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"{self.name} flush failed: {e}")
+
+    def flush(self):
+        raise NotImplementedError
+
+    def drain(self, timeout=5):
+        """Stop the worker thread and write out whatever is still buffered."""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        self._pid = None
+        self.flush_safely()
+
+
+def drain_all():
+    for flusher in _flushers:
+        flusher.drain()
+
+
+atexit.register(drain_all)
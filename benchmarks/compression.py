@@ -0,0 +1,108 @@
+"""CPU per request with stock Flask-Compress vs the compression policy.
+
+    python benchmarks/compression.py [--requests 1000] [--rounds 3]
+
+Each mode runs in its own process (settings are read at import): "stock"
+compresses everything Flask-Compress would (no exclusions, no cache, no
+pre-compressed static files), "policy" is the default config. CPU time
+(process_time) is what matters here, the client is in-process. Modes run
+alternately for --rounds rounds and the best round counts, which keeps
+noise from other processes out of the comparison.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ACCEPT = {'Accept-Encoding': 'gzip, deflate, br, zstd'}
+MODES = {
+    'stock': {'COMPRESS_EXCLUDE_ENDPOINTS': '', 'COMPRESS_CACHE_MAX_BYTES': '0'},
+    'policy': {},
+}
+
+
+def run_mode(mode, requests):
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(workdir, "bench.db")}')
+    os.environ.setdefault('CLICK_FLUSH_INTERVAL', '0')
+    os.environ.setdefault('ANALYTICS_FLUSH_INTERVAL', '0')
+
+    from app import create_app, db
+    from app.models import User
+    from app.bulk import iter_bulk_create
+
+    static = os.path.join(workdir, 'static')
+    os.makedirs(static)
+    with open(os.path.join(static, 'app.css'), 'w') as f:
+        f.write(''.join(f'.c{i} {{ margin: {i}px; color: #{i:06x}; }}\n' for i in range(4000)))
+    if mode == 'policy':
+        sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+        from precompress_static import precompress
+        precompress(static, 500, True)
+
+    app = create_app()
+    app.static_folder = static
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', first_name='Bench',
+                    gender='other', age=1, profession='bench')
+        user.set_password('BenchPassword123!')
+        db.session.add(user)
+        db.session.commit()
+        code = next(iter_bulk_create(user.id, [f'https://example.com/{i}' for i in range(50)]))[0]
+
+        client = app.test_client()
+        client.post('/', data={'email': 'bench@example.com', 'password': 'BenchPassword123!'})
+        anonymous = app.test_client(use_cookies=False)
+        scenarios = {
+            'redirect': lambda: anonymous.get('/' + code, headers=ACCEPT),
+            'signup page': lambda: anonymous.get('/signup', headers=ACCEPT),
+            'dashboard': lambda: client.get('/dashboard', headers=ACCEPT),
+            'static css': lambda: anonymous.get('/static/app.css', headers=ACCEPT).get_data(),
+        }
+
+        results = {}
+        for name, call in scenarios.items():
+            call()  # warm up templates / caches
+            started = time.process_time()
+            for _ in range(requests):
+                call()
+            results[name] = (time.process_time() - started) / requests * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=1000, help='per scenario')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--mode', choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.requests)))
+        return
+
+    results = {mode: {} for mode in MODES}
+    for _ in range(args.rounds):
+        for mode, env in MODES.items():
+            output = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--requests', str(args.requests)],
+                env={**os.environ, **env}, check=True, capture_output=True, text=True
+            ).stdout
+            for name, cpu in json.loads(output.strip().splitlines()[-1]).items():
+                results[mode][name] = min(cpu, results[mode].get(name, cpu))
+
+    print(f"{'scenario':<14} {'stock µs CPU':>13} {'policy µs CPU':>14} {'saved':>7}")
+    for name, stock in results['stock'].items():
+        policy = results['policy'][name]
+        print(f"{name:<14} {stock:>13.0f} {policy:>14.0f} {1 - policy / stock:>6.0%}")
+
+
+if __name__ == '__main__':
+    main()
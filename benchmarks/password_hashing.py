@@ -0,0 +1,65 @@
+"""Password hashes/sec per core for werkzeug KDF settings.
+
+    python benchmarks/password_hashing.py [--seconds 3] [--workers 4] [--method scrypt ...]
+
+For each method: one thread hashing in a loop (= hashes/sec per core),
+then the bounded PasswordHasher pool with --workers threads, to show the
+KDF scales across cores (scrypt/pbkdf2 release the GIL). Use it to pick
+PASSWORD_HASH_METHOD / PASSWORD_HASH_WORKERS: a login costs one hash.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from app.passwords import PasswordHasher
+
+DEFAULT_METHODS = ['scrypt', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000']
+
+
+def single(method, seconds):
+    done = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        generate_password_hash('correct horse battery staple', method)
+        done += 1
+    return done / (time.perf_counter() - started)
+
+
+def pooled(method, seconds, workers):
+    hasher = PasswordHasher(method, workers=workers, queue=0)
+    done = [0] * workers
+
+    def client(i):
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            hasher.hash('correct horse battery staple')
+            done[i] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as clients:
+        list(clients.map(client, range(workers)))
+    return sum(done) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--seconds', type=float, default=3, help='per measurement')
+    parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 4))
+    parser.add_argument('--method', action='append', help='werkzeug method string (repeatable)')
+    args = parser.parse_args()
+
+    print(f"{'method':<26} {'ms/hash':>8} {'hash/s/core':>12} {f'hash/s x{args.workers}':>12} {'scaling':>8}")
+    for method in args.method or DEFAULT_METHODS:
+        per_core = single(method, args.seconds)
+        total = pooled(method, args.seconds, args.workers)
+        print(f"{method:<26} {1000 / per_core:>8.1f} {per_core:>12.1f} {total:>12.1f} {total / per_core:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
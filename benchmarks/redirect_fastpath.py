@@ -0,0 +1,107 @@
+"""Requests/sec of the Flask redirect route vs the async fast path.
+
+    python benchmarks/redirect_fastpath.py [--requests 20000] [--links 1000] [--concurrency 50]
+
+Both apps run in-process against the same SQLite file (or DATABASE_URL),
+so the numbers compare framework + lookup cost, not network/server cost.
+"warm" serves every code from the link cache, "cold" disables the cache
+so each request goes to the DB.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def setup(links):
+    if not os.getenv('DATABASE_URL'):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('CLICK_FLUSH_INTERVAL', '0')
+    os.environ.setdefault('ANALYTICS_FLUSH_INTERVAL', '0')
+
+    from app import create_app, db
+    from app.models import User
+    from app.bulk import iter_bulk_create
+
+    flask_app = create_app()
+    with flask_app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x',
+                    first_name='Bench', gender='other', age=1, profession='bench')
+        db.session.add(user)
+        db.session.commit()
+        urls = [f'https://example.com/{i}' for i in range(links)]
+        codes = [code for chunk in iter_bulk_create(user.id, urls) for code in chunk]
+    return flask_app, codes
+
+
+def bench_flask(flask_app, codes, requests):
+    client = flask_app.test_client()
+    started = time.perf_counter()
+    for i in range(requests):
+        response = client.get('/' + codes[i % len(codes)])
+        assert response.status_code == 302
+    return requests / (time.perf_counter() - started)
+
+
+def bench_asgi(asgi_app, codes, requests, concurrency):
+    async def call(code):
+        scope = {'type': 'http', 'method': 'GET', 'path': '/' + code, 'headers': []}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi_app(scope, receive, send)
+        assert sent[0]['status'] == 302
+
+    async def worker(offset):
+        for i in range(offset, requests, concurrency):
+            await call(codes[i % len(codes)])
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        await asgi_app.engine.dispose()
+        return requests / elapsed
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--links', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    flask_app, codes = setup(args.links)
+    from app.cache import link_cache
+    from app.fastpath import RedirectApp
+
+    results = []
+    for label, cache_size in (('warm', args.links * 2), ('cold', 0)):
+        with flask_app.app_context():
+            link_cache.clear()
+            link_cache.maxsize = cache_size
+            flask_rps = bench_flask(flask_app, codes, args.requests)
+            link_cache.clear()
+            asgi_rps = bench_asgi(RedirectApp(flask_app), codes, args.requests, args.concurrency)
+        results.append((label, flask_rps, asgi_rps))
+
+    print(f"{'cache':<6} {'flask req/s':>12} {'asgi req/s':>12} {'speedup':>8}")
+    for label, flask_rps, asgi_rps in results:
+        print(f"{label:<6} {flask_rps:>12,.0f} {asgi_rps:>12,.0f} {asgi_rps / flask_rps:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Latency/throughput benchmark for the redirect, create, dashboard and admin paths.
+
+    python benchmarks/suite.py                               # fresh SQLite file
+    DATABASE_URL=postgresql://... python benchmarks/suite.py # e.g. a throwaway container
+    python benchmarks/suite.py --save benchmarks/baseline.json
+    python benchmarks/suite.py --compare benchmarks/baseline.json
+
+Seeds --users users with --links links between them, then drives each
+scenario with --concurrency threads, each using its own logged-in test
+client. Requests run in-process (no HTTP server), so the numbers cover
+Flask + SQLAlchemy + the database, not the network.
+
+Reports p50/p95/p99 latency, throughput and SQL statements per request.
+--compare exits 1 when a scenario's p95 got more than --tolerance slower
+or it issues noticeably more queries per request than the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'BenchPassword123!'
+QUERY_SLACK = 0.5
+
+
+# ===== Setup =====
+
+def create_bench_app():
+    if not os.getenv('DATABASE_URL'):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    # flushes happen at exit, not in the middle of a measurement
+    os.environ.setdefault('CLICK_FLUSH_INTERVAL', '0')
+    os.environ.setdefault('ANALYTICS_FLUSH_INTERVAL', '0')
+
+    from app import create_app
+    return create_app()
+
+
+def seed(app, n_users, n_links, seed_value):
+    """Users (one admin) plus links spread over them; returns the fixtures the scenarios need."""
+    from sqlalchemy import insert, select
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models import User, Link
+    from app.bulk import iter_bulk_create
+
+    rng = random.Random(seed_value)
+    password_hash = generate_password_hash(PASSWORD)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        db.session.execute(insert(User.__table__), [{
+            'username': f'bench{i}',
+            'email': f'bench{i}@example.com',
+            'password_hash': password_hash,
+            'role': 'admin' if i == 0 else 'user',
+            'is_active': True,
+            'first_name': 'Bench',
+            'gender': 'other',
+            'age': 30,
+            'profession': 'benchmark',
+        } for i in range(n_users + 1)])
+        db.session.commit()
+
+        users = db.session.execute(select(User.id, User.email, User.role).order_by(User.id)).all()
+        members = [user for user in users if user.role != 'admin']
+        admin = next(user for user in users if user.role == 'admin')
+
+        per_user = {user.id: 0 for user in members}
+        for _ in range(n_links):
+            per_user[rng.choice(members).id] += 1
+        for user_id, count in per_user.items():
+            urls = [f'https://example.com/{user_id}/{i}' for i in range(count)]
+            for _ in iter_bulk_create(user_id, urls):
+                pass
+
+        codes = db.session.execute(select(Link.short_code)).scalars().all()
+        # a few (created_at, id) cursors per user for deep dashboard pages
+        cursors = {}
+        for row in db.session.execute(select(Link.user_id, Link.created_at, Link.id)):
+            cursors.setdefault(row.user_id, []).append((row.created_at, row.id))
+        for user_id in cursors:
+            cursors[user_id] = rng.sample(cursors[user_id], min(20, len(cursors[user_id])))
+
+    return {'members': members, 'admin': admin, 'codes': codes, 'cursors': cursors}
+
+
+# ===== Query counting =====
+
+_local = threading.local()
+
+
+def install_query_counter(app):
+    from sqlalchemy import event
+    from app import db
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        _local.queries = getattr(_local, 'queries', 0) + 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+
+
+# ===== Scenarios =====
+# each returns (method, url, data, expected statuses) for one request
+
+def redirect_request(fixtures, user, rng):
+    return 'GET', '/' + rng.choice(fixtures['codes']), None, (302,)
+
+
+def create_request(fixtures, user, rng):
+    return 'POST', '/dashboard', {'url': f'https://example.org/{rng.random()}'}, (302,)
+
+
+def dashboard_request(fixtures, user, rng):
+    from app.pagination import encode_cursor
+    cursors = fixtures['cursors'].get(user.id)
+    # half first pages, half somewhere deeper
+    if not cursors or rng.random() < 0.5:
+        return 'GET', '/dashboard', None, (200,)
+    return 'GET', f'/dashboard?after={encode_cursor(*rng.choice(cursors))}', None, (200,)
+
+
+def admin_users_request(fixtures, user, rng):
+    user_id = rng.choice(fixtures['members']).id
+    return 'GET', rng.choice(['/admin/users', f'/admin/users?user_id={user_id}']), None, (200,)
+
+
+SCENARIOS = {
+    'redirect': (redirect_request, 'anonymous'),
+    'create': (create_request, 'member'),
+    'dashboard': (dashboard_request, 'member'),
+    'admin_users': (admin_users_request, 'admin'),
+}
+
+
+def login(client, email):
+    response = client.post('/', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"login failed for {email}: {response.status_code}")
+
+
+def run_scenario(app, fixtures, name, n_requests, concurrency, seed_value):
+    make_request, who = SCENARIOS[name]
+
+    def worker(index):
+        rng = random.Random(seed_value * 1000 + index)
+        client = app.test_client()
+        user = None
+        if who == 'member':
+            user = fixtures['members'][index % len(fixtures['members'])]
+            login(client, user.email)
+        elif who == 'admin':
+            user = fixtures['admin']
+            login(client, user.email)
+
+        samples = []
+        for _ in range(index, n_requests, concurrency):
+            method, url, data, expected = make_request(fixtures, user, rng)
+            _local.queries = 0
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            elapsed = time.perf_counter() - started
+            samples.append((elapsed, _local.queries, response.status_code in expected))
+        return samples
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        started = time.perf_counter()
+        samples = [sample for result in pool.map(worker, range(concurrency)) for sample in result]
+        wall = time.perf_counter() - started
+
+    return summarize(samples, wall)
+
+
+def summarize(samples, wall):
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+    queries = [n for _, n, _ in samples]
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'throughput_rps': round(len(samples) / wall, 1),
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'max_ms': round(latencies[-1], 3),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'max_queries': max(queries),
+    }
+
+
+# ===== Reporting =====
+
+def print_table(results):
+    print(f"{'scenario':<12} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'q/req':>6}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps']:>8.1f} {r['p50_ms']:>8.2f} "
+              f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['queries_per_request']:>6.2f}")
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing regressions against a saved baseline (empty = none)."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        if current['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        # cache misses and allocator refills move the mean a little; an
+        # extra query on every request (an N+1) moves it by >= 1
+        if current['queries_per_request'] > before['queries_per_request'] + QUERY_SLACK:
+            regressions.append(f"{name}: queries/request {before['queries_per_request']} "
+                               f"-> {current['queries_per_request']}")
+        if current['errors'] > before['errors']:
+            regressions.append(f"{name}: errors {before['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--links', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=2000, help='per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='run only these (repeatable)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', metavar='PATH', help='write results as a baseline JSON')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON to check against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    started = time.perf_counter()
+    fixtures = seed(app, args.users, args.links, args.seed)
+    print(f"seeded {args.users} users / {len(fixtures['codes'])} links in {time.perf_counter() - started:.1f}s")
+    install_query_counter(app)
+
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        results[name] = run_scenario(app, fixtures, name, args.requests, args.concurrency, args.seed)
+    print_table(results)
+
+    with app.app_context():
+        from app import db
+        dialect = db.engine.dialect.name
+
+    report = {
+        'meta': {
+            'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'database': dialect,
+            'python': platform.python_version(),
+            'users': args.users,
+            'links': args.links,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'scenarios': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"saved {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('database') != dialect:
+            print(f"note: baseline was recorded on {baseline['meta'].get('database')}, this run on {dialect}")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
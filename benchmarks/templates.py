@@ -0,0 +1,100 @@
+"""Render time of the 100-row admin links table with and without fragment caching.
+
+    python benchmarks/templates.py [--rows 100] [--renders 200]
+
+Renders admin_user_links.html directly (links already loaded, no DB time)
+uncached, with per-row fragments only (a row changed since the last view)
+and with the whole table body cached (nothing changed), then times a full
+GET /admin/users for the same rows; plus template compile time with and
+without the bytecode cache, i.e. what each worker pays at startup.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+workdir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(workdir, "bench.db")}')
+os.environ.setdefault('CLICK_FLUSH_INTERVAL', '0')
+os.environ.setdefault('ANALYTICS_FLUSH_INTERVAL', '0')
+
+from flask import render_template
+from jinja2 import Environment, FileSystemBytecodeCache
+from sqlalchemy.orm import joinedload
+
+from app import create_app, db
+from app.models import Link, User
+from app.bulk import iter_bulk_create
+from app.templating import fragment_cache
+
+
+def per_call(fn, count):
+    fn()
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - started) / count * 1000
+
+
+def compile_all(app, bytecode_cache):
+    env = Environment(loader=app.jinja_env.loader, bytecode_cache=bytecode_cache)
+    started = time.perf_counter()
+    for name in env.list_templates(extensions=['html']):
+        env.get_template(name)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--renders', type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['ADMIN_LINKS_PER_PAGE'] = args.rows
+    with app.app_context():
+        db.create_all()
+        admin = User(username='admin', email='admin@example.com', role='admin', first_name='Admin',
+                     gender='other', age=1, profession='bench')
+        admin.set_password('BenchPassword123!')
+        db.session.add(admin)
+        db.session.commit()
+        for _ in iter_bulk_create(admin.id, [f'https://example.com/{i}' for i in range(args.rows)]):
+            pass
+
+        with app.test_request_context('/admin/users'):
+            links = Link.query.options(joinedload(Link.user)).order_by(Link.id.desc()).all()
+            render = lambda: render_template('admin_user_links.html', links=links, all_users=[], select_user_id=None)
+            size, tables = fragment_cache.max_links, fragment_cache.max_tables
+            fragment_cache.max_links = 0
+            uncached = per_call(render, args.renders)
+            fragment_cache.max_links, fragment_cache.max_tables = size, 0
+            rows_cached = per_call(render, args.renders)
+            fragment_cache.max_tables = tables
+            cached = per_call(render, args.renders)
+
+        client = app.test_client()
+        client.post('/', data={'email': 'admin@example.com', 'password': 'BenchPassword123!'})
+        page = lambda: client.get('/admin/users')
+        fragment_cache.max_links = 0
+        page_uncached = per_call(page, args.renders // 4)
+        fragment_cache.max_links = size
+        page_cached = per_call(page, args.renders // 4)
+
+        cache_dir = os.path.join(workdir, 'jinja')
+        os.makedirs(cache_dir)
+        cold = compile_all(app, None)
+        compile_all(app, FileSystemBytecodeCache(cache_dir))
+        warm = compile_all(app, FileSystemBytecodeCache(cache_dir))
+
+    print(f"{args.rows}-row table render   {uncached:8.2f} ms -> {cached:6.2f} ms  ({uncached / cached:.1f}x)")
+    print(f"  ...one row changed       {uncached:8.2f} ms -> {rows_cached:6.2f} ms  ({uncached / rows_cached:.1f}x)")
+    print(f"GET /admin/users          {page_uncached:8.2f} ms -> {page_cached:6.2f} ms  ({page_uncached / page_cached:.1f}x)")
+    print(f"compile all templates     {cold:8.2f} ms -> {warm:6.2f} ms  (bytecode cache)")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,126 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default-key')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # connection pool, turned into SQLALCHEMY_ENGINE_OPTIONS by app/pool.py
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+    DB_POOL_LOG_INTERVAL = float(os.getenv('DB_POOL_LOG_INTERVAL', 0))
+
+    # startup db.create_all() attempts while the DB comes up
+    DB_CREATE_RETRIES = int(os.getenv('DB_CREATE_RETRIES', 10))
+    DB_CREATE_RETRY_DELAY = float(os.getenv('DB_CREATE_RETRY_DELAY', 1))
+
+    # per-request SQL instrumentation, see app/querystats.py
+    QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', '0') == '1'
+    QUERY_STATS_SLOW_MS = float(os.getenv('QUERY_STATS_SLOW_MS', 100))
+
+    # /metrics; with METRICS_DIR every process writes its snapshot there and
+    # /metrics sums them (multi-worker gunicorn), see app/metrics.py
+    METRICS_DIR = os.getenv('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 15))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # redirect resolution cache (short_code -> original_url), see app/cache.py
+    LINK_CACHE_SIZE = int(os.getenv('LINK_CACHE_SIZE', 10000))
+    LINK_CACHE_TTL = float(os.getenv('LINK_CACHE_TTL', 60))
+    LINK_CACHE_NEGATIVE_TTL = float(os.getenv('LINK_CACHE_NEGATIVE_TTL', 10))
+    # reload hot entries this many seconds before they expire; concurrent
+    # misses wait up to LINK_CACHE_LOAD_TIMEOUT for the one query in flight
+    LINK_CACHE_REFRESH_AHEAD = float(os.getenv('LINK_CACHE_REFRESH_AHEAD', 5))
+    LINK_CACHE_LOAD_TIMEOUT = float(os.getenv('LINK_CACHE_LOAD_TIMEOUT', 5))
+
+    # cold start: preload the N most clicked links, and/or serve misses from a
+    # snapshot file written by `flask links snapshot`, see app/warmup.py
+    LINK_WARMUP_TOP_K = int(os.getenv('LINK_WARMUP_TOP_K', 0))
+    LINK_SNAPSHOT_PATH = os.getenv('LINK_SNAPSHOT_PATH')
+    LINK_SNAPSHOT_MAX_AGE = float(os.getenv('LINK_SNAPSHOT_MAX_AGE', 300))
+    LINK_SNAPSHOT_SIZE = int(os.getenv('LINK_SNAPSHOT_SIZE', 100000))
+
+    # current_user principal cache (id/username/email/role/is_active)
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+
+    # seconds between bulk click-count writes, 0 = only flush on shutdown
+    CLICK_FLUSH_INTERVAL = float(os.getenv('CLICK_FLUSH_INTERVAL', 2))
+
+    # short code allocation, see app/shortcodes.py
+    SHORT_CODE_MIN_LENGTH = int(os.getenv('SHORT_CODE_MIN_LENGTH', 3))
+    SHORT_CODE_BLOCK_SIZE = int(os.getenv('SHORT_CODE_BLOCK_SIZE', 64))
+    SHORT_CODE_REUSE_DELAY = float(os.getenv('SHORT_CODE_REUSE_DELAY', 3600))
+    SHORT_CODE_BLOCK_MAX_AGE = float(os.getenv('SHORT_CODE_BLOCK_MAX_AGE', 60))
+
+    # Bloom filter of live short codes on the redirect path, see app/codefilter.py
+    SHORT_CODE_FILTER_ENABLED = os.getenv('SHORT_CODE_FILTER_ENABLED', '1') == '1'
+    SHORT_CODE_FILTER_FP_RATE = float(os.getenv('SHORT_CODE_FILTER_FP_RATE', 0.001))
+    SHORT_CODE_FILTER_MIN_CAPACITY = int(os.getenv('SHORT_CODE_FILTER_MIN_CAPACITY', 100000))
+    SHORT_CODE_FILTER_MAX_BYTES = int(os.getenv('SHORT_CODE_FILTER_MAX_BYTES', 64 * 1024 * 1024))
+    SHORT_CODE_FILTER_REBUILD_INTERVAL = float(os.getenv('SHORT_CODE_FILTER_REBUILD_INTERVAL', 3600))
+
+    # bulk link creation (POST /links/bulk and `flask links import`)
+    BULK_MAX_LINKS = int(os.getenv('BULK_MAX_LINKS', 100000))
+    BULK_INSERT_CHUNK = int(os.getenv('BULK_INSERT_CHUNK', 1000))
+
+    # click analytics, see app/analytics.py
+    ANALYTICS_FLUSH_INTERVAL = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', 5))
+    ANALYTICS_BUFFER_SIZE = int(os.getenv('ANALYTICS_BUFFER_SIZE', 100000))
+    ANALYTICS_BATCH_SIZE = int(os.getenv('ANALYTICS_BATCH_SIZE', 5000))
+    ANALYTICS_COUNTRY_HEADER = os.getenv('ANALYTICS_COUNTRY_HEADER')
+
+    # response compression, see app/compression.py
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_EXCLUDE_ENDPOINTS = [
+        endpoint.strip()
+        for endpoint in os.getenv('COMPRESS_EXCLUDE_ENDPOINTS', 'main.redirect_to_url').split(',')
+        if endpoint.strip()
+    ]
+    COMPRESS_CACHE_MAX_BYTES = int(os.getenv('COMPRESS_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+    # templates, see app/templating.py: compiled bytecode on disk (unset dir
+    # = a per-user temp dir), everything compiled at startup, and cached
+    # per-link table rows (links kept, 0 = off) and whole table bodies
+    JINJA_BYTECODE_CACHE_ENABLED = os.getenv('JINJA_BYTECODE_CACHE_ENABLED', '1') == '1'
+    JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR') or None
+    JINJA_PRELOAD_TEMPLATES = os.getenv('JINJA_PRELOAD_TEMPLATES', '1') == '1'
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 10000))
+    FRAGMENT_CACHE_TABLES = int(os.getenv('FRAGMENT_CACHE_TABLES', 256))
+
+    # redirect caching: per-link max-age is capped at this (keep it <=
+    # SHORT_CODE_REUSE_DELAY); the purge hook is an import path to an
+    # app.redirects.PurgeHook subclass, called on edit/delete
+    REDIRECT_MAX_AGE_LIMIT = int(os.getenv('REDIRECT_MAX_AGE_LIMIT', 3600))
+    REDIRECT_PURGE_HOOK = os.getenv('REDIRECT_PURGE_HOOK')
+
+    # per-endpoint token buckets, see app/ratelimit.py for the RATELIMIT_LIMITS format
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', '0') == '1'
+    RATELIMIT_LIMITS = os.getenv(
+        'RATELIMIT_LIMITS',
+        'main.redirect_to_url=ip:50/s; main.dashboard:POST=user:30/m; auth.login:POST=ip:10/m'
+    )
+    RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'app.ratelimit.MemoryBackend')
+    RATELIMIT_MAX_KEYS = int(os.getenv('RATELIMIT_MAX_KEYS', 100000))
+    RATELIMIT_PROXY_HOPS = int(os.getenv('RATELIMIT_PROXY_HOPS', 0))
+
+    # password hashing, see app/passwords.py; any werkzeug method string,
+    # older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 8))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    PASSWORD_HASH_EXECUTOR = os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')
+
+    # rows fetched per round trip by /admin/export/links and `flask links export`
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+    # rows per page on /admin/users
+    ADMIN_LINKS_PER_PAGE = int(os.getenv('ADMIN_LINKS_PER_PAGE', 50))
+
+    # async redirect fast path (redirect_asgi.py), has its own pool
+    REDIRECT_DB_POOL_SIZE = int(os.getenv('REDIRECT_DB_POOL_SIZE', 10))
+    REDIRECT_DB_MAX_OVERFLOW = int(os.getenv('REDIRECT_DB_MAX_OVERFLOW', 10))
+    REDIRECT_NOT_FOUND_URL = os.getenv('REDIRECT_NOT_FOUND_URL', '/')
\ No newline at end of file
@@ -0,0 +1,82 @@
+# Gunicorn settings for production, e.g. `gunicorn -c gunicorn.conf.py wsgi:app`
+# Every value can be overridden from the environment.
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# processes x threads; threads share one pool/cache per process
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+# time given to in-flight requests and background flushes on SIGTERM
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# recycle workers now and then, jittered so they don't restart together
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# import the app once in the master, workers share its memory copy-on-write
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def _flask_app():
+    from wsgi import app
+    return app
+
+
+def on_starting(server):
+    # per-worker /metrics snapshots from a previous run would be summed in
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir:
+        from app.metrics import clear_directory
+        clear_directory(metrics_dir)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from app import db
+
+    # the master must not hand its DB connections to the workers
+    with _flask_app().app_context():
+        db.engine.dispose()
+
+    # move everything loaded so far out of the GC's reach, so collections in
+    # the workers don't touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import db
+
+    # drop pooled connections inherited from the master without closing
+    # them on the master's behalf
+    with _flask_app().app_context():
+        db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    # write out pending click counts / click events before the process ends
+    from app.workers import drain_all
+    drain_all()
+
+
+def child_exit(server, worker):
+    # fold the exited worker's /metrics snapshot into the running totals,
+    # so recycled workers don't leave a file each behind
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir:
+        from app.metrics import fold_exited
+        fold_exited(metrics_dir, worker.pid)
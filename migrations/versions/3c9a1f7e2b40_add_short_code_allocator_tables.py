@@ -0,0 +1,39 @@
+"""add short code allocator tables
+
+Revision ID: 3c9a1f7e2b40
+Revises: bf22fb4ec41d
+Create Date: 2026-10-18 10:12:40.118215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a1f7e2b40'
+down_revision = 'bf22fb4ec41d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('short_code_counters',
+        sa.Column('length', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('next_index', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('length')
+    )
+    op.create_table('free_short_codes',
+        sa.Column('short_code', sa.String(length=10), nullable=False),
+        sa.Column('freed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('short_code')
+    )
+    with op.batch_alter_table('free_short_codes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_free_short_codes_freed_at'), ['freed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('free_short_codes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_free_short_codes_freed_at'))
+
+    op.drop_table('free_short_codes')
+    op.drop_table('short_code_counters')
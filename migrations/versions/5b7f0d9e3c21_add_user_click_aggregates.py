@@ -0,0 +1,42 @@
+"""add user click aggregates
+
+Revision ID: 5b7f0d9e3c21
+Revises: 8d2e6b0c4a17
+Create Date: 2026-10-18 11:48:03.550914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7f0d9e3c21'
+down_revision = '8d2e6b0c4a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_clicks', sa.BigInteger(), server_default='0', nullable=True))
+        batch_op.add_column(sa.Column('last_link_created_at', sa.DateTime(), nullable=True))
+
+    # backfill the counters from links (what `flask links reconcile` does),
+    # so link_deleted/clicks_reset don't drive them negative on old data
+    users = sa.table('users', sa.column('id'), sa.column('total_links'), sa.column('total_clicks'),
+                     sa.column('last_link_created_at'))
+    links = sa.table('links', sa.column('id'), sa.column('user_id'), sa.column('clicks'), sa.column('created_at'))
+    owned = links.c.user_id == users.c.id
+    op.execute(
+        users.update().values(
+            total_links=sa.select(sa.func.count(links.c.id)).where(owned).scalar_subquery(),
+            total_clicks=sa.select(sa.func.coalesce(sa.func.sum(links.c.clicks), 0)).where(owned).scalar_subquery(),
+            last_link_created_at=sa.select(sa.func.max(links.c.created_at)).where(owned).scalar_subquery(),
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('last_link_created_at')
+        batch_op.drop_column('total_clicks')
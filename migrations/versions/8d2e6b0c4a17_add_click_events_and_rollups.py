@@ -0,0 +1,47 @@
+"""add click events and rollups
+
+Revision ID: 8d2e6b0c4a17
+Revises: 3c9a1f7e2b40
+Create Date: 2026-10-18 11:02:15.402871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e6b0c4a17'
+down_revision = '3c9a1f7e2b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('click_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('link_id', sa.Integer(), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('referrer_host', sa.String(length=255), nullable=True),
+        sa.Column('ua_class', sa.String(length=10), nullable=False),
+        sa.Column('country', sa.String(length=2), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('click_events', schema=None) as batch_op:
+        batch_op.create_index('ix_click_events_link_id_occurred_at', ['link_id', 'occurred_at'], unique=False)
+
+    op.create_table('click_rollups',
+        sa.Column('link_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('period', sa.String(length=6), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('clicks', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('link_id', 'period', 'bucket_start')
+    )
+
+
+def downgrade():
+    op.drop_table('click_rollups')
+
+    with op.batch_alter_table('click_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_click_events_link_id_occurred_at')
+
+    op.drop_table('click_events')
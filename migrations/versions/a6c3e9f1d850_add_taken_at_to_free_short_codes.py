@@ -0,0 +1,26 @@
+"""add taken_at to free_short_codes
+
+Revision ID: a6c3e9f1d850
+Revises: e41a7c5d9f02
+Create Date: 2026-10-18 14:05:12.418903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c3e9f1d850'
+down_revision = 'e41a7c5d9f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('free_short_codes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('taken_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('free_short_codes', schema=None) as batch_op:
+        batch_op.drop_column('taken_at')
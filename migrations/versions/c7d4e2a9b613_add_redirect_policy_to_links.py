@@ -0,0 +1,30 @@
+"""add redirect policy to links
+
+Revision ID: c7d4e2a9b613
+Revises: a6c3e9f1d850
+Create Date: 2026-10-18 16:40:27.531094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d4e2a9b613'
+down_revision = 'a6c3e9f1d850'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('redirect_permanent', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('redirect_max_age', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('redirect_public', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_column('redirect_public')
+        batch_op.drop_column('redirect_max_age')
+        batch_op.drop_column('redirect_permanent')
@@ -0,0 +1,26 @@
+"""add version to links
+
+Revision ID: d3f9a1c6e825
+Revises: c7d4e2a9b613
+Create Date: 2026-10-18 19:12:48.204617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f9a1c6e825'
+down_revision = 'c7d4e2a9b613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,29 @@
+"""add indexes for hot link queries
+
+Revision ID: e41a7c5d9f02
+Revises: 5b7f0d9e3c21
+Create Date: 2026-10-18 12:20:47.031466
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41a7c5d9f02'
+down_revision = '5b7f0d9e3c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # dashboards: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    op.create_index('ix_links_user_created_id', 'links',
+                    ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+    # /admin/users?user_id=...: WHERE user_id = ? ORDER BY id DESC
+    op.create_index('ix_links_user_id_id', 'links', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_links_user_id_id', table_name='links')
+    op.drop_index('ix_links_user_created_id', table_name='links')
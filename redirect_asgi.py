@@ -0,0 +1,7 @@
+# Redirect-only fast path (no sessions/templates), run next to the Flask UI:
+#   uvicorn redirect_asgi:app --host 0.0.0.0 --port 5002 --workers 4
+# and route single-segment paths (/<short_code>) to it at the proxy.
+from app import create_app
+from app.fastpath import RedirectApp
+
+app = RedirectApp(create_app())
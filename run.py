@@ -1,8 +1,8 @@
+import os
 from app import create_app
-from flask_compress import Compress
 
 app = create_app()
-Compress(app)
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # development server only, production runs gunicorn with wsgi.py (see gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG', '1') == '1')
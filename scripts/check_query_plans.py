@@ -0,0 +1,40 @@
+"""EXPLAIN every hot query and fail if one regresses to a sequential scan.
+
+    DATABASE_URL=sqlite:////tmp/plans.db python scripts/check_query_plans.py
+    DATABASE_URL=postgresql://... python scripts/check_query_plans.py
+
+Tables are created if missing, so an empty SQLite file or a throwaway
+Postgres container is enough.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.queryplans import check
+
+
+def main():
+    verbose = '-v' in sys.argv[1:]
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        results = check(db.engine)
+
+    for result in results:
+        print(f"{'ok  ' if result.ok else 'FAIL'} {result.name}")
+        for problem in result.problems:
+            print(f"       {problem}")
+        if verbose:
+            print(f"       plan: {result.plan}")
+
+    failed = [result for result in results if not result.ok]
+    if failed:
+        print(f"\n{len(failed)} of {len(results)} hot queries regressed")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
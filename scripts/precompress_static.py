@@ -0,0 +1,73 @@
+"""Write .br and .gz twins of static assets so they're served without compressing.
+
+    python scripts/precompress_static.py [STATIC_DIR] [--min-size 500] [--force]
+
+Defaults to app/static. Only text-like files are compressed, and a twin is
+kept only if it's smaller than the original. Run it as a build step (the
+Dockerfile does); the app sends the best twin the client accepts, as long
+as it's at least as new as the original (see app/compression.py).
+"""
+import argparse
+import gzip
+import os
+import sys
+
+import brotli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXTENSIONS = {'.css', '.js', '.mjs', '.json', '.map', '.svg', '.html', '.txt', '.xml', '.ico', '.ttf', '.otf', '.eot'}
+
+
+def twins(data):
+    yield '.br', brotli.compress(data, quality=11)
+    yield '.gz', gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(directory, min_size, force):
+    written = skipped = 0
+    for folder, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(folder, name)
+            if os.path.splitext(name)[1].lower() not in EXTENSIONS or os.path.getsize(path) < min_size:
+                continue
+            mtime = os.path.getmtime(path)
+            data = compressed = None
+            for suffix in ('.br', '.gz'):
+                target = path + suffix
+                if not force and os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    skipped += 1
+                    continue
+                if compressed is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    compressed = dict(twins(data))
+                body = compressed[suffix]
+                if len(body) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target + '.tmp', 'wb') as f:
+                    f.write(body)
+                os.replace(target + '.tmp', target)
+                written += 1
+    return written, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directory', nargs='?', default=os.path.join(ROOT, 'app', 'static'))
+    parser.add_argument('--min-size', type=int, default=500, help='skip files smaller than this (bytes)')
+    parser.add_argument('--force', action='store_true', help='rewrite up-to-date twins too')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"{args.directory}: no static directory, nothing to do")
+        return 0
+    written, skipped = precompress(args.directory, args.min_size, args.force)
+    print(f"wrote {written} compressed files, {skipped} already up to date")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
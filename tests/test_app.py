@@ -1,3 +1,4 @@
+import os
 import pytest
 from app import create_app, db
 
@@ -10,7 +11,9 @@ def app():
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///test.db",
         "WTF_CSRF_ENABLED": False,
-        "SECRET_KEY": "test-secret-key"
+        "SECRET_KEY": "test-secret-key",
+        "CLICK_FLUSH_INTERVAL": 0,
+        "ANALYTICS_FLUSH_INTERVAL": 0
     })
 
     with app.app_context():
@@ -179,4 +182,1037 @@ def test_app_is_testing(app):
 
 def test_app_secret_key(app):
     """Test app has secret key"""
-    assert app.config["SECRET_KEY"] is not None
\ No newline at end of file
+    assert app.config["SECRET_KEY"] is not None
+
+# ==========================================
+# REDIRECT CACHE TESTS
+# ==========================================
+
+@pytest.fixture
+def user(app):
+    """Create a plain user with all required profile fields"""
+    from app.models import User
+    user = User(
+        username="cacheuser",
+        email="cacheuser@example.com",
+        first_name="Cache",
+        gender="other",
+        age=30,
+        profession="tester"
+    )
+    user.set_password("TestPassword123!")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def logged_in_client(client, user):
+    """Test client with `user` logged in"""
+    client.post("/", data={
+        "email": "cacheuser@example.com",
+        "password": "TestPassword123!"
+    })
+    return client
+
+
+def test_redirect_is_served_from_cache(client, user):
+    """Second redirect for the same code doesn't hit the links table"""
+    from app.models import Link
+    from app.cache import link_cache
+    db.session.add(Link(short_code="abc", original_url="https://example.com", user_id=user.id))
+    db.session.commit()
+
+    assert client.get("/abc").headers["Location"] == "https://example.com"
+    assert client.get("/abc").headers["Location"] == "https://example.com"
+    assert link_cache.stats()["hits"] == 1
+
+
+def test_unknown_code_is_negatively_cached(client):
+    """Unknown codes are cached so repeated probes skip the DB"""
+    from app.cache import link_cache
+    client.get("/zzz")
+    client.get("/zzz")
+    stats = link_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_edit_invalidates_cached_link(logged_in_client, user):
+    """Editing a link through the dashboard drops the cached url"""
+    from app.models import Link
+    link = Link(short_code="edt", original_url="https://old.example.com", user_id=user.id)
+    db.session.add(link)
+    db.session.commit()
+    assert logged_in_client.get("/edt").headers["Location"] == "https://old.example.com"
+
+    logged_in_client.post("/dashboard", data={"url": "https://new.example.com", "edit_id": link.id})
+    assert logged_in_client.get("/edt").headers["Location"] == "https://new.example.com"
+
+
+def test_delete_invalidates_cached_link(logged_in_client, user):
+    """Deleted links stop redirecting immediately"""
+    from app.models import Link
+    link = Link(short_code="del", original_url="https://example.com", user_id=user.id)
+    db.session.add(link)
+    db.session.commit()
+    assert logged_in_client.get("/del").headers["Location"] == "https://example.com"
+
+    logged_in_client.post(f"/delete/{link.id}")
+    assert logged_in_client.get("/del").headers["Location"] == "/"
+
+
+# ==========================================
+# CLICK COUNTING TESTS
+# ==========================================
+
+def test_clicks_are_batched_until_flush(client, user):
+    """Redirects don't write clicks; a flush applies them in one go"""
+    from app.models import Link
+    from app.clicks import click_counter
+    db.session.add(Link(short_code="clk", original_url="https://example.com", user_id=user.id, clicks=0))
+    db.session.commit()
+
+    for _ in range(3):
+        client.get("/clk")
+    assert click_counter.stats()["pending_clicks"] == 3
+    assert db.session.query(Link.clicks).filter_by(short_code="clk").scalar() == 0
+
+    assert click_counter.flush() == 3
+    assert click_counter.stats()["pending_clicks"] == 0
+    assert db.session.query(Link.clicks).filter_by(short_code="clk").scalar() == 3
+
+
+def test_click_flush_retries_after_failure(app, user, monkeypatch):
+    """Deltas are kept if the bulk UPDATE fails"""
+    from app.clicks import click_counter
+    click_counter.incr(42, 1, 5)
+    monkeypatch.setattr(db.session, "execute", lambda *a, **kw: (_ for _ in ()).throw(RuntimeError("db down")))
+    with pytest.raises(RuntimeError):
+        click_counter.flush()
+    assert click_counter.stats()["pending_clicks"] == 5
+    click_counter.discard(42)
+
+
+# ==========================================
+# SHORT CODE ALLOCATION TESTS
+# ==========================================
+
+def test_dashboard_create_uses_allocator(logged_in_client, user):
+    """Creating a link stores an allocated 3-char code"""
+    from app.models import Link
+    logged_in_client.post("/dashboard", data={"url": "https://example.com"})
+    link = Link.query.filter_by(user_id=user.id).one()
+    assert len(link.short_code) == 3
+
+
+def test_delete_frees_short_code(logged_in_client, user):
+    """Deleting a link queues its code for reuse"""
+    from app.models import Link, FreeShortCode
+    link = Link(short_code="fre", original_url="https://example.com", user_id=user.id)
+    db.session.add(link)
+    db.session.commit()
+
+    logged_in_client.post(f"/delete/{link.id}")
+    assert db.session.get(FreeShortCode, "fre") is not None
+
+
+def test_delete_link_with_reused_code(logged_in_client, user, app):
+    """A link holding a reused code can be deleted, and its code freed again"""
+    from app.models import Link, FreeShortCode
+    from app.shortcodes import shortcode_allocator
+    shortcode_allocator.reuse_delay = 0
+    logged_in_client.post("/dashboard", data={"url": "https://first.example.com"})
+    first = Link.query.filter_by(user_id=user.id).one()
+    code = first.short_code
+    logged_in_client.post(f"/delete/{first.id}")
+
+    shortcode_allocator._buffer.clear()
+    logged_in_client.post("/dashboard", data={"url": "https://second.example.com"})
+    second = Link.query.filter_by(user_id=user.id).one()
+    assert second.short_code == code
+
+    logged_in_client.post(f"/delete/{second.id}")
+    db.session.expire_all()
+    assert db.session.get(Link, second.id) is None
+    assert db.session.get(FreeShortCode, code).taken_at is None
+
+
+# ==========================================
+# BULK CREATE TESTS
+# ==========================================
+
+def test_bulk_create_json_keeps_input_order(logged_in_client, user):
+    """JSON array of URLs comes back as short URLs in the same order"""
+    from app.models import Link
+    urls = [f"https://example.com/{i}" for i in range(25)]
+    response = logged_in_client.post("/links/bulk", json=urls)
+    assert response.status_code == 201
+
+    links = response.get_json()["links"]
+    assert [item["url"] for item in links] == urls
+    assert len({item["short_code"] for item in links}) == 25
+    assert Link.query.filter_by(user_id=user.id).count() == 25
+
+
+def test_bulk_create_csv_with_header(logged_in_client, user):
+    """CSV bodies use the url column"""
+    body = "name,url\na,https://a.example.com\nb,https://b.example.com\n"
+    response = logged_in_client.post("/links/bulk", data=body, content_type="text/csv")
+    assert response.status_code == 201
+    assert [item["url"] for item in response.get_json()["links"]] == [
+        "https://a.example.com", "https://b.example.com"]
+
+
+def test_bulk_create_rejects_bad_input(logged_in_client):
+    """Malformed bodies return 400"""
+    response = logged_in_client.post("/links/bulk", data="{", content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_links_import_cli(app, user, tmp_path):
+    """`flask links import` creates links and prints them as CSV"""
+    from app.models import Link
+    source = tmp_path / "urls.json"
+    source.write_text('["https://a.example.com", {"url": "https://b.example.com"}]')
+
+    result = app.test_cli_runner().invoke(args=["links", "import", str(source), "--user", user.email])
+    assert result.exit_code == 0, result.output
+    assert Link.query.filter_by(user_id=user.id).count() == 2
+    assert "https://b.example.com" in result.output
+
+
+# ==========================================
+# CLICK ANALYTICS TESTS
+# ==========================================
+
+def test_redirect_records_click_event(client, user):
+    """Redirects buffer an event; a flush writes it and the rollups"""
+    from app.models import Link, ClickEvent, ClickRollup
+    from app.analytics import click_events
+    db.session.add(Link(short_code="evt", original_url="https://example.com", user_id=user.id))
+    db.session.commit()
+
+    client.get("/evt", headers={"Referer": "https://news.example.org/post", "User-Agent": "Googlebot/2.1"})
+    client.get("/evt", headers={"User-Agent": "Mozilla/5.0 (iPhone)"})
+    assert click_events.stats()["buffered"] == 2
+    assert ClickEvent.query.count() == 0
+
+    assert click_events.flush() == 2
+    events = ClickEvent.query.order_by(ClickEvent.id).all()
+    assert [e.ua_class for e in events] == ["bot", "mobile"]
+    assert events[0].referrer_host == "news.example.org"
+
+    rollups = {r.period: r.clicks for r in ClickRollup.query.all()}
+    assert rollups == {"minute": 2, "hour": 2, "day": 2}
+
+
+def test_rollups_accumulate_across_flushes(app, user):
+    """A second flush adds to existing buckets instead of duplicating them"""
+    from app.models import ClickRollup
+    from app.analytics import click_events
+    click_events.record(1, None, "curl/8.0")
+    click_events.flush()
+    click_events.record(1, None, "curl/8.0")
+    click_events.flush()
+    assert ClickRollup.query.filter_by(period="day").one().clicks == 2
+
+
+def test_link_stats_reads_rollups(logged_in_client, user):
+    """Stats endpoint returns the hourly series"""
+    from app.models import Link
+    from app.analytics import click_events
+    link = Link(short_code="sts", original_url="https://example.com", user_id=user.id)
+    db.session.add(link)
+    db.session.commit()
+    logged_in_client.get("/sts")
+    click_events.flush()
+
+    data = logged_in_client.get(f"/links/{link.id}/stats?period=hour").get_json()
+    assert [point["clicks"] for point in data["series"]] == [1]
+
+
+# ==========================================
+# ADMIN USERS PAGE TESTS
+# ==========================================
+
+@pytest.fixture
+def admin_client(client, app):
+    """Test client logged in as an admin"""
+    from app.models import User
+    admin = User(username="admin", email="admin@example.com", role="admin",
+                 first_name="Admin", gender="other", age=40, profession="ops")
+    admin.set_password("AdminPassword123!")
+    db.session.add(admin)
+    db.session.commit()
+    client.post("/", data={"email": "admin@example.com", "password": "AdminPassword123!"})
+    return client
+
+
+def _seed_links(user, count, prefix):
+    from app.models import Link
+    for i in range(count):
+        db.session.add(Link(short_code=f"{prefix}{i}", original_url=f"https://example.com/{i}", user_id=user.id))
+    db.session.commit()
+
+
+def test_admin_users_page_has_no_n_plus_one(admin_client, user):
+    """Links and owners load in a constant number of queries"""
+    from sqlalchemy import event
+    _seed_links(user, 30, "n")
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        response = admin_client.get("/admin/users")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert b"n29" in response.data
+    # current_user + dropdown projection + links page
+    assert len([s for s in statements if "FROM links" in s]) == 1
+    assert len(statements) <= 3
+
+
+def test_admin_users_page_is_paginated(admin_client, user, app):
+    """Only ADMIN_LINKS_PER_PAGE rows render, with a cursor to the next page"""
+    app.config["ADMIN_LINKS_PER_PAGE"] = 10
+    _seed_links(user, 15, "p")
+
+    first = admin_client.get(f"/admin/users?user_id={user.id}").data.decode()
+    assert 'href="/p14"' in first and 'href="/p4"' not in first
+    assert "after=6" in first
+
+    second = admin_client.get(f"/admin/users?user_id={user.id}&after=6").data.decode()
+    assert 'href="/p4"' in second and 'href="/p14"' not in second
+    assert "before=5" in second
+
+
+# ==========================================
+# DASHBOARD CURSOR PAGINATION TESTS
+# ==========================================
+
+def test_dashboard_walks_pages_with_cursors(logged_in_client, user):
+    """Next/prev cursors cover every link exactly once"""
+    import re
+    for i in range(25):
+        logged_in_client.post("/dashboard", data={"url": f"https://example.com/{i}"})
+
+    seen = []
+    url = "/dashboard"
+    while url:
+        html = logged_in_client.get(url).data.decode()
+        seen += re.findall(r'href="(https://example.com/\d+)"', html)
+        match = re.search(r'href="(/dashboard\?after=[^"]+)"', html)
+        url = match.group(1).replace("&amp;", "&") if match else None
+
+    assert len(seen) == 25
+    assert seen[0] == "https://example.com/24"
+    assert "Showing 21 - 25 of 25" in html
+
+
+def test_total_links_is_maintained(logged_in_client, user):
+    """Create/bulk/delete keep User.total_links in sync"""
+    from app.models import Link
+    logged_in_client.post("/dashboard", data={"url": "https://example.com"})
+    logged_in_client.post("/links/bulk", json=["https://a.example.com", "https://b.example.com"])
+    link = Link.query.filter_by(user_id=user.id).first()
+    logged_in_client.post(f"/delete/{link.id}")
+
+    db.session.refresh(user)
+    assert user.total_links == 2
+
+
+def test_dashboard_does_not_count(logged_in_client, user):
+    """Dashboard pages don't run COUNT(*) over links"""
+    from sqlalchemy import event
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        logged_in_client.get("/dashboard")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    assert not [s for s in statements if "count(" in s.lower()]
+
+
+# ==========================================
+# PER-USER AGGREGATE TESTS
+# ==========================================
+
+def test_click_flush_updates_user_total_clicks(client, user):
+    """The click flusher adds to the owner's total_clicks"""
+    from app.models import Link
+    from app.clicks import click_counter
+    db.session.add(Link(short_code="agg", original_url="https://example.com", user_id=user.id, clicks=0))
+    db.session.commit()
+
+    client.get("/agg")
+    client.get("/agg")
+    click_counter.flush()
+    db.session.refresh(user)
+    assert user.total_clicks == 2
+
+
+def test_edit_and_delete_adjust_total_clicks(logged_in_client, user):
+    """Resetting or deleting a link takes its clicks off the user total"""
+    from app.models import Link
+    from app import aggregates
+    a = Link(short_code="ea", original_url="https://a.example.com", user_id=user.id, clicks=5)
+    b = Link(short_code="eb", original_url="https://b.example.com", user_id=user.id, clicks=7)
+    db.session.add_all([a, b])
+    db.session.commit()
+    aggregates.reconcile()
+
+    logged_in_client.post("/dashboard", data={"url": "https://c.example.com", "edit_id": a.id})
+    logged_in_client.post(f"/delete/{b.id}")
+    db.session.refresh(user)
+    assert (user.total_links, user.total_clicks) == (1, 0)
+
+
+def test_clicks_of_deleted_link_are_not_counted(logged_in_client, user):
+    """Pending clicks of a link deleted elsewhere don't reach total_clicks"""
+    from sqlalchemy import delete
+    from app.models import Link
+    from app.clicks import click_counter
+    from app import aggregates
+    logged_in_client.post("/dashboard", data={"url": "https://example.com"})
+    link = Link.query.filter_by(user_id=user.id).one()
+    click_counter.incr(link.id, user.id, 100)
+
+    # another worker deletes it, so this one's pending clicks aren't discarded
+    db.session.execute(delete(Link.__table__).where(Link.__table__.c.id == link.id))
+    aggregates.link_deleted(user.id, 0)
+    db.session.commit()
+
+    assert click_counter.flush() == 0
+    db.session.refresh(user)
+    assert (user.total_links, user.total_clicks) == (0, 0)
+    assert user.total_clicks == db.session.query(db.func.coalesce(db.func.sum(Link.clicks), 0)).scalar()
+
+
+def test_reconcile_cli(app, user):
+    """`flask links reconcile` recomputes counters from the links table"""
+    from app.models import Link
+    db.session.add(Link(short_code="rc1", original_url="https://example.com", user_id=user.id, clicks=3))
+    db.session.add(Link(short_code="rc2", original_url="https://example.com", user_id=user.id, clicks=4))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["links", "reconcile"])
+    assert result.exit_code == 0, result.output
+    db.session.refresh(user)
+    assert (user.total_links, user.total_clicks) == (2, 7)
+    assert user.last_link_created_at is not None
+
+
+# ==========================================
+# CONNECTION POOL TESTS
+# ==========================================
+
+def test_engine_options_from_config():
+    """DB_* settings become engine options; statement timeout only on Postgres"""
+    from config import Config
+    from app.pool import engine_options, TimedQueuePool
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+
+    config.update(SQLALCHEMY_DATABASE_URI="postgresql://u:p@db/bitly", DB_POOL_SIZE=20, DB_STATEMENT_TIMEOUT_MS=5000)
+    options = engine_options(config)
+    assert options["poolclass"] is TimedQueuePool
+    assert options["pool_size"] == 20
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+    config.update(SQLALCHEMY_DATABASE_URI="sqlite:///:memory:")
+    assert "pool_size" not in engine_options(config)
+
+
+def test_pool_stats_endpoint(admin_client):
+    """Admins can read checked-out/idle/overflow counts and wait time"""
+    data = admin_client.get("/admin/pool").get_json()
+    assert data["pool_class"] == "TimedQueuePool"
+    assert data["checkouts"] >= 1
+    assert {"checked_out", "idle", "overflow", "wait_avg_ms", "wait_max_ms"} <= set(data)
+
+
+def test_pool_stats_hidden_from_users(logged_in_client):
+    """Non-admins get a 404"""
+    assert logged_in_client.get("/admin/pool").status_code == 404
+
+
+def test_pool_logger_silent_at_exit_when_off(app, monkeypatch):
+    """With DB_POOL_LOG_INTERVAL=0 shutdown doesn't touch the pool"""
+    from app.pool import pool_logger
+    app.config["DB_POOL_LOG_INTERVAL"] = 0
+    flushed = []
+    monkeypatch.setattr(pool_logger, "flush", lambda: flushed.append(True))
+    pool_logger.drain()
+    assert flushed == []
+
+    app.config["DB_POOL_LOG_INTERVAL"] = 60
+    pool_logger.drain()
+    assert flushed == [True]
+
+
+# ==========================================
+# CURRENT_USER PRINCIPAL CACHE TESTS
+# ==========================================
+
+def _fresh_user_load():
+    """The fixture keeps one app context (and `g`) for the whole test, so
+    Flask-Login would reuse the user from the login request; drop it."""
+    from flask import g
+    g.pop("_login_user", None)
+
+
+def test_current_user_is_cached_principal(logged_in_client, user):
+    """Authenticated requests reuse a cached slim principal"""
+    from app.principals import principal_cache, UserPrincipal
+    from flask import g
+    from sqlalchemy import event
+    _fresh_user_load()
+    logged_in_client.get("/dashboard")
+    assert isinstance(g._login_user, UserPrincipal)
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        _fresh_user_load()
+        logged_in_client.get("/dashboard")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert principal_cache.stats()["hits"] == 1
+    # no full-row user load: the only users query is the counters projection
+    user_queries = [s for s in statements if "FROM users" in s]
+    assert len(user_queries) == 1 and "users.bio" not in user_queries[0]
+
+
+def test_role_change_invalidates_principal(logged_in_client, user):
+    """Promoting a user is visible on their next request"""
+    _fresh_user_load()
+    assert logged_in_client.get("/admin/").status_code == 302
+
+    user.role = "admin"
+    db.session.commit()
+    _fresh_user_load()
+    assert logged_in_client.get("/admin/").status_code == 200
+
+
+def test_profile_loads_full_user(logged_in_client, user):
+    """Profile page still shows profile fields"""
+    _fresh_user_load()
+    response = logged_in_client.get("/profile")
+    assert response.status_code == 200
+    assert b"tester" in response.data
+
+
+# ==========================================
+# ASYNC REDIRECT FAST PATH TESTS
+# ==========================================
+
+def _asgi_get(asgi_app, path, method="GET", headers=()):
+    """Run one request through an ASGI app, return (status, headers)"""
+    import asyncio
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        scope = {"type": "http", "method": method, "path": path, "headers": list(headers)}
+        try:
+            await asgi_app(scope, receive, send)
+        finally:
+            await asgi_app.engine.dispose()
+
+    asyncio.run(run())
+    return sent[0]["status"], dict(sent[0]["headers"])
+
+
+def test_fastpath_redirects_and_counts(app, user):
+    """Known codes redirect and feed the same click counters as Flask"""
+    from app.models import Link
+    from app.fastpath import RedirectApp
+    from app.clicks import click_counter
+    from app.analytics import click_events
+    db.session.add(Link(short_code="fst", original_url="https://example.com/ü", user_id=user.id))
+    db.session.commit()
+
+    status, headers = _asgi_get(RedirectApp(app), "/fst", headers=[(b"user-agent", b"curl/8.0")])
+    assert status == 302
+    assert headers[b"location"] == b"https://example.com/%C3%BC"
+    assert click_counter.stats()["pending_clicks"] == 1
+    assert click_events.stats()["buffered"] == 1
+    click_counter.flush()
+    click_events.flush()
+
+
+def test_fastpath_rejects_settled_unknown_codes(app, user):
+    """The fast path keeps the filter rebuilding and answers settled misses without a query"""
+    import time
+    from app.fastpath import RedirectApp
+    from app.codefilter import code_filter
+    from app.shortcodes import shortcode_allocator
+    from app.querystats import query_budget
+    code_filter._pid = None
+    app.config["SHORT_CODE_FILTER_REBUILD_INTERVAL"] = 0.05
+    shortcode_allocator.block_max_age = 0.02
+    unsaved = shortcode_allocator.allocate()
+
+    redirect_app = RedirectApp(app)
+    _asgi_get(redirect_app, "/nothere")     # starts the rebuild thread
+    assert code_filter._pid == os.getpid()
+    time.sleep(0.3)
+    app.config["SHORT_CODE_FILTER_REBUILD_INTERVAL"] = 3600
+    time.sleep(0.1)  # let the last short wait run out
+    assert code_filter.stats()["settled_indexes"]
+
+    with query_budget(0):
+        status, headers = _asgi_get(redirect_app, "/" + unsaved)
+    assert (status, headers[b"location"]) == (302, b"/")
+    assert code_filter.stats()["rejected"] >= 1
+
+
+def test_fastpath_unknown_code_and_methods(app):
+    """Unknown codes go to the not-found url; only GET/HEAD are served"""
+    from app.fastpath import RedirectApp
+    redirect_app = RedirectApp(app)
+    assert _asgi_get(redirect_app, "/nope") == (302, {b"content-length": b"0", b"location": b"/"})
+    assert _asgi_get(redirect_app, "/nope", method="POST")[0] == 405
+    assert _asgi_get(redirect_app, "/a/b")[0] == 404
+
+
+# ==========================================
+# QUERY INSTRUMENTATION TESTS
+# ==========================================
+
+@pytest.fixture
+def query_stats():
+    """Per-request SQL instrumentation switched on for one test"""
+    from app.querystats import query_stats
+    query_stats.enabled = True
+    yield query_stats
+    query_stats.enabled = False
+
+
+def test_server_timing_reports_queries(client, user, query_stats, caplog):
+    """Instrumented responses carry query count and DB time"""
+    import logging
+    from app.models import Link
+    db.session.add(Link(short_code="tim", original_url="https://example.com", user_id=user.id))
+    db.session.commit()
+
+    with caplog.at_level(logging.INFO):
+        response = client.get("/tim")
+    timing = response.headers.getlist("Server-Timing")
+    assert timing[0].startswith('db;desc="1 queries";dur=')
+    assert any(t.startswith("db-slowest;dur=") for t in timing)
+    assert "endpoint=main.redirect_to_url" in caplog.text and "queries=1" in caplog.text
+
+    # served from the link cache now
+    assert client.get("/tim").headers["Server-Timing"].startswith('db;desc="0 queries"')
+
+
+def test_slow_queries_are_logged(client, query_stats, caplog):
+    """Statements over QUERY_STATS_SLOW_MS are logged with their SQL"""
+    import logging
+    query_stats.slow_ms = 0
+    with caplog.at_level(logging.WARNING):
+        client.get("/unknown")
+    query_stats.slow_ms = 100
+    assert "slow query endpoint=main.redirect_to_url" in caplog.text
+    assert "FROM links" in caplog.text
+
+
+def test_no_server_timing_when_disabled(client):
+    """Instrumentation is opt-in"""
+    assert "Server-Timing" not in client.get("/").headers
+
+
+def test_query_budgets(logged_in_client, user):
+    """Hot endpoints stay within a fixed number of statements"""
+    from app.querystats import query_budget, QueryBudgetExceeded
+    _seed_links(user, 30, "b")
+
+    _fresh_user_load()
+    with query_budget(3):
+        logged_in_client.get("/dashboard")
+    with query_budget(1):
+        logged_in_client.get("/b1")
+    with pytest.raises(QueryBudgetExceeded, match="budget 0"):
+        with query_budget(0):
+            logged_in_client.get("/b2")
+
+
+# ==========================================
+# METRICS ENDPOINT TESTS
+# ==========================================
+
+def _metric(client, sample):
+    """Value of one sample line (name + labels) from /metrics, 0 if absent"""
+    for line in client.get("/metrics").data.decode().splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0
+
+
+def test_metrics_exposition(client, user):
+    """Latency histogram per endpoint, cache and click gauges"""
+    from app.models import Link
+    db.session.add(Link(short_code="met", original_url="https://example.com", user_id=user.id))
+    db.session.commit()
+    count = 'shortener_http_request_duration_seconds_count{endpoint="main.redirect_to_url"}'
+    before = _metric(client, count)
+
+    client.get("/met")
+    client.get("/met")
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    text = response.data.decode()
+    assert "# TYPE shortener_http_request_duration_seconds histogram" in text
+    assert 'le="+Inf"' in text
+    assert _metric(client, count) == before + 2
+    assert _metric(client, "shortener_clicks_pending") >= 2
+    assert 0 < _metric(client, "shortener_link_cache_hit_ratio") <= 1
+
+
+def test_metrics_count_created_links(logged_in_client, user):
+    """Dashboard and bulk creation both feed the link-creation counter"""
+    before = _metric(logged_in_client, "shortener_links_created_total")
+    logged_in_client.post("/dashboard", data={"url": "https://example.com/one"})
+    logged_in_client.post("/links/bulk", json=["https://example.com/a", "https://example.com/b"])
+    assert _metric(logged_in_client, "shortener_links_created_total") == before + 3
+
+
+def test_metrics_sum_worker_snapshots(client, app, tmp_path):
+    """With METRICS_DIR, other processes' snapshots are added in"""
+    import json
+    from app.metrics import metrics
+    metrics.directory = str(tmp_path)
+    try:
+        before = _metric(client, "shortener_links_created_total")
+        live, dead = os.getppid(), 2 ** 22 + 1
+        for pid in (live, dead):
+            (tmp_path / f"metrics-{pid}.json").write_text(json.dumps({
+                "pid": pid,
+                "counters": [["shortener_links_created_total", {}, 5]],
+                "histograms": [],
+                "gauges": [["shortener_clicks_pending", {}, 7]],
+            }))
+        metrics.flush()
+        assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+        assert _metric(client, "shortener_links_created_total") == before + 10
+        # gauges of exited processes are dropped
+        assert _metric(client, "shortener_clicks_pending") == 7
+        # ...and their files folded into one, counters intact
+        assert not (tmp_path / f"metrics-{dead}.json").exists()
+        assert (tmp_path / "metrics-exited.json").exists()
+        assert _metric(client, "shortener_links_created_total") == before + 10
+    finally:
+        metrics.directory = None
+
+
+def test_exited_worker_snapshots_are_folded(tmp_path):
+    """Recycled workers add up in metrics-exited.json instead of one file each"""
+    import json
+    from app.metrics import fold_exited
+    for pid in (2 ** 22 + 1, 2 ** 22 + 2):
+        (tmp_path / f"metrics-{pid}.json").write_text(json.dumps({
+            "pid": pid,
+            "counters": [["shortener_links_created_total", {}, 2]],
+            "histograms": [["shortener_http_request_duration_seconds", {"endpoint": "x"}, [1] + [0] * 11 + [0.5]]],
+            "gauges": [["shortener_clicks_pending", {}, 3]],
+        }))
+        fold_exited(str(tmp_path), pid)
+        fold_exited(str(tmp_path), pid)  # already folded: no-op
+
+    assert sorted(p.name for p in tmp_path.glob("metrics-*.json")) == ["metrics-exited.json"]
+    exited = json.loads((tmp_path / "metrics-exited.json").read_text())
+    assert exited["counters"] == [["shortener_links_created_total", {}, 4]]
+    assert exited["histograms"][0][2][0] == 2 and exited["gauges"] == []
+
+
+def test_metrics_token(client, app):
+    """METRICS_TOKEN hides the endpoint from unauthenticated scrapes"""
+    app.config["METRICS_TOKEN"] = "s3cret"
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+# ==========================================
+# CACHE WARM-UP / SNAPSHOT TESTS
+# ==========================================
+
+def test_warmup_preloads_most_clicked_links(app, user):
+    """Top-K links by clicks are cached before the first redirect"""
+    from app.models import Link
+    from app.cache import link_cache
+    from app.warmup import warm_link_cache
+    for code, clicks in [("cld", 0), ("wrm", 50), ("hot", 90)]:
+        db.session.add(Link(short_code=code, original_url=f"https://{code}", user_id=user.id, clicks=clicks))
+    db.session.commit()
+
+    app.config["LINK_WARMUP_TOP_K"] = 2
+    assert warm_link_cache(app) == 2
+    assert link_cache.lookup("hot")[1].original_url == "https://hot"
+    assert link_cache.lookup("wrm")[0]
+    assert not link_cache.lookup("cld")[0]
+
+
+def test_snapshot_serves_redirects_without_db(client, app, user, tmp_path):
+    """Misses are answered from a fresh snapshot file before querying"""
+    from app.models import Link
+    from app.warmup import link_snapshot
+    db.session.add(Link(short_code="snp", original_url="https://snap.example.com", user_id=user.id, clicks=3))
+    db.session.commit()
+    path = str(tmp_path / "links.snap")
+    result = app.test_cli_runner().invoke(args=["links", "snapshot", path])
+    assert "Wrote 1 links" in result.output
+
+    app.config["LINK_SNAPSHOT_PATH"] = path
+    link_snapshot.init_app(app)
+    Link.query.filter_by(short_code="snp").delete()
+    db.session.commit()
+
+    assert client.get("/snp").headers["Location"] == "https://snap.example.com"
+    assert link_snapshot.stats()["hits"] == 1
+
+
+def test_snapshot_skips_stale_and_changed_codes(client, app, user, tmp_path):
+    """Old snapshots are ignored, and so are codes changed after writing"""
+    from app.warmup import link_snapshot, write_snapshot
+    path = str(tmp_path / "links.snap")
+    write_snapshot(path, [("old", 1, "https://old", user.id), ("chg", 2, "https://chg", user.id)])
+    app.config.update({"LINK_SNAPSHOT_PATH": path, "LINK_SNAPSHOT_MAX_AGE": 300})
+    link_snapshot.init_app(app)
+
+    link_snapshot.invalidate("chg")
+    assert link_snapshot.get("chg") is None
+    assert link_snapshot.get("old").original_url == "https://old"
+
+    app.config["LINK_SNAPSHOT_MAX_AGE"] = 0
+    link_snapshot.init_app(app)
+    assert link_snapshot.get("old") is None
+
+
+def test_replaced_snapshot_stays_readable(app, user, tmp_path):
+    """Threads still searching the previous snapshot don't see a closed map"""
+    from app.warmup import link_snapshot, write_snapshot
+    path = str(tmp_path / "links.snap")
+    write_snapshot(path, [("one", 1, "https://one", user.id)])
+    app.config.update({"LINK_SNAPSHOT_PATH": path, "LINK_SNAPSHOT_MAX_AGE": 300})
+    link_snapshot.init_app(app)
+    assert link_snapshot.get("one").original_url == "https://one"
+    held = link_snapshot._snapshot
+
+    # the held file went stale and a rewritten one is picked up
+    write_snapshot(path, [("two", 2, "https://two", user.id)])
+    held.written_at -= 3600
+    link_snapshot._next_check = 0
+    assert link_snapshot.get("two").original_url == "https://two"
+    assert link_snapshot._snapshot is not held
+    assert held.get("one").original_url == "https://one"
+
+
+# ==========================================
+# EXPORT TESTS
+# ==========================================
+
+def test_export_csv_streams_all_links(admin_client, user, app):
+    """CSV export has a header, every link in id order and the pinned max id"""
+    import csv
+    app.config["EXPORT_BATCH_SIZE"] = 2
+    _seed_links(user, 5, "exp")
+    response = admin_client.get("/admin/export/links")
+    assert response.is_streamed
+    rows = list(csv.DictReader(response.get_data(as_text=True).splitlines()))
+    assert [row["short_code"] for row in rows] == [f"exp{i}" for i in range(5)]
+    assert rows[0]["username"] == user.username and rows[0]["clicks"] == "0"
+    assert response.headers["X-Export-Max-Id"] == rows[-1]["id"]
+
+
+def test_export_json_gzip_and_resume(admin_client, user):
+    """gzip on request, and after_id/max_id select a resumable id range"""
+    import gzip
+    import json
+    from app.models import Link
+    _seed_links(user, 4, "res")
+    ids = [link.id for link in Link.query.order_by(Link.id)]
+
+    response = admin_client.get(f"/admin/export/links?format=json&after_id={ids[0]}&max_id={ids[2]}",
+                                headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    records = json.loads(gzip.decompress(response.get_data()))
+    assert [record["id"] for record in records] == ids[1:3]
+
+
+def test_export_hidden_from_users(logged_in_client):
+    """Only admins can export"""
+    assert logged_in_client.get("/admin/export/links").status_code == 404
+
+
+def test_links_export_cli(app, user, tmp_path):
+    """`flask links export` writes the same CSV, optionally gzipped, per user"""
+    import gzip
+    _seed_links(user, 3, "cli")
+    output = tmp_path / "links.csv.gz"
+    result = app.test_cli_runner().invoke(args=["links", "export", str(output), "--user", user.email, "--gzip"])
+    assert "Exported 3 links" in result.output
+    lines = gzip.decompress(output.read_bytes()).decode().splitlines()
+    assert lines[0] == "id,short_code,original_url,user_id,username,clicks,created_at"
+    assert len(lines) == 4
+
+
+# ==========================================
+# REDIRECT CACHING POLICY TESTS
+# ==========================================
+
+@pytest.fixture
+def edge(app):
+    """Local purge hook standing in for a CDN"""
+    from app.redirects import redirect_purger, LocalPurgeHook
+    redirect_purger.hook = LocalPurgeHook()
+    return redirect_purger.hook
+
+
+def test_default_redirect_is_uncached_302(client, user):
+    """Links without a policy keep the 302 and tell caches not to store it"""
+    from app.models import Link
+    db.session.add(Link(short_code="dfl", original_url="https://example.com", user_id=user.id))
+    db.session.commit()
+    response = client.get("/dfl")
+    assert response.status_code == 302
+    assert response.headers["Cache-Control"] == "no-store"
+    assert "Expires" not in response.headers
+
+
+def test_create_with_permanent_public_policy(logged_in_client, user, app):
+    """The form's policy is stored and sent as 301 + Cache-Control/Expires, capped"""
+    from app.models import Link
+    app.config["REDIRECT_MAX_AGE_LIMIT"] = 600
+    logged_in_client.post("/dashboard", data={
+        "url": "https://cdn.example.com", "redirect_permanent": "on",
+        "redirect_max_age": "86400", "redirect_public": "on",
+    })
+    link = Link.query.filter_by(original_url="https://cdn.example.com").one()
+    assert (link.redirect_permanent, link.redirect_max_age, link.redirect_public) == (True, 600, True)
+
+    response = logged_in_client.get(f"/{link.short_code}")
+    assert response.status_code == 301
+    assert response.headers["Cache-Control"] == "public, max-age=600"
+    assert "Expires" in response.headers
+
+
+def test_edit_and_delete_purge_the_edge(logged_in_client, user, edge):
+    """Edits and deletes tell the purge hook which codes went stale"""
+    from app.models import Link
+    link = Link(short_code="edg", original_url="https://old.example.com", user_id=user.id,
+                redirect_max_age=60, redirect_public=True)
+    db.session.add(link)
+    db.session.commit()
+
+    logged_in_client.post("/dashboard", data={"url": "https://new.example.com", "edit_id": link.id,
+                                               "redirect_max_age": "30"})
+    assert edge.purged == ["edg"]
+    assert logged_in_client.get("/edg").headers["Cache-Control"] == "private, max-age=30"
+
+    logged_in_client.post(f"/delete/{link.id}")
+    assert edge.purged == ["edg", "edg"]
+
+
+def test_fastpath_sends_redirect_policy(app, user):
+    """The async fast path emits the same status and cache headers"""
+    from app.models import Link
+    from app.fastpath import RedirectApp
+    from app.clicks import click_counter
+    from app.analytics import click_events
+    db.session.add(Link(short_code="fpp", original_url="https://example.com", user_id=user.id,
+                        redirect_permanent=True, redirect_max_age=120))
+    db.session.commit()
+    status, headers = _asgi_get(RedirectApp(app), "/fpp")
+    assert status == 301
+    assert headers[b"cache-control"] == b"private, max-age=120"
+    click_counter.flush()
+    click_events.flush()
+
+
+# ==========================================
+# TEMPLATE FRAGMENT CACHE TESTS
+# ==========================================
+
+def test_dashboard_rows_rendered_once_per_version(logged_in_client, user):
+    """Rows come from the fragment cache on repeat views, click counts stay live"""
+    from app.models import Link
+    from app.templating import fragment_cache
+    _seed_links(user, 3, "frg")
+
+    first = logged_in_client.get("/dashboard")
+    assert fragment_cache.stats()["misses"] == 3
+    Link.query.filter_by(short_code="frg0").update({"clicks": 41})
+    db.session.commit()
+
+    second = logged_in_client.get("/dashboard")
+    assert fragment_cache.stats()["hits"] == 3
+    assert b"https://example.com/2" in second.data
+    assert b">41</td>" in second.data and b">41</td>" not in first.data
+
+
+def test_edit_bumps_version_and_delete_drops_row(logged_in_client, user):
+    """An edit re-renders the row from the new version, a delete forgets it"""
+    from app.models import Link
+    from app.templating import fragment_cache
+    link = Link(short_code="ver", original_url="https://old.example.com", user_id=user.id)
+    db.session.add(link)
+    db.session.commit()
+    logged_in_client.get("/dashboard")
+
+    logged_in_client.post("/dashboard", data={"url": "https://new.example.com", "edit_id": link.id})
+    assert link.version == 2
+    page = logged_in_client.get("/dashboard").data
+    assert b"https://new.example.com" in page and b"https://old.example.com" not in page
+
+    logged_in_client.post(f"/delete/{link.id}")
+    assert fragment_cache.stats()["links"] == 0
+
+
+def test_admin_rows_are_cached(admin_client, user):
+    """The admin table renders each link once and serves the same markup after"""
+    from app.templating import fragment_cache
+    _seed_links(user, 5, "adm")
+    first = admin_client.get(f"/admin/users?user_id={user.id}")
+    second = admin_client.get(f"/admin/users?user_id={user.id}")
+    assert fragment_cache.stats()["table_hits"] == 1
+    assert first.data == second.data
+    assert second.data.count(b"cacheuser</td>") == 5
+
+
+def test_table_body_rerendered_when_a_row_changes(logged_in_client, user):
+    """A click or edit on one row misses the table cache, the other rows don't re-render"""
+    from app.models import Link
+    from app.templating import fragment_cache
+    _seed_links(user, 3, "tbl")
+    logged_in_client.get("/dashboard")
+    logged_in_client.get("/dashboard")
+    assert fragment_cache.stats()["table_hits"] == 1
+
+    Link.query.filter_by(short_code="tbl1").update({"clicks": 9, "version": Link.version + 1})
+    db.session.commit()
+    page = logged_in_client.get("/dashboard").data
+    stats = fragment_cache.stats()
+    assert (stats["table_misses"], stats["misses"], stats["hits"]) == (2, 4, 2)
+    assert b">9</td>" in page
+
+
+def test_templates_compiled_at_startup(app):
+    """Templates are compiled in create_app, through the bytecode cache"""
+    from jinja2 import FileSystemBytecodeCache
+    assert isinstance(app.jinja_env.bytecode_cache, FileSystemBytecodeCache)
+    compiled = {name for _, name in app.jinja_env.cache}
+    assert {"dashboard.html", "admin_user_links.html", "_link_rows.html"} <= compiled
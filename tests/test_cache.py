@@ -0,0 +1,127 @@
+from app.cache import LinkCache, CachedLink
+
+
+def test_lru_evicts_oldest_entry():
+    """Cache never grows past maxsize and evicts least recently used"""
+    cache = LinkCache(maxsize=2)
+    cache.set("a", CachedLink(1, "https://a", 1))
+    cache.set("b", CachedLink(2, "https://b", 1))
+    cache.get_or_load("a", lambda code: None)   # touch "a"
+    cache.set("c", CachedLink(3, "https://c", 1))
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.get_or_load("a", lambda code: None) == CachedLink(1, "https://a", 1)
+    assert cache.get_or_load("b", lambda code: None) is None
+
+
+def test_expired_entries_are_reloaded():
+    """Entries past their TTL go back to the loader"""
+    cache = LinkCache(ttl=0)
+    calls = []
+
+    def loader(code):
+        calls.append(code)
+        return CachedLink(1, "https://a", 1)
+
+    cache.get_or_load("a", loader)
+    cache.get_or_load("a", loader)
+    assert calls == ["a", "a"]
+
+
+def test_negative_entries_are_cached():
+    """A None from the loader is remembered for negative_ttl"""
+    cache = LinkCache(negative_ttl=60)
+    calls = []
+
+    def loader(code):
+        calls.append(code)
+        return None
+
+    assert cache.get_or_load("x", loader) is None
+    assert cache.get_or_load("x", loader) is None
+    assert calls == ["x"]
+
+
+def test_snapshot_round_trip(tmp_path):
+    """Snapshot files are searchable by code and skip codes too long to index"""
+    from app.warmup import LinkSnapshot, write_snapshot
+    path = str(tmp_path / "links.snap")
+    rows = [("b", 2, "https://b.example.com/ü", 7), ("a", 1, "https://a", 5),
+            ("toolongcode1", 3, "https://c", 7)]
+
+    assert write_snapshot(path, rows) == 2
+    snapshot = LinkSnapshot(path)
+    assert snapshot.get("a") == CachedLink(1, "https://a", 5)
+    assert snapshot.get("b") == CachedLink(2, "https://b.example.com/ü", 7)
+    assert snapshot.get("c") is None
+    assert snapshot.get("toolongcode1") is None
+    snapshot.close()
+
+
+def test_concurrent_misses_share_one_load():
+    """Threads missing the same key wait for a single loader call"""
+    import threading
+    import time
+    cache = LinkCache()
+    calls, started, release = [], threading.Event(), threading.Event()
+
+    def loader(code):
+        calls.append(code)
+        started.set()
+        release.wait(5)
+        return CachedLink(1, "https://a", 1)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("a", loader))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()["coalesced"] < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["a"]
+    assert results == [CachedLink(1, "https://a", 1)] * 8
+
+
+def test_failed_load_is_raised_to_waiters_and_not_cached():
+    """A loader error reaches the caller and the next lookup retries"""
+    import pytest
+    cache = LinkCache()
+
+    def broken(code):
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("a", broken)
+    assert cache.get_or_load("a", lambda code: CachedLink(1, "https://a", 1)).id == 1
+
+
+def test_entries_near_expiry_are_refreshed():
+    """Within refresh_ahead of expiry one lookup reloads, the value stays served"""
+    cache = LinkCache(ttl=60, refresh_ahead=60)
+    cache.set("a", CachedLink(1, "https://old", 1))
+
+    assert cache.get_or_load("a", lambda code: CachedLink(1, "https://new", 1)).original_url == "https://new"
+    assert cache.stats()["refreshes"] == 1
+
+    def broken(code):
+        raise RuntimeError("db down")
+
+    # a failed refresh keeps the still-valid entry
+    assert cache.get_or_load("a", broken).original_url == "https://new"
+
+
+def test_invalidate_drops_in_flight_result():
+    """A load that started before invalidate() doesn't store its result"""
+    cache = LinkCache()
+
+    def loader(code):
+        cache.invalidate(code)
+        return CachedLink(1, "https://old", 1)
+
+    assert cache.get_or_load("a", loader).original_url == "https://old"
+    assert cache.lookup("a") == (False, None)
@@ -0,0 +1,107 @@
+import pytest
+
+from app import create_app, db
+from app.codefilter import BloomFilter, code_filter
+from app.shortcodes import shortcode_allocator, code_for, index_for
+
+
+@pytest.fixture
+def app():
+    """App with a built short code filter"""
+    app = create_app()
+    app.config.update({"TESTING": True, "CLICK_FLUSH_INTERVAL": 0, "ANALYTICS_FLUSH_INTERVAL": 0})
+
+    with app.app_context():
+        db.create_all()
+        shortcode_allocator.block_size = 8
+        code_filter.rebuild()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    from app.models import User
+    user = User(username="u", email="u@example.com", password_hash="x",
+                first_name="U", gender="other", age=20, profession="dev")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Everything added is found, unknown items mostly aren't"""
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"code{i}")
+    assert all(f"code{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+    assert bloom.expected_fp_rate() == pytest.approx(0.01, rel=0.5)
+
+
+def test_bloom_filter_memory_cap():
+    """max_bytes bounds the bit array, at the cost of a higher FP rate"""
+    bloom = BloomFilter(100000, 0.001, max_bytes=1024)
+    assert bloom.nbytes == 1024
+
+
+def test_index_for_inverts_code_for():
+    """Codes map back to their tier index; foreign codes map to None"""
+    assert index_for(code_for(12345, 3)) == 12345
+    assert index_for("wp-login.php") is None
+
+
+def test_foreign_codes_skip_the_database(app, user):
+    """Probes the allocator could never produce don't query links"""
+    from app.querystats import query_budget
+    client = app.test_client()
+    with query_budget(0):
+        assert client.get("/wp-login.php").headers["Location"] == "/"
+    assert code_filter.stats()["rejected"] == 1
+
+
+def test_settled_allocator_codes_are_rejected(app, user):
+    """Reserved-but-never-saved codes are rejected once no process can hand them out"""
+    import time
+    from app.querystats import query_budget
+    from app.models import Link
+    shortcode_allocator.block_max_age = 0.05
+    saved, *unsaved = shortcode_allocator.allocate_many(8)
+    db.session.add(Link(short_code=saved, original_url="https://example.com", user_id=user.id))
+    db.session.commit()
+
+    code_filter.rebuild()
+    assert code_filter.might_exist(unsaved[0])     # could still be handed out
+    time.sleep(0.11)
+    code_filter.rebuild()
+    assert code_filter.stats()["settled_indexes"] == {"3": 8}
+
+    client = app.test_client()
+    with query_budget(0):
+        assert client.get("/" + unsaved[0]).headers["Location"] == "/"
+    assert client.get("/" + saved).headers["Location"] == "https://example.com"
+    # past the settled index: a normal lookup
+    assert code_filter.might_exist(code_for(8, 3))
+
+
+def test_codes_allocated_after_build_are_not_rejected(app, user):
+    """Links another process creates after the build still redirect"""
+    from app.models import Link
+    shortcode_allocator.block_max_age = 0
+    code_filter.rebuild()
+    # simulate another worker: allocate and insert without telling the filter
+    code = shortcode_allocator.allocate()
+    db.session.add(Link(short_code=code, original_url="https://example.com/new", user_id=user.id))
+    db.session.commit()
+
+    assert code_filter.might_exist(code)
+    assert app.test_client().get("/" + code).headers["Location"] == "https://example.com/new"
+
+
+def test_bulk_created_codes_are_added(app, user):
+    """Codes created in this process go straight into the filter"""
+    from app.bulk import iter_bulk_create
+    codes = [code for chunk in iter_bulk_create(user.id, ["https://a.example", "https://b.example"]) for code in chunk]
+    bloom, _ = code_filter._state
+    assert all(code in bloom for code in codes)
@@ -0,0 +1,88 @@
+import gzip
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import create_app, db, compress
+
+
+@pytest.fixture
+def app():
+    """App with default compression policy"""
+    app = create_app()
+    app.config.update({"TESTING": True, "CLICK_FLUSH_INTERVAL": 0, "ANALYTICS_FLUSH_INTERVAL": 0})
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def test_redirect_endpoint_is_never_compressed(app):
+    """Redirects skip negotiation entirely, no Vary header to split CDN caches"""
+    from app.models import Link, User
+    user = User(username="c", email="c@example.com", password_hash="x",
+                first_name="C", gender="other", age=20, profession="dev")
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(Link(short_code="cmp", original_url="https://example.com/" + "x" * 1000, user_id=user.id))
+    db.session.commit()
+
+    response = app.test_client().get("/cmp", headers={"Accept-Encoding": "gzip, br"})
+    assert response.status_code == 302
+    assert "Content-Encoding" not in response.headers
+    assert "Vary" not in response.headers
+
+
+def test_small_bodies_are_not_compressed(app):
+    """Responses under COMPRESS_MIN_SIZE go out uncompressed"""
+    @app.route("/tiny")
+    def tiny():
+        return "x" * 100
+
+    response = app.test_client().get("/tiny", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_identical_pages_are_compressed_once(app):
+    """Same template output is served from the ETag-keyed cache"""
+    client = app.test_client()
+    first = client.get("/signup", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/signup", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.get_data() == second.get_data()
+    assert b"<form" in gzip.decompress(second.get_data())
+    assert compress.body_cache.stats()["hits"] == 1
+
+
+def test_precompressed_static_files_are_served_as_is(tmp_path):
+    """Static files with a fresh .br/.gz twin are sent without compressing"""
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "app.css").write_text("body { color: red; }\n" * 100)
+    subprocess.run([sys.executable, "scripts/precompress_static.py", str(static)], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert (static / "app.css.br").exists() and (static / "app.css.gz").exists()
+
+    app = create_app()
+    app.static_folder = str(static)
+    client = app.test_client()
+
+    response = client.get("/static/app.css", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "text/css"
+    assert response.get_data() == (static / "app.css.gz").read_bytes()
+    assert client.get("/static/app.css").get_data() == (static / "app.css").read_bytes()
+
+
+def test_excluded_endpoints_setting_is_trimmed():
+    """Spaces and empty items in COMPRESS_EXCLUDE_ENDPOINTS are ignored"""
+    env = {**os.environ, "COMPRESS_EXCLUDE_ENDPOINTS": "main.redirect_to_url, ops.metrics,,"}
+    output = subprocess.run(
+        [sys.executable, "-c", "from config import Config; print(Config.COMPRESS_EXCLUDE_ENDPOINTS)"],
+        env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True, capture_output=True, text=True
+    ).stdout
+    assert output.strip() == "['main.redirect_to_url', 'ops.metrics']"
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.passwords import PasswordHasher, HashingBusy, password_hasher
+
+
+# cheap KDF so tests don't spend their time hashing
+FAST_METHOD = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture
+def app():
+    """App hashing with a cheap pbkdf2 setting"""
+    app = create_app()
+    app.config.update({"TESTING": True, "CLICK_FLUSH_INTERVAL": 0, "PASSWORD_HASH_METHOD": FAST_METHOD})
+    password_hasher.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def test_hash_and_verify_on_pool(app):
+    """Hashes made on the pool use the configured method and verify"""
+    hashed = password_hasher.hash("s3cret")
+    assert hashed.startswith(FAST_METHOD + "$")
+    assert password_hasher.verify(hashed, "s3cret")
+    assert not password_hasher.verify(hashed, "wrong")
+
+
+def test_saturated_pool_rejects_immediately(monkeypatch):
+    """Past workers + queue, calls fail fast instead of waiting"""
+    hasher = PasswordHasher(workers=1, queue=0)
+    release = threading.Event()
+    monkeypatch.setattr("app.passwords.generate_password_hash", lambda *args: release.wait(5))
+
+    thread = threading.Thread(target=hasher.hash, args=("a",))
+    thread.start()
+    while hasher._slots._value:
+        time.sleep(0.001)
+    with pytest.raises(HashingBusy):
+        hasher.verify("x", "b")
+    assert hasher.rejected == 1
+    release.set()
+    thread.join()
+
+
+def test_needs_rehash_compares_parameters(app):
+    """Only hashes with other KDF parameters are flagged"""
+    assert not password_hasher.needs_rehash(generate_password_hash("a", FAST_METHOD))
+    assert password_hasher.needs_rehash(generate_password_hash("a", "pbkdf2:sha256:2000"))
+    assert password_hasher.needs_rehash(generate_password_hash("a", "scrypt:1024:8:1"))
+
+
+def test_login_upgrades_outdated_hash(app):
+    """A successful login re-hashes with the configured parameters"""
+    from app.models import User
+    user = User(username="old", email="old@example.com", first_name="Old", gender="other",
+                age=30, profession="dev", password_hash=generate_password_hash("Pass123!", "pbkdf2:sha256:2000"))
+    db.session.add(user)
+    db.session.commit()
+
+    response = app.test_client().post("/", data={"email": "old@example.com", "password": "Pass123!"})
+    assert response.status_code == 302
+    assert db.session.get(User, user.id).password_hash.startswith(FAST_METHOD + "$")
+
+
+def test_login_answers_503_when_hashing_is_saturated(app, monkeypatch):
+    """A full pool turns logins away before any KDF work"""
+    from app.models import User
+    user = User(username="busy", email="busy@example.com", first_name="Busy", gender="other",
+                age=30, profession="dev")
+    user.set_password("Pass123!")
+    db.session.add(user)
+    db.session.commit()
+
+    def busy(*args):
+        raise HashingBusy()
+
+    monkeypatch.setattr(password_hasher, "verify", busy)
+    response = app.test_client().post("/", data={"email": "busy@example.com", "password": "Pass123!"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import text
+
+from app import create_app, db
+from app.queryplans import check
+
+
+@pytest.fixture
+def app():
+    """App with all tables and indexes created"""
+    app = create_app()
+    app.config.update({"TESTING": True, "CLICK_FLUSH_INTERVAL": 0, "ANALYTICS_FLUSH_INTERVAL": 0})
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def test_hot_queries_use_indexes(app):
+    """No hot query does a full table scan or an unindexed sort"""
+    failed = [(r.name, r.problems) for r in check(db.engine) if not r.ok]
+    assert failed == []
+
+
+def test_missing_index_is_reported(app):
+    """Dropping the dashboard index makes the check fail"""
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_links_user_created_id"))
+
+    failed = {r.name for r in check(db.engine) if not r.ok}
+    assert "main.dashboard: first page" in failed
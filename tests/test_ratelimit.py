@@ -0,0 +1,90 @@
+import pytest
+
+from app import create_app, db
+from app.ratelimit import MemoryBackend, Limit, client_ip, parse_limits, rate_limiter
+
+
+@pytest.fixture
+def app():
+    """App with rate limiting on and small limits"""
+    app = create_app()
+    app.config.update({
+        "TESTING": True,
+        "CLICK_FLUSH_INTERVAL": 0,
+        "ANALYTICS_FLUSH_INTERVAL": 0,
+        "RATELIMIT_ENABLED": True,
+        "RATELIMIT_LIMITS": "main.redirect_to_url=ip:3/m; main.dashboard:POST=user:1/m",
+    })
+    rate_limiter.enabled = True
+    rate_limiter.limits = parse_limits(app.config["RATELIMIT_LIMITS"])
+    rate_limiter.backend = MemoryBackend()
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def test_parse_limits():
+    """Endpoints, optional methods and periods are parsed; junk is rejected"""
+    limits = parse_limits("main.redirect_to_url=ip:100/s,code:5/10m; auth.login:post=ip:10/h")
+    assert limits[("main.redirect_to_url", None)] == [Limit("ip", 100, 1), Limit("code", 5, 600)]
+    assert limits[("auth.login", "POST")] == [Limit("ip", 10, 3600)]
+    with pytest.raises(ValueError):
+        parse_limits("auth.login=ip:ten/s")
+
+
+def test_bucket_allows_burst_then_refills():
+    """A full bucket allows `burst` requests, then refills at `rate`"""
+    backend = MemoryBackend()
+    assert [backend.take("k", 1, 2, 100.0) for _ in range(3)] == [0, 0, 1.0]
+    assert backend.take("k", 1, 2, 100.5) == 0.5
+    assert backend.take("k", 1, 2, 101.0) == 0
+
+
+def test_idle_buckets_are_evicted():
+    """Buckets that refilled completely are swept; the key cap holds"""
+    backend = MemoryBackend(stripes=1, max_keys=2, sweep_interval=0)
+    backend.take("a", 1, 1, 0.0)
+    backend.take("b", 1, 1, 0.0)
+    backend.take("c", 1, 1, 0.0)
+    assert len(backend) == 2
+    backend.take("d", 1, 1, 5.0)
+    assert len(backend) == 1
+
+
+def test_client_ip_trusts_configured_proxy_hops():
+    """X-Forwarded-For is only used for as many hops as configured"""
+    assert client_ip("10.0.0.1", "1.2.3.4, 10.0.0.9", 0) == "10.0.0.1"
+    assert client_ip("10.0.0.1", "1.2.3.4, 10.0.0.9", 1) == "10.0.0.9"
+    assert client_ip("10.0.0.1", "1.2.3.4, 10.0.0.9", 2) == "1.2.3.4"
+
+
+def test_redirects_get_429_before_any_query(app):
+    """Over the limit the redirect answers 429 + Retry-After without touching the DB"""
+    from app.querystats import query_budget
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get("/zzz").status_code == 302
+
+    with query_budget(0):
+        response = client.get("/zzz")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "20"
+    # other clients have their own bucket
+    assert client.get("/zzz", environ_base={"REMOTE_ADDR": "10.1.1.1"}).status_code == 302
+
+
+def test_limits_apply_per_method_and_user(app):
+    """The dashboard POST limit is per user and leaves GETs alone"""
+    from app.models import User
+    user = User(username="rl", email="rl@example.com", first_name="R", gender="other", age=30, profession="dev")
+    user.set_password("Pass123!")
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    client.post("/", data={"email": "rl@example.com", "password": "Pass123!"})
+
+    assert client.post("/dashboard", data={"url": "https://a.example.com"}).status_code == 302
+    assert client.post("/dashboard", data={"url": "https://b.example.com"}).status_code == 429
+    assert client.get("/dashboard").status_code == 200
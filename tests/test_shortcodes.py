@@ -0,0 +1,148 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.shortcodes import shortcode_allocator, code_for, BASE
+
+
+@pytest.fixture
+def app():
+    """App with a small allocator block size"""
+    app = create_app()
+    app.config.update({"TESTING": True, "CLICK_FLUSH_INTERVAL": 0})
+
+    with app.app_context():
+        db.create_all()
+        shortcode_allocator.block_size = 8
+        yield app
+        db.drop_all()
+
+
+def test_code_mapping_is_a_bijection():
+    """Every index in a tier maps to a distinct code of that length"""
+    codes = {code_for(i, 2) for i in range(BASE ** 2)}
+    assert len(codes) == BASE ** 2
+    assert all(len(code) == 2 for code in codes)
+
+
+def test_allocations_are_unique(app):
+    """Codes never repeat across blocks"""
+    codes = shortcode_allocator.allocate_many(50)
+    assert len(set(codes)) == 50
+    assert all(len(code) == 3 for code in codes)
+
+
+def test_allocation_skips_existing_codes(app):
+    """Codes already used by links (legacy random codes) are skipped"""
+    from app.models import Link, User
+    taken = code_for(0, 3)
+    user = User(username="u", email="u@example.com", password_hash="x",
+                first_name="U", gender="other", age=20, profession="dev")
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(Link(short_code=taken, original_url="https://example.com", user_id=user.id))
+    db.session.commit()
+
+    assert taken not in shortcode_allocator.allocate_many(8)
+
+
+def test_tier_grows_when_full(app):
+    """Once every code of a length is handed out the next length is used"""
+    shortcode_allocator.min_length = shortcode_allocator._length = 1
+    codes = shortcode_allocator.allocate_many(BASE + 1)
+    assert sorted(len(code) for code in codes) == [1] * BASE + [2]
+
+
+def test_freed_codes_are_reused_after_delay(app):
+    """Codes of deleted links come back once the reuse delay passed"""
+    from app.models import FreeShortCode
+    db.session.add(FreeShortCode(short_code="old", freed_at=datetime.utcnow() - timedelta(days=2)))
+    db.session.add(FreeShortCode(short_code="new", freed_at=datetime.utcnow()))
+    db.session.commit()
+
+    codes = shortcode_allocator.allocate_many(8)
+    assert "old" in codes
+    assert "new" not in codes
+    # "old" stays around, marked taken, until no allocator can still hold it
+    assert db.session.query(FreeShortCode).filter_by(taken_at=None).count() == 1
+
+
+def test_stale_reservations_are_dropped(app):
+    """Codes not handed out within SHORT_CODE_BLOCK_MAX_AGE are never used"""
+    import time
+    shortcode_allocator.block_max_age = 0.05
+    first = shortcode_allocator.allocate()
+    time.sleep(0.1)
+    second = shortcode_allocator.allocate()
+    assert first == code_for(0, 3)
+    assert second == code_for(8, 3)
+
+    # released after expiry: dropped as well
+    shortcode_allocator.release([second])
+    time.sleep(0.1)
+    assert shortcode_allocator.allocate() == code_for(9, 3)
+
+
+def test_idle_allocator_reserves_only_what_it_hands_out(app):
+    """Past SHORT_CODE_BLOCK_MAX_AGE without allocations, no whole block is reserved"""
+    import time
+    from app.models import ShortCodeCounter
+    shortcode_allocator.block_max_age = 0.05
+    for _ in range(5):
+        shortcode_allocator.allocate()
+        time.sleep(0.1)
+    # one block for the first create, then one index per create
+    assert db.session.get(ShortCodeCounter, 3).next_index == 8 + 4
+
+    # busy again: the next refill is a whole block
+    shortcode_allocator.allocate_many(2)
+    shortcode_allocator.allocate()
+    assert db.session.get(ShortCodeCounter, 3).next_index == 8 + 4 + 2 + 8
+
+
+def test_taken_free_codes_are_purged_later(app):
+    """Rows of reused codes are removed once they can't be in flight anymore"""
+    from app.models import FreeShortCode
+    shortcode_allocator.reuse_delay = 0
+    db.session.add(FreeShortCode(short_code="old", freed_at=datetime.utcnow() - timedelta(days=2),
+                                 taken_at=datetime.utcnow() - timedelta(days=1)))
+    db.session.add(FreeShortCode(short_code="new", freed_at=datetime.utcnow() - timedelta(days=1)))
+    db.session.commit()
+
+    assert "new" in shortcode_allocator.allocate_many(8)
+    db.session.expire_all()
+    assert [row.short_code for row in db.session.query(FreeShortCode)] == ["new"]
+
+
+def test_free_list_codes_are_not_reserved_again(app):
+    """A freed legacy code the counter would produce is only handed out once"""
+    from app.models import FreeShortCode
+    shortcode_allocator.reuse_delay = 0
+    db.session.add(FreeShortCode(short_code=code_for(2, 3), freed_at=datetime.utcnow() - timedelta(days=1)))
+    db.session.commit()
+
+    codes = shortcode_allocator.allocate_many(16)
+    assert codes.count(code_for(2, 3)) == 1
+
+
+def test_colliding_code_is_dropped_not_released(app):
+    """After a unique violation the create fails once and the code is gone"""
+    import time
+    from app.models import Link, User
+    user = User(username="dup", email="dup@example.com", first_name="Dup", gender="other", age=30,
+                profession="tester")
+    user.set_password("TestPassword123!")
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(Link(short_code="dup", original_url="https://example.com", user_id=user.id))
+    db.session.commit()
+    client = app.test_client()
+    client.post("/", data={"email": "dup@example.com", "password": "TestPassword123!"})
+
+    shortcode_allocator._buffer.appendleft("dup")
+    shortcode_allocator._reserved_at["dup"] = time.monotonic()
+    client.post("/dashboard", data={"url": "https://first.example.com"})
+    assert "dup" not in shortcode_allocator._buffer
+
+    client.post("/dashboard", data={"url": "https://second.example.com"})
+    assert Link.query.filter_by(original_url="https://second.example.com").count() == 1